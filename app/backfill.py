@@ -0,0 +1,34 @@
+import os
+import argparse
+import logging
+
+# Importing custom modules
+import indeed.archive_backfill
+
+# Get the directory of the current script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+working_dir = os.path.abspath(os.path.join(script_dir, '..')) # Change the working directory
+os.chdir(working_dir)
+logging.info(f"Working directory set to: {working_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-extract jobs from the archived emails in data/emails and rebuild the raw CSVs month by month."
+    )
+    parser.add_argument("--archive-dir", default=indeed.archive_backfill.ARCHIVE_DIR,
+                        help="Root of the email archive (default: %(default)s).")
+    parser.add_argument("--workers", type=int, default=indeed.archive_backfill.BACKFILL_WORKERS,
+                        help="Number of parsing processes (default: %(default)s).")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the recorded progress and rebuild every month.")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Do not refresh the intermediate (deduplicated) CSVs.")
+    args = parser.parse_args()
+
+    summary = indeed.archive_backfill.run_backfill(
+        archive_dir=args.archive_dir,
+        workers=args.workers,
+        restart=args.restart,
+        dedup=not args.no_dedup,
+    )
+    print(f"Backfill finished: {summary}")
@@ -0,0 +1,40 @@
+import os
+import argparse
+import logging
+
+# Importing custom modules
+import indeed.job_storage
+import indeed.job_database
+
+# Get the directory of the current script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+working_dir = os.path.abspath(os.path.join(script_dir, '..')) # Change the working directory
+os.chdir(working_dir)
+logging.info(f"Working directory set to: {working_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the monthly CSVs in data/raw and data/intermediate to the Parquet datasets in data/parquet, "
+                    "or import them into the SQLite job database."
+    )
+    parser.add_argument("--to", choices=["parquet", "sqlite"], default="parquet",
+                        help="Storage backend to convert to (default: %(default)s).")
+    parser.add_argument("--raw-dir", default="./data/raw",
+                        help="Directory of the raw monthly CSVs (default: %(default)s).")
+    parser.add_argument("--intermediate-dir", default="./data/intermediate",
+                        help="Directory of the intermediate monthly CSVs (default: %(default)s).")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Replace the months already stored as Parquet.")
+    args = parser.parse_args()
+
+    if args.to == "sqlite":
+        # The jobs table is rebuilt from the raw rows, so the intermediate CSVs are not needed
+        summary = indeed.job_database.import_csv_months(raw_dir=args.raw_dir)
+    else:
+        summary = indeed.job_storage.convert_csv_to_parquet(
+            raw_dir=args.raw_dir,
+            intermediate_dir=args.intermediate_dir,
+            overwrite=args.overwrite,
+        )
+    print(f"Conversion finished: {summary}")
+    print(f"Set INDEED_STORAGE_BACKEND={args.to} for the listener and the dashboard to use it.")
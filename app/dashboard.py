@@ -3,9 +3,10 @@ import logging
 import pandas as pd
 import dash
 from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 from datetime import datetime, timedelta  # Ensure timedelta is imported
 import reporting.raw_data_reporting   
+import reporting.table_queries
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +21,33 @@ logging.info(f"Working directory set to: {working_dir}")
 intermediate_data_dir = os.path.join(working_dir, 'data', 'intermediate')
 raw_data_dir = os.path.join(working_dir, 'data', 'raw')
 
+# Menu 3 input choosing the window of the "Last N Days" table, and its initial value
+RECENT_DAYS_INPUT = 'recent-days-input'
+DEFAULT_RECENT_DAYS = 7
+
+# Job tables paged on the server: table id -> (data shown, days of recent postings kept or None).
+# The window of a table whose days are RECENT_DAYS_INPUT is chosen by the user.
+PAGED_TABLES = {
+    'table-pre-processed': ('intermediate', None),
+    'table-raw-processed': ('raw', None),
+    'table-most-recent-1-day': ('intermediate', 1),
+    'table-last-3-days': ('intermediate', 3),
+    'table-last-n-days': ('intermediate', RECENT_DAYS_INPUT),
+}
+
+def load_table_data(table_id, companies, locations, types, recent_days=None):
+    """Return the jobs of a paged table, with the dropdown filters applied."""
+    kind, days = PAGED_TABLES[table_id]
+    if days == RECENT_DAYS_INPUT:
+        days = max(1, int(recent_days or DEFAULT_RECENT_DAYS))
+    if days is not None:
+        # Sliced from the sorted posting date index of each month, whatever the length of the history
+        data = reporting.raw_data_reporting.load_recent_data(intermediate_data_dir, days, companies, locations, types)
+        return data.assign(posting_date=pd.to_datetime(data['posting_date'], errors='coerce').dt.date)
+    intermediate_data, raw_data = reporting.raw_data_reporting.load_filtered_data(
+        intermediate_data_dir, raw_data_dir, companies, locations, types
+    )
+    return intermediate_data if kind == 'intermediate' else raw_data
 
 class Dashboard:
     @staticmethod
@@ -68,10 +96,11 @@ class Dashboard:
             [Input('refresh-button', 'n_clicks')]
         )
         def update_filters(n_clicks):
-            intermediate_data = reporting.raw_data_reporting.intermediate_load_data(intermediate_data_dir, top_n=None)
-            company_options = [{'label': company[:40], 'value': company} for company in intermediate_data['company'].unique()]
-            location_options = [{'label': location[:40], 'value': location} for location in intermediate_data['location'].unique()]
-            type_options = [{'label': type_[:40], 'value': type_} for type_ in intermediate_data['type'].dropna().unique() if isinstance(type_, str)]
+            # Distinct values from the same index the filters are answered from
+            filter_index = reporting.raw_data_reporting.get_filter_index("intermediate", intermediate_data_dir)
+            company_options = [{'label': company[:40], 'value': company} for company in filter_index.values('company')]
+            location_options = [{'label': location[:40], 'value': location} for location in filter_index.values('location')]
+            type_options = [{'label': type_[:40], 'value': type_} for type_ in filter_index.values('type') if isinstance(type_, str)]
             return company_options, location_options, type_options
 
         @app.callback(
@@ -82,21 +111,17 @@ class Dashboard:
         )
         def render_menu_content(selected_menu, n_clicks, companies, locations, types):
             try:
-                intermediate_data = reporting.raw_data_reporting.intermediate_load_data(intermediate_data_dir, top_n=None)
-                raw_data = reporting.raw_data_reporting.raw_load_data(raw_data_dir)
-
-                if companies:
-                    intermediate_data = intermediate_data[intermediate_data['company'].isin(companies)]
-                    raw_data = raw_data[raw_data['company'].isin(companies)]
-                if locations:
-                    intermediate_data = intermediate_data[intermediate_data['location'].isin(locations)]
-                    raw_data = raw_data[raw_data['location'].isin(locations)]
-                if types:
-                    intermediate_data = intermediate_data[intermediate_data['type'].isin(types)]
-                    raw_data = raw_data[raw_data['type'].isin(types)]
+                intermediate_data, raw_data = reporting.raw_data_reporting.load_filtered_data(
+                    intermediate_data_dir, raw_data_dir, companies, locations, types
+                )
 
                 refresh_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                refresh_status = f"Last refresh: {refresh_time} - Success"
+                cache_stats = reporting.raw_data_reporting.get_cache_stats()
+                refresh_status = (
+                    f"Last refresh: {refresh_time} - Success "
+                    f"(data cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                    f"{cache_stats['load_seconds']:.2f}s loading)"
+                )
 
                 if selected_menu == 'menu-1':
                     return [html.Div([
@@ -148,7 +173,8 @@ class Dashboard:
                                     value='tab-1-menu-3',
                                     children=[
                                         dcc.Tab(label='Tab 1: Most Recent (1 Day)', value='tab-1-menu-3', style={'padding': '10px'}),
-                                        dcc.Tab(label='Tab 2: Last 3 Days', value='tab-2-menu-3', style={'padding': '10px'})
+                                        dcc.Tab(label='Tab 2: Last 3 Days', value='tab-2-menu-3', style={'padding': '10px'}),
+                                        dcc.Tab(label='Tab 3: Last N Days', value='tab-3-menu-3', style={'padding': '10px'})
                                     ],
                                     vertical=True,
                                     style={'height': '100%', 'borderRight': '1px solid #ccc'}
@@ -169,18 +195,9 @@ class Dashboard:
              Input('company-filter', 'value'), Input('location-filter', 'value'), Input('type-filter', 'value')]
         )
         def render_vertical_tab_content(selected_tab, companies, locations, types):
-            intermediate_data = reporting.raw_data_reporting.intermediate_load_data(intermediate_data_dir, top_n=None)
-            raw_data = reporting.raw_data_reporting.raw_load_data(raw_data_dir)
-
-            if companies:
-                intermediate_data = intermediate_data[intermediate_data['company'].isin(companies)]
-                raw_data = raw_data[raw_data['company'].isin(companies)]
-            if locations:
-                intermediate_data = intermediate_data[intermediate_data['location'].isin(locations)]
-                raw_data = raw_data[raw_data['location'].isin(locations)]
-            if types:
-                intermediate_data = intermediate_data[intermediate_data['type'].isin(types)]
-                raw_data = raw_data[raw_data['type'].isin(types)]
+            intermediate_data, raw_data = reporting.raw_data_reporting.load_filtered_data(
+                intermediate_data_dir, raw_data_dir, companies, locations, types
+            )
 
             if selected_tab == 'tab-1':
                 return html.Div([
@@ -191,11 +208,10 @@ class Dashboard:
                             {"name": i, "id": i, "type": "text", "presentation": "markdown"} if i == 'link' else {"name": i, "id": i}
                             for i in intermediate_data.columns
                         ],
-                        data=[
-                            {**row, 'link': f"[Click Here]({row['link']})" if 'link' in row else row.get('link', '')}
-                            for row in intermediate_data.to_dict('records')
-                        ],
+                        data=[],
+                        page_current=0,
                         page_size=10,
+                        page_action="custom",
                         style_table={'overflowX': 'auto', 'maxWidth': '100%', 'margin': '0 auto'},
                         style_cell={
                             'whiteSpace': 'normal',
@@ -209,8 +225,10 @@ class Dashboard:
                             'fontWeight': 'bold',
                             'textAlign': 'center',
                         },
-                        sort_action="native",
-                        filter_action="native",
+                        sort_action="custom",
+                        filter_action="custom",
+                        sort_by=[],
+                        filter_query='',
                     )
                 ])
             elif selected_tab == 'tab-2':
@@ -222,11 +240,10 @@ class Dashboard:
                             {"name": i, "id": i, "type": "text", "presentation": "markdown"} if i == 'link' else {"name": i, "id": i}
                             for i in raw_data.columns
                         ],
-                        data=[
-                            {**row, 'link': f"[Click Here]({row['link']})" if 'link' in row else row.get('link', '')}
-                            for row in raw_data.to_dict('records')
-                        ],
+                        data=[],
+                        page_current=0,
                         page_size=10,
+                        page_action="custom",
                         style_table={'overflowX': 'auto', 'maxWidth': '100%', 'margin': '0 auto'},
                         style_cell={
                             'whiteSpace': 'normal',
@@ -240,8 +257,10 @@ class Dashboard:
                             'fontWeight': 'bold',
                             'textAlign': 'center',
                         },
-                        sort_action="native",
-                        filter_action="native",
+                        sort_action="custom",
+                        filter_action="custom",
+                        sort_by=[],
+                        filter_query='',
                     )
                 ])
 
@@ -251,25 +270,15 @@ class Dashboard:
              Input('company-filter', 'value'), Input('location-filter', 'value'), Input('type-filter', 'value')]
         )
         def render_vertical_tab_content_menu_2(selected_tab, companies, locations, types):
-            intermediate_data = reporting.raw_data_reporting.intermediate_load_data(intermediate_data_dir, top_n=None)
-            raw_data = reporting.raw_data_reporting.raw_load_data(raw_data_dir)
-
-            if companies:
-                intermediate_data = intermediate_data[intermediate_data['company'].isin(companies)]
-                raw_data = raw_data[raw_data['company'].isin(companies)]
-            if locations:
-                intermediate_data = intermediate_data[intermediate_data['location'].isin(locations)]
-                raw_data = raw_data[raw_data['location'].isin(locations)]
-            if types:
-                intermediate_data = intermediate_data[intermediate_data['type'].isin(types)]
-                raw_data = raw_data[raw_data['type'].isin(types)]
-
+            # Pre-aggregated counts per company, location, type and posting date
             if selected_tab == 'tab-1-menu-2':
-                if 'posting_date' in intermediate_data.columns:
-                    intermediate_data['posting_date'] = pd.to_datetime(intermediate_data['posting_date'])
-                    three_months_ago = datetime.now() - pd.DateOffset(months=3)
-                    recent_data = intermediate_data[intermediate_data['posting_date'] >= three_months_ago]
-                    grouped_data = recent_data.groupby(['company', 'location']).size().reset_index(name='count')
+                # The months' window is sliced from the counts' sorted posting date index
+                three_months_ago = (datetime.now() - pd.DateOffset(months=3)).date()
+                recent_counts = reporting.raw_data_reporting.load_job_counts(
+                    intermediate_data_dir, companies, locations, types, since=three_months_ago
+                )
+                if 'posting_date' in recent_counts.columns:
+                    grouped_data = recent_counts.groupby(['company', 'location'])['count'].sum().reset_index()
                     return html.Div([
                         html.H3("Grouped Data by Company and Location Count (Last 3 Months)", style={'textAlign': 'left', 'marginBottom': '10px'}),
                         dash_table.DataTable(
@@ -298,7 +307,8 @@ class Dashboard:
                     return html.Div("Error: 'posting_date' column not found in the dataset")
 
             elif selected_tab == 'tab-2-menu-2':
-                grouped_data = intermediate_data.groupby(['company', 'location']).size().reset_index(name='count')
+                job_counts = reporting.raw_data_reporting.load_job_counts(intermediate_data_dir, companies, locations, types)
+                grouped_data = job_counts.groupby(['company', 'location'])['count'].sum().reset_index()
                 return html.Div([
                     html.H3("Grouped Data by All Data", style={'textAlign': 'left', 'marginBottom': '10px'}),
                     dash_table.DataTable(
@@ -330,37 +340,25 @@ class Dashboard:
              Input('company-filter', 'value'), Input('location-filter', 'value'), Input('type-filter', 'value')]
         )
         def render_vertical_tab_content_menu_3(selected_tab, companies, locations, types):
-            intermediate_data = reporting.raw_data_reporting.intermediate_load_data(intermediate_data_dir, top_n=None)
-            raw_data = reporting.raw_data_reporting.raw_load_data(raw_data_dir)
-
-            if companies:
-                intermediate_data = intermediate_data[intermediate_data['company'].isin(companies)]
-                raw_data = raw_data[raw_data['company'].isin(companies)]
-            if locations:
-                intermediate_data = intermediate_data[intermediate_data['location'].isin(locations)]
-                raw_data = raw_data[raw_data['location'].isin(locations)]
-            if types:
-                intermediate_data = intermediate_data[intermediate_data['type'].isin(types)]
-                raw_data = raw_data[raw_data['type'].isin(types)]
+            intermediate_data, raw_data = reporting.raw_data_reporting.load_filtered_data(
+                intermediate_data_dir, raw_data_dir, companies, locations, types
+            )
 
             if 'posting_date' in intermediate_data.columns:
-                intermediate_data['posting_date'] = pd.to_datetime(intermediate_data['posting_date'], errors='coerce').dt.date
+                # The jobs of the last days are selected and paged by update_table_page
                 if selected_tab == 'tab-1-menu-3':
-                    one_day_ago = datetime.now().date() - timedelta(days=1)
-                    recent_data = intermediate_data[intermediate_data['posting_date'] >= one_day_ago]
                     return html.Div([
                         html.H3("Most Recent Jobs (1 Day)", style={'textAlign': 'left', 'marginBottom': '10px'}),
                         dash_table.DataTable(
                             id='table-most-recent-1-day',
                             columns=[
                                 {"name": i, "id": i, "type": "text", "presentation": "markdown"} if i == 'link' else {"name": i, "id": i}
-                                for i in recent_data.columns
-                            ],
-                            data=[
-                                {**row, 'link': f"[Click Here]({row['link']})" if 'link' in row else row.get('link', '')}
-                                for row in recent_data.to_dict('records')
+                                for i in intermediate_data.columns
                             ],
+                            data=[],
+                            page_current=0,
                             page_size=10,
+                            page_action="custom",
                             style_table={'overflowX': 'auto', 'maxWidth': '100%', 'margin': '0 auto'},
                             style_cell={
                                 'whiteSpace': 'normal',
@@ -374,26 +372,61 @@ class Dashboard:
                                 'fontWeight': 'bold',
                                 'textAlign': 'center',
                             },
-                            sort_action="native",
-                            filter_action="native",
+                            sort_action="custom",
+                            filter_action="custom",
+                            sort_by=[],
+                            filter_query='',
                         )
                     ])
                 elif selected_tab == 'tab-2-menu-3':
-                    three_days_ago = datetime.now().date() - timedelta(days=3)
-                    recent_data = intermediate_data[intermediate_data['posting_date'] >= three_days_ago]
                     return html.Div([
                         html.H3("Jobs Posted in Last 3 Days", style={'textAlign': 'left', 'marginBottom': '10px'}),
                         dash_table.DataTable(
                             id='table-last-3-days',
                             columns=[
                                 {"name": i, "id": i, "type": "text", "presentation": "markdown"} if i == 'link' else {"name": i, "id": i}
-                                for i in recent_data.columns
+                                for i in intermediate_data.columns
                             ],
-                            data=[
-                                {**row, 'link': f"[Click Here]({row['link']})" if 'link' in row else row.get('link', '')}
-                                for row in recent_data.to_dict('records')
+                            data=[],
+                            page_current=0,
+                            page_size=10,
+                            page_action="custom",
+                            style_table={'overflowX': 'auto', 'maxWidth': '100%', 'margin': '0 auto'},
+                            style_cell={
+                                'whiteSpace': 'normal',
+                                'textAlign': 'left',
+                                'overflow': 'hidden',
+                                'textOverflow': 'ellipsis',
+                                'maxWidth': '150px',
+                            },
+                            style_header={
+                                'backgroundColor': '#f1f1f1',
+                                'fontWeight': 'bold',
+                                'textAlign': 'center',
+                            },
+                            sort_action="custom",
+                            filter_action="custom",
+                            sort_by=[],
+                            filter_query='',
+                        )
+                    ])
+                elif selected_tab == 'tab-3-menu-3':
+                    return html.Div([
+                        html.H3("Jobs Posted in Last N Days", style={'textAlign': 'left', 'marginBottom': '10px'}),
+                        html.Div([
+                            html.Label("Days: ", htmlFor=RECENT_DAYS_INPUT, style={'marginRight': '5px'}),
+                            dcc.Input(id=RECENT_DAYS_INPUT, type='number', min=1, step=1, value=DEFAULT_RECENT_DAYS, debounce=True),
+                        ], style={'marginBottom': '10px'}),
+                        dash_table.DataTable(
+                            id='table-last-n-days',
+                            columns=[
+                                {"name": i, "id": i, "type": "text", "presentation": "markdown"} if i == 'link' else {"name": i, "id": i}
+                                for i in intermediate_data.columns
                             ],
+                            data=[],
+                            page_current=0,
                             page_size=10,
+                            page_action="custom",
                             style_table={'overflowX': 'auto', 'maxWidth': '100%', 'margin': '0 auto'},
                             style_cell={
                                 'whiteSpace': 'normal',
@@ -407,13 +440,35 @@ class Dashboard:
                                 'fontWeight': 'bold',
                                 'textAlign': 'center',
                             },
-                            sort_action="native",
-                            filter_action="native",
+                            sort_action="custom",
+                            filter_action="custom",
+                            sort_by=[],
+                            filter_query='',
                         )
                     ])
             else:
                 return html.Div("Error: 'posting_date' column not found in the dataset")
 
+        def register_paged_table(table_id):
+            inputs = [Input(table_id, 'page_current'), Input(table_id, 'page_size'),
+                      Input(table_id, 'sort_by'), Input(table_id, 'filter_query')]
+            if PAGED_TABLES[table_id][1] == RECENT_DAYS_INPUT:
+                inputs.append(Input(RECENT_DAYS_INPUT, 'value'))
+
+            @app.callback(
+                [Output(table_id, 'data'), Output(table_id, 'page_count')],
+                inputs,
+                [State('company-filter', 'value'), State('location-filter', 'value'), State('type-filter', 'value')]
+            )
+            def update_table_page(page_current, page_size, sort_by, filter_query, *values):
+                *recent_days, companies, locations, types = values
+                # Only the visible page is sent to the browser
+                data = load_table_data(table_id, companies, locations, types, *recent_days)
+                return reporting.table_queries.get_table_page(data, page_current, page_size, sort_by, filter_query)
+
+        for table_id in PAGED_TABLES:
+            register_paged_table(table_id)
+
         return app
 
 def main():
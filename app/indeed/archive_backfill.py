@@ -0,0 +1,166 @@
+import os
+import logging
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import indeed.scrap_overall
+import indeed.scrap_job_elements
+import indeed.process_remove_duplicates
+import indeed.state_store
+import indeed.job_storage
+import indeed.job_database
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Archive written by process_latest_emails.save_email_html: <year>/<Month>/<timestamp>___<title>.html
+ARCHIVE_DIR = "./data/emails"
+ARCHIVE_TIMESTAMP_FORMAT = '%Y_%m_%d_%H_%M_%S'
+
+# Processes parsing archived emails
+BACKFILL_WORKERS = os.cpu_count() or 2
+
+# Name of the state file recording the months already rebuilt
+PROGRESS_STATE = "backfill_progress"
+
+def archive_timestamp(file_name):
+    """Return the received time encoded in an archived email's file name, or None if it has none."""
+    try:
+        return datetime.strptime(file_name.split('___', 1)[0], ARCHIVE_TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+def list_archived_emails(archive_dir=ARCHIVE_DIR):
+    """
+    Group the archived emails by the month they were received in.
+
+    Returns:
+        dict: 'YYYY_MM' mapped to a list of (absolute path, received datetime), oldest first.
+    """
+    months = {}
+    for root, _, files in os.walk(archive_dir):
+        for file_name in files:
+            if not file_name.endswith('.html'):
+                continue
+            received = archive_timestamp(file_name)
+            if received is None:
+                logging.warning(f"Skipping archived email without a timestamp: {file_name}")
+                continue
+            path = os.path.abspath(os.path.join(root, file_name))
+            months.setdefault(received.strftime('%Y_%m'), []).append((path, received))
+    for emails in months.values():
+        emails.sort(key=lambda email: (email[1], email[0]))
+    return months
+
+def extract_archived_email(email):
+    """
+    Extract the jobs of one archived email, counting posting ages from the time it was received.
+    Runs in a worker process; returns the jobs DataFrame or the raised exception.
+    """
+    path, received = email
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            html_content = file.read()
+        return indeed.scrap_overall.extract_jobs_from_html(html_content, reference_date=received)
+    except Exception as e:
+        logging.error(f"Failed to extract archived email {path}: {e}", exc_info=True)
+        return e
+
+def write_raw_month(jobs_df, month):
+    """Atomically replace the raw CSV, or the raw Parquet partition or database rows, of a month with the given jobs."""
+    if indeed.job_storage.is_parquet():
+        indeed.job_storage.write_month(jobs_df, indeed.job_storage.PARQUET_RAW_DIR, month)
+        return
+    if indeed.job_storage.is_sqlite():
+        indeed.job_database.replace_raw_month(jobs_df, month)
+        return
+    raw_directory = indeed.scrap_overall.raw_directory
+    os.makedirs(raw_directory, exist_ok=True)
+    file_path = os.path.join(raw_directory, f"{month}.csv")
+    temp_path = f"{file_path}.tmp"
+    jobs_df.to_csv(temp_path, mode='w', header=True, index=False)
+    os.replace(temp_path, file_path)
+    logging.info(f"Wrote {len(jobs_df)} jobs to {file_path}.")
+
+def run_backfill(archive_dir=ARCHIVE_DIR, workers=BACKFILL_WORKERS, restart=False, dedup=True):
+    """
+    Rebuild the raw CSV of every archived month by re-extracting its emails.
+
+    Months are rebuilt oldest first, each one written in bulk and then recorded in the
+    progress state, so an interrupted run resumes with the first unfinished month. A month is
+    rebuilt again when it gained archived emails or the extractor version changed.
+    A month whose emails hold no jobs is written empty, replacing what an earlier run wrote;
+    a month whose emails all failed keeps its previous output and is left for the next run.
+    The listener should be stopped while the current month is rebuilt.
+
+    Args:
+        archive_dir (str): Root of the email archive.
+        workers (int): Extraction processes; 1 or less extracts in this process.
+        restart (bool): If True, ignore the recorded progress and rebuild every month.
+        dedup (bool): If True, refresh the intermediate CSV of each rebuilt month.
+
+    Returns:
+        dict: Numbers of months rebuilt, skipped and failed, emails parsed, emails failed and jobs written.
+    """
+    version = indeed.scrap_job_elements.EXTRACTOR_VERSION
+    progress = indeed.state_store.load_state(PROGRESS_STATE, default={})
+    if restart or progress.get("extractor_version") != version:
+        progress = {"extractor_version": version, "months": {}}
+
+    months = list_archived_emails(archive_dir)
+    summary = {"months_rebuilt": 0, "months_skipped": 0, "months_failed": 0, "emails": 0, "failed": 0, "jobs": 0}
+    logging.info(f"Backfill: {sum(len(emails) for emails in months.values())} archived emails in {len(months)} months.")
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for month in sorted(months):
+            emails = months[month]
+            if progress["months"].get(month) == len(emails):
+                summary["months_skipped"] += 1
+                continue
+
+            if pool is None:
+                results = map(extract_archived_email, emails)
+            else:
+                results = pool.map(extract_archived_email, emails, chunksize=max(1, len(emails) // (workers * 4)))
+
+            frames = []
+            failed = 0
+            for result in results:
+                if isinstance(result, Exception):
+                    failed += 1
+                elif not result.empty:
+                    frames.append(result)
+            summary["emails"] += len(emails)
+            summary["failed"] += failed
+
+            if failed == len(emails):
+                summary["months_failed"] += 1
+                logging.error(f"Backfill: every email of {month} failed; its previous output is kept.")
+                continue
+
+            if frames:
+                jobs_df = pd.concat(frames, ignore_index=True)
+            else:
+                jobs_df = pd.DataFrame(columns=indeed.scrap_job_elements.JOB_COLUMNS)
+            write_raw_month(jobs_df, month)
+            summary["jobs"] += len(jobs_df)
+            if dedup:
+                indeed.process_remove_duplicates.raw_csv_to_inter_csv(f"{month}.csv", rebuild=True)
+
+            # Recorded only once the month is written, so a run stopped before that rebuilds it
+            progress["months"][month] = len(emails)
+            indeed.state_store.save_state(PROGRESS_STATE, progress)
+            summary["months_rebuilt"] += 1
+            logging.info(f"Backfill: rebuilt {month} from {len(emails)} emails.")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    logging.info(f"Backfill finished: {summary}")
+    return summary
@@ -0,0 +1,207 @@
+import logging
+import multiprocessing
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import indeed.scrap_overall
+import indeed.scrap_job_elements
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Threads fetching chunks of emails from Gmail, each with its own HTTP connection.
+# This is also the number of chunks fetched ahead of the writer.
+FETCH_WORKERS = 2
+
+# Processes running the job extraction; 0 extracts in the writer thread
+PARSE_WORKERS = 2
+
+# Times a chunk is resubmitted to a new pool when a worker dies (killed, out of memory) and
+# breaks the pool; the emails still unparsed after that fail
+PARSE_POOL_RETRIES = 2
+
+# Pools kept across poll cycles, so threads and workers are only started once; the fetch
+# threads keep their Gmail clients (indeed.gmail_auth.get_thread_gmail_service) with them
+_fetch_pool = None
+_fetch_pool_size = 0
+_parse_pool = None
+_parse_pool_size = 0
+
+# Log records of the workers, written by the parent's handlers
+_log_queue = None
+_log_listener = None
+
+def init_parse_worker(log_queue):
+    """Send the worker's log records to the parent, which owns the log file."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(QueueHandler(log_queue))
+
+def get_fetch_pool(fetch_workers):
+    """Return the shared fetch thread pool, (re)creating it if its size changed."""
+    global _fetch_pool, _fetch_pool_size
+
+    if _fetch_pool is None or _fetch_pool_size != fetch_workers:
+        if _fetch_pool is not None:
+            _fetch_pool.shutdown(wait=True)
+        _fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="gmail-fetch")
+        _fetch_pool_size = fetch_workers
+    return _fetch_pool
+
+def get_parse_pool(parse_workers):
+    """Return the shared extraction process pool, (re)creating it if its size changed or it was reset."""
+    global _parse_pool, _parse_pool_size, _log_queue, _log_listener
+
+    if _parse_pool is None or _parse_pool_size != parse_workers:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=True)
+        # Spawn rather than fork: forking while fetch threads hold locks (logging, SSL) can deadlock the workers
+        context = multiprocessing.get_context('spawn')
+        if _log_queue is None:
+            _log_queue = context.Queue()
+            _log_listener = QueueListener(_log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+            _log_listener.start()
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=parse_workers, mp_context=context, initializer=init_parse_worker, initargs=(_log_queue,)
+        )
+        _parse_pool_size = parse_workers
+    return _parse_pool
+
+def reset_parse_pool(pool):
+    """Drop a broken extraction pool, so that get_parse_pool() starts a new one."""
+    global _parse_pool
+
+    pool.shutdown(wait=False, cancel_futures=True)
+    if _parse_pool is pool:
+        _parse_pool = None
+
+def extract_jobs(email_data):
+    """Run the job extraction for one fetched email, returning the jobs or the raised exception."""
+    try:
+        return indeed.scrap_overall.extract_jobs_from_html(email_data["html_content"])
+    except Exception as e:
+        logging.error(f"Scraping failed for email {email_data['metadata']['subject']}: {e}", exc_info=True)
+        return e
+
+def extract_jobs_in_worker(email_data):
+    """
+    extract_jobs() for the process pool: also returns the block layout counts of the worker,
+    so they add up in the parent (indeed.scrap_job_elements.log_template_stats).
+    """
+    return extract_jobs(email_data), indeed.scrap_job_elements.take_template_counts()
+
+def iter_processed_chunks(chunks, fetch_chunk, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS):
+    """
+    Run the fetch and extraction stages of the email pipeline, yielding results to a single writer.
+
+    Chunks are fetched by up to fetch_workers threads and their emails are parsed by a pool of
+    parse_workers processes. Results are yielded in the original chunk and email order, so the
+    writer sees exactly what the serial path would. At most fetch_workers chunks are in flight,
+    and the next chunk is only pulled from chunks once a slot is free.
+
+    Args:
+        chunks (iterable): Lists of Gmail message IDs.
+        fetch_chunk (callable): Takes a chunk, returns a dict of message ID to email data or exception.
+            Called from the fetch threads, so it must use a Gmail client owned by the calling thread.
+        fetch_workers (int): Number of fetch threads; 1 or less fetches in the calling thread.
+        parse_workers (int): Number of extraction processes; 0 extracts in the calling thread.
+
+    Yields:
+        tuple: (chunk, fetched, jobs) where fetched maps each ID to its email data or exception,
+        and jobs maps each successfully fetched ID to its jobs DataFrame or exception.
+    """
+    if fetch_workers <= 1 and parse_workers <= 0:
+        for chunk in chunks:
+            fetched = fetch_chunk(chunk)
+            jobs = {
+                email_id: extract_jobs(email_data)
+                for email_id, email_data in fetched.items() if not isinstance(email_data, Exception)
+            }
+            yield chunk, fetched, jobs
+        return
+
+    fetch_pool = get_fetch_pool(max(fetch_workers, 1))
+    in_flight = deque()
+    chunk_iter = iter(chunks)
+
+    def submit_next():
+        chunk = next(chunk_iter, None)
+        if chunk is not None:
+            in_flight.append((chunk, fetch_pool.submit(fetch_chunk, chunk)))
+
+    try:
+        for _ in range(max(fetch_workers, 1)):
+            submit_next()
+
+        while in_flight:
+            chunk, fetch_future = in_flight.popleft()
+            try:
+                fetched = fetch_future.result()
+            except Exception as e:
+                logging.error(f"Fetching a chunk of {len(chunk)} emails failed: {e}", exc_info=True)
+                fetched = {email_id: e for email_id in chunk}
+            submit_next()
+
+            if parse_workers > 0:
+                jobs = extract_chunk_jobs(fetched, parse_workers)
+            else:
+                jobs = {
+                    email_id: extract_jobs(email_data)
+                    for email_id, email_data in fetched.items() if not isinstance(email_data, Exception)
+                }
+
+            yield chunk, fetched, jobs
+    finally:
+        # The pool outlives the cycle: if the writer stopped early, do not leave fetches running into the next one
+        for _, fetch_future in in_flight:
+            fetch_future.cancel()
+        wait([fetch_future for _, fetch_future in in_flight])
+
+def extract_chunk_jobs(fetched, parse_workers):
+    """
+    Extract the jobs of a fetched chunk in the process pool.
+
+    When a worker dies, the pool is broken and every email still in it fails with
+    BrokenProcessPool; the pool is then replaced and those emails resubmitted, up to
+    PARSE_POOL_RETRIES times, rather than failing them.
+
+    Returns:
+        dict: Each successfully fetched ID mapped to its jobs DataFrame or exception, in fetched order.
+    """
+    remaining = [email_id for email_id, email_data in fetched.items() if not isinstance(email_data, Exception)]
+    jobs = {}
+    for attempt in range(PARSE_POOL_RETRIES + 1):
+        pool = get_parse_pool(parse_workers)
+        broken = None
+        futures = {}
+        for email_id in remaining:
+            try:
+                futures[email_id] = pool.submit(extract_jobs_in_worker, fetched[email_id])
+            except BrokenProcessPool as e:
+                broken = e
+                break
+        for email_id, parse_future in futures.items():
+            try:
+                jobs[email_id], template_counts = parse_future.result()
+                indeed.scrap_job_elements.merge_template_counts(template_counts)
+            except BrokenProcessPool as e:
+                broken = e
+            except Exception as e:
+                logging.error(f"Extraction worker failed for email ID {email_id}: {e}", exc_info=True)
+                jobs[email_id] = e
+        remaining = [email_id for email_id in remaining if email_id not in jobs]
+        if broken is None:
+            break
+        reset_parse_pool(pool)
+        if attempt < PARSE_POOL_RETRIES:
+            logging.warning(f"Extraction pool broken ({broken}); retrying {len(remaining)} emails in a new pool.")
+        else:
+            logging.error(f"Extraction pool broken ({broken}); giving up on {len(remaining)} emails.")
+            for email_id in remaining:
+                jobs[email_id] = broken
+    return {email_id: jobs[email_id] for email_id in fetched if email_id in jobs}
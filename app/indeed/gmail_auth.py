@@ -1,11 +1,18 @@
 import os
 import json
 import logging
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.discovery_cache import get_static_doc
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.exceptions import RefreshError
+import indeed.gmail_quota
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,28 +31,43 @@ logger.info(f"Working directory set to: {working_dir}")
 TOKEN_PATH = os.path.join(working_dir, '.secrets', 'token.json')
 CREDENTIALS_PATH = os.path.join(working_dir, '.secrets', 'credentials.json')
 
+# Local copy of the Gmail discovery document, so building a client never needs the network
+DISCOVERY_CACHE_PATH = os.path.join(working_dir, 'data', 'cache', 'gmail_v1_discovery.json')
+DISCOVERY_URL = 'https://gmail.googleapis.com/$discovery/rest?version=v1'
 
-def ensure_secrets_directory():
+# Refresh the access token this long before it expires, instead of waiting for a 401
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Long-lived Gmail clients, one per account token file: {token_path: (service, creds)}
+_services = {}
+_services_lock = threading.Lock()
+# Credentials of each client built by build_gmail_service(), and the per-thread copies of a client
+_service_credentials = weakref.WeakKeyDictionary()
+_thread_services = threading.local()
+_discovery_document = None
+
+
+def ensure_secrets_directory(token_path=TOKEN_PATH):
     """Ensure the _secrets directory exists."""
-    os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(token_path), exist_ok=True)
 
 
-def load_credentials():
+def load_credentials(token_path=TOKEN_PATH):
     """Load existing credentials from the token file."""
-    if os.path.exists(TOKEN_PATH):
+    if os.path.exists(token_path):
         try:
-            with open(TOKEN_PATH, 'r') as token:
+            with open(token_path, 'r') as token:
                 creds_data = json.load(token)
                 creds = Credentials.from_authorized_user_info(creds_data, SCOPES)
                 logger.info("Loaded credentials from token.json.")
                 return creds
         except Exception as e:
             logger.warning(f"Error loading token file: {e}. Removing corrupted token file.")
-            os.remove(TOKEN_PATH)
+            os.remove(token_path)
     return None
 
 
-def save_credentials(creds):
+def save_credentials(creds, token_path=TOKEN_PATH):
     """Save credentials to the token file."""
     try:
         creds_data = {
@@ -56,57 +78,193 @@ def save_credentials(creds):
             'client_secret': creds.client_secret,
             'scopes': creds.scopes
         }
-        with open(TOKEN_PATH, 'w') as token:
+        with open(token_path, 'w') as token:
             json.dump(creds_data, token)
         logger.info("Credentials saved successfully.")
     except Exception as e:
         logger.error(f"Error saving credentials: {e}")
 
 
-def authenticate_gmail():
+def get_credentials(token_path=TOKEN_PATH):
+    """
+    Load, refresh or obtain credentials for the account stored in token_path.
+    Falls back to the OAuth flow only when the saved token cannot be refreshed.
+    """
+    ensure_secrets_directory(token_path)
+    creds = load_credentials(token_path)
+
+    # Refresh or obtain new credentials if needed
+    if creds:
+        if creds.expired:
+            if creds.refresh_token:
+                try:
+                    logger.info("Refreshing access token...")
+                    creds.refresh(Request())
+                    save_credentials(creds, token_path)  # Save updated credentials after refresh
+                except RefreshError as e:
+                    logger.warning(f"Token refresh failed: {e}. Initiating re-authentication.")
+                    creds = None  # Force re-authentication
+            else:
+                logger.warning("No refresh token available. Re-authentication required.")
+                creds = None
+
+    if not creds:
+        if not os.path.exists(CREDENTIALS_PATH):
+            raise FileNotFoundError(
+                f"No credentials file found at {CREDENTIALS_PATH}. "
+                "Please download it from Google Cloud Console."
+            )
+        logger.info("Starting new OAuth flow...")
+        flow = InstalledAppFlow.from_client_secrets_file(
+            CREDENTIALS_PATH, SCOPES
+        )
+        # Force new refresh_token issuance by setting prompt='consent'
+        creds = flow.run_local_server(port=8080, access_type='offline', prompt='consent')
+        save_credentials(creds, token_path)  # Save credentials for future use
+
+    return creds
+
+
+def is_discovery_document(document):
+    """Check that a document is a Gmail discovery document, not an error body."""
+    try:
+        return 'resources' in json.loads(document)
+    except ValueError:
+        return False
+
+
+def load_discovery_document():
+    """
+    Return the Gmail discovery document, reading it from the local cache file when possible.
+    The document is loaded once per process and written to the cache on first use; only a
+    complete document is cached, never an error response.
+    """
+    global _discovery_document
+
+    if _discovery_document is None:
+        document = None
+        if os.path.exists(DISCOVERY_CACHE_PATH):
+            with open(DISCOVERY_CACHE_PATH, 'r', encoding='utf-8') as file:
+                document = file.read()
+            if not is_discovery_document(document):
+                logger.warning(f"Ignoring invalid cached discovery document {DISCOVERY_CACHE_PATH}.")
+                document = None
+        if document is None:
+            document = get_static_doc('gmail', 'v1')
+            if document is None:
+                logger.info(f"Downloading Gmail discovery document from {DISCOVERY_URL}")
+                response, content = httplib2.Http().request(DISCOVERY_URL)
+                if response.status != 200:
+                    raise HttpError(response, content, uri=DISCOVERY_URL)
+                document = content.decode('utf-8')
+            if not is_discovery_document(document):
+                raise ValueError(f"Invalid Gmail discovery document from {DISCOVERY_URL}.")
+            os.makedirs(os.path.dirname(DISCOVERY_CACHE_PATH), exist_ok=True)
+            with open(DISCOVERY_CACHE_PATH, 'w', encoding='utf-8') as file:
+                file.write(document)
+        _discovery_document = document
+    return _discovery_document
+
+
+def build_gmail_service(creds):
+    """Build a Gmail API client from the cached discovery document."""
+    service = build_from_document(load_discovery_document(), credentials=creds)
+    with _services_lock:
+        _service_credentials[service] = creds
+    return service
+
+
+def token_expires_soon(creds):
+    """Check whether the access token expires within TOKEN_REFRESH_MARGIN."""
+    if not creds.valid:
+        return True
+    if creds.expiry is None:
+        return False
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now < TOKEN_REFRESH_MARGIN
+
+
+def get_gmail_service(token_path=TOKEN_PATH):
+    """
+    Return the long-lived Gmail API service for the account stored in token_path.
+
+    The client is built once and reused across polls. Its token is refreshed shortly
+    before it expires; the client is only rebuilt after invalidate_gmail_service().
+    """
+    with _services_lock:
+        entry = _services.get(token_path)
+        if entry is None:
+            creds = get_credentials(token_path)
+            service = build_gmail_service(creds)
+            _services[token_path] = (service, creds)
+            logger.info(f"Built Gmail service for {token_path}.")
+            return service
+
+        service, creds = entry
+        if token_expires_soon(creds) and creds.refresh_token:
+            try:
+                logger.info("Access token expires soon, refreshing...")
+                creds.refresh(Request())
+                save_credentials(creds, token_path)
+            except RefreshError as e:
+                logger.warning(f"Token refresh failed: {e}. Rebuilding Gmail service.")
+                _services.pop(token_path, None)
+                creds = get_credentials(token_path)
+                service = build_gmail_service(creds)
+                _services[token_path] = (service, creds)
+        return service
+
+
+def get_thread_gmail_service(service):
+    """
+    Return a Gmail API client owned by the calling thread, for the account of service.
+
+    httplib2 connections are not thread-safe, so each worker thread gets its own client and
+    HTTP connection, built once from the credentials of service and reused for as long as
+    service is. A service not built by build_gmail_service() is returned as it is.
+    """
+    try:
+        with _services_lock:
+            creds = _service_credentials.get(service)
+    except TypeError:
+        creds = None  # Not weak-referenceable, so not one of ours
+    if creds is None:
+        return service
+
+    services = getattr(_thread_services, 'services', None)
+    if services is None:
+        services = _thread_services.services = weakref.WeakKeyDictionary()
+    thread_service = services.get(service)
+    if thread_service is None:
+        thread_service = services[service] = build_gmail_service(creds)
+    return thread_service
+
+
+def invalidate_gmail_service(token_path=TOKEN_PATH):
+    """Drop the cached Gmail service after an auth failure, so the next call rebuilds it."""
+    with _services_lock:
+        if _services.pop(token_path, None) is not None:
+            logger.info(f"Invalidated Gmail service for {token_path}.")
+
+
+def authenticate_gmail(token_path=TOKEN_PATH):
     """
     Authenticate and return the Gmail API service with enhanced token management.
     This method avoids repeated re-authentication by refreshing the token if possible.
+    The verified service is kept as the long-lived client returned by get_gmail_service().
     """
-    ensure_secrets_directory()
-
     try:
-        creds = load_credentials()
-
-        # Refresh or obtain new credentials if needed
-        if creds:
-            if creds.expired:
-                if creds.refresh_token:
-                    try:
-                        logger.info("Refreshing access token...")
-                        creds.refresh(Request())
-                        save_credentials(creds)  # Save updated credentials after refresh
-                    except RefreshError as e:
-                        logger.warning(f"Token refresh failed: {e}. Initiating re-authentication.")
-                        creds = None  # Force re-authentication
-                else:
-                    logger.warning("No refresh token available. Re-authentication required.")
-                    creds = None
-
-        if not creds:
-            if not os.path.exists(CREDENTIALS_PATH):
-                raise FileNotFoundError(
-                    f"No credentials file found at {CREDENTIALS_PATH}. "
-                    "Please download it from Google Cloud Console."
-                )
-            logger.info("Starting new OAuth flow...")
-            flow = InstalledAppFlow.from_client_secrets_file(
-                CREDENTIALS_PATH, SCOPES
-            )
-            # Force new refresh_token issuance by setting prompt='consent'
-            creds = flow.run_local_server(port=8080, access_type='offline', prompt='consent')
-            save_credentials(creds)  # Save credentials for future use
+        creds = get_credentials(token_path)
 
         # Build and verify the Gmail service
-        service = build('gmail', 'v1', credentials=creds, cache_discovery=False)
-        user_profile = service.users().getProfile(userId='me').execute()
+        service = build_gmail_service(creds)
+        user_profile = indeed.gmail_quota.execute(service.users().getProfile(userId='me'))
         logger.info(f"Successfully authenticated as: {user_profile.get('emailAddress')}")
 
+        with _services_lock:
+            _services[token_path] = (service, creds)
+
         return service
 
     except Exception as e:
@@ -117,7 +275,7 @@ def authenticate_gmail():
 def get_account_email(service, user_id='me'):
     """Retrieve the email address of the authenticated Gmail account."""
     try:
-        profile = service.users().getProfile(userId=user_id).execute()
+        profile = indeed.gmail_quota.execute(service.users().getProfile(userId=user_id))
         email_address = profile.get('emailAddress')
         logger.info(f"Authenticated Email Address: {email_address}")
         return email_address
@@ -0,0 +1,44 @@
+import logging
+import indeed.gmail_quota
+
+import indeed.logging_config 
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Gmail accepts up to 100 calls per batch request; 50 keeps each batch well under the per-user rate limit
+BATCH_SIZE = 50
+
+def batch_get_messages(service, email_ids, batch_size=BATCH_SIZE, **get_kwargs):
+    """
+    Get many Gmail messages through the batch endpoint, one HTTP round trip per batch.
+
+    Args:
+        service: The Gmail API service instance.
+        email_ids (list): Gmail message IDs to get.
+        batch_size (int): Maximum number of messages per batch request.
+        **get_kwargs: Extra arguments for messages.get, such as format or metadataHeaders.
+
+    Returns:
+        dict: Message ID mapped to the message resource, or to the exception raised for that message.
+    """
+    results = {}
+    units_per_message = indeed.gmail_quota.QUOTA_UNITS["gmail.users.messages.get"]
+
+    def handle_response(request_id, response, exception):
+        results[request_id] = exception if exception is not None else response
+
+    for start in range(0, len(email_ids), batch_size):
+        chunk = email_ids[start:start + batch_size]
+        batch = service.new_batch_http_request(callback=handle_response)
+        for email_id in chunk:
+            batch.add(service.users().messages().get(userId='me', id=email_id, **get_kwargs), request_id=email_id)
+        try:
+            # A batch costs the sum of its calls; only the batch as a whole is retried here
+            indeed.gmail_quota.call_with_quota(batch.execute, units=units_per_message * len(chunk))
+        except Exception as e:
+            logging.error(f"Batch request for {len(chunk)} messages failed: {e}", exc_info=True)
+            for email_id in chunk:
+                results.setdefault(email_id, e)
+
+    return results
@@ -0,0 +1,85 @@
+import logging
+from googleapiclient.errors import HttpError
+import indeed.gmail_quota
+import indeed.state_store
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Labels applied by the email pipeline, by role
+PIPELINE_LABELS = {
+    "success_fetched": "email fetched successfully",
+    "failure_fetched": "failed fetching",
+    "success_scraped": "successfully scraped",
+    "failure_scraped": "failed scraping",
+    "success_final": "success",
+    "failure_final": "failure",
+}
+
+# Name of the state file holding the label name to label ID mapping
+LABELS_STATE = "gmail_labels"
+
+# In-memory label name to label ID mapping, mirrored on disk
+_label_ids = {}
+
+def resolve_pipeline_labels(service, refresh=False):
+    """
+    Return the label IDs of all pipeline labels, keyed by role.
+
+    Args:
+        service: The Gmail API service instance.
+        refresh (bool): If True, ignore the cached IDs and list the labels again.
+    """
+    label_ids = resolve_labels(service, PIPELINE_LABELS.values(), refresh=refresh)
+    return {role: label_ids[name] for role, name in PIPELINE_LABELS.items()}
+
+def resolve_labels(service, label_names, refresh=False):
+    """
+    Return the IDs of the given labels, creating the missing ones.
+
+    IDs come from memory, then from the state file; a single labels.list call is made
+    only when a name is unknown to both or refresh is True.
+
+    Args:
+        service: The Gmail API service instance.
+        label_names (iterable): Names of the labels to resolve.
+        refresh (bool): If True, ignore the cached IDs and list the labels again.
+
+    Returns:
+        dict: Label name mapped to label ID.
+    """
+    label_names = list(label_names)
+
+    if refresh:
+        invalidate_labels()
+    if not _label_ids:
+        _label_ids.update(indeed.state_store.load_state(LABELS_STATE, default={}))
+
+    missing = [name for name in label_names if name not in _label_ids]
+    if missing:
+        label_list = indeed.gmail_quota.execute(service.users().labels().list(userId='me'))
+        for label in label_list.get('labels', []):
+            _label_ids[label['name']] = label['id']
+
+        for name in missing:
+            if name in _label_ids:
+                continue
+            label_body = {"name": name, "labelListVisibility": "labelShow", "messageListVisibility": "show"}
+            new_label = indeed.gmail_quota.execute(service.users().labels().create(userId='me', body=label_body))
+            _label_ids[name] = new_label['id']
+            logging.info(f"Created label '{name}'.")
+
+        indeed.state_store.save_state(LABELS_STATE, _label_ids)
+
+    return {name: _label_ids[name] for name in label_names}
+
+def invalidate_labels():
+    """Forget the cached label IDs, in memory and on disk."""
+    _label_ids.clear()
+    indeed.state_store.clear_state(LABELS_STATE)
+
+def is_unknown_label_error(error):
+    """Check whether a Gmail API error was caused by a label ID that no longer exists."""
+    return isinstance(error, HttpError) and error.resp.status in (400, 404) and 'label' in str(error).lower()
@@ -1,6 +1,10 @@
 import time
 import logging
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+import indeed.gmail_auth
 import indeed.process_latest_emails
+import indeed.poll_scheduler
 
 import indeed.logging_config 
 
@@ -10,15 +14,20 @@ logger = indeed.logging_config.get_logger(__name__)
 # Flag to control the fetching process
 is_fetching = False
 
-def start_email_fetch(service, senders, error_recipient, interval=10):
+def start_email_fetch(service, senders, error_recipient, interval=10, scheduler=None):
     """
     Start fetching emails periodically.
 
+    The delay between polls adapts to the traffic: it stays at the lower bound while new
+    emails keep arriving and backs off exponentially while the mailbox is idle.
+
     Args:
         service: The Gmail API service instance.
         senders (list): List of sender email addresses to filter emails from.
         error_recipient (str): Email address to notify in case of processing errors.
-        interval (int): Time interval (in seconds) between email fetch attempts.
+        interval (int): Shortest time interval (in seconds) between email fetch attempts.
+        scheduler (AdaptivePollScheduler): Chooses the delay between polls; by default one
+            with the default time-of-day profiles and interval as its lower bound.
     """
     global is_fetching
 
@@ -28,21 +37,34 @@ def start_email_fetch(service, senders, error_recipient, interval=10):
 
     is_fetching = True
 
+    if scheduler is None:
+        scheduler = indeed.poll_scheduler.AdaptivePollScheduler(min_interval=interval)
+
     # Main fetching loop
     logging.info("Email fetching started.")
     try:
         while is_fetching:
+            new_messages = 0
             try:
-                # Refresh Gmail auth
-                service = indeed.gmail_auth.authenticate_gmail()
-                indeed.process_latest_emails.process_emails_with_transaction(
+                # Reuse the long-lived Gmail client; its token is refreshed before it expires
+                service = indeed.gmail_auth.get_gmail_service()
+                new_messages = indeed.process_latest_emails.process_emails_with_transaction(
                     service, senders, error_recipient
-                )
+                ) or 0
                 logging.info("Waiting for new emails...")
+            except RefreshError as e:
+                logging.error(f"Gmail credentials are no longer valid: {e}", exc_info=True)
+                indeed.gmail_auth.invalidate_gmail_service()
+            except HttpError as e:
+                logging.error(f"Gmail API error while fetching emails: {e}", exc_info=True)
+                if e.resp.status == 401:
+                    indeed.gmail_auth.invalidate_gmail_service()
             except Exception as e:
                 logging.error(f"Error while fetching emails: {e}", exc_info=True)
 
-            time.sleep(interval)
+            delay = scheduler.next_interval(new_messages)
+            scheduler.publish_status()
+            time.sleep(delay)
     except KeyboardInterrupt:
         logging.info("KeyboardInterrupt detected. Stopping fetching process.")
         stop_email_fetch()
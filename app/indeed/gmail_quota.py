@@ -0,0 +1,169 @@
+import time
+import random
+import logging
+import threading
+from collections import deque
+from googleapiclient.errors import HttpError
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Gmail API quota units per method (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {
+    "gmail.users.getProfile": 1,
+    "gmail.users.labels.list": 1,
+    "gmail.users.labels.create": 5,
+    "gmail.users.messages.get": 5,
+    "gmail.users.messages.list": 5,
+    "gmail.users.messages.modify": 5,
+    "gmail.users.messages.batchModify": 50,
+    "gmail.users.messages.send": 100,
+    "gmail.users.history.list": 2,
+}
+DEFAULT_UNITS = 5
+
+# Gmail allows 250 quota units per user per second; stay a little below it
+UNITS_PER_SECOND = 200
+BURST_UNITS = 250
+
+# Retry policy: exponential backoff with full jitter, capped, unless the server sends Retry-After
+MAX_RETRIES = 5
+BASE_DELAY = 1
+MAX_DELAY = 32
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded")
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until enough quota units have accumulated."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, units):
+        """Take units from the bucket, sleeping as needed. Returns the time spent waiting."""
+        # A single call may cost more than the bucket holds (large batches); let it drain the bucket
+        units = min(units, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= units:
+                    self.tokens -= units
+                    return waited
+                wait = (units - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+_bucket = TokenBucket(UNITS_PER_SECOND, BURST_UNITS)
+
+# Usage statistics: (timestamp, units) of the calls made in the last minute, and counters
+_usage_lock = threading.Lock()
+_recent_calls = deque()
+_stats = {"calls": 0, "units": 0, "retries": 0, "throttled_seconds": 0.0}
+
+def request_units(request):
+    """Return the quota cost of a googleapiclient request, from its method ID."""
+    return QUOTA_UNITS.get(getattr(request, "methodId", None), DEFAULT_UNITS)
+
+def execute(request, units=None, retries=MAX_RETRIES):
+    """
+    Execute a googleapiclient request through the shared rate limiter and retry policy.
+
+    Args:
+        request: The HttpRequest to execute.
+        units (int): Quota cost, defaults to the cost of the request's method.
+        retries (int): Maximum number of retries on rate-limit and server errors.
+    """
+    return call_with_quota(request.execute, units or request_units(request), retries)
+
+def call_with_quota(call, units=DEFAULT_UNITS, retries=MAX_RETRIES):
+    """
+    Run a Gmail API call once enough quota units are available, retrying transient errors.
+
+    429s, 5xx and 403 rate-limit errors are retried, waiting for Retry-After when the server
+    sends it and for a jittered exponential backoff otherwise. Any other error is raised at once.
+
+    Args:
+        call (callable): Performs the API call.
+        units (int): Quota cost of the call.
+        retries (int): Maximum number of retries.
+    """
+    for attempt in range(retries + 1):
+        throttled = _bucket.acquire(units)
+        record_usage(units, throttled)
+        try:
+            return call()
+        except HttpError as error:
+            if attempt == retries or not is_retryable(error):
+                raise
+            delay = retry_after_seconds(error)
+            if delay is None:
+                delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+            with _usage_lock:
+                _stats["retries"] += 1
+            logging.warning(f"Gmail API error {error.resp.status}, retrying in {delay:.1f}s ({attempt + 1}/{retries}).")
+            time.sleep(delay)
+
+def is_retryable(error):
+    """Check whether a Gmail API error is a rate-limit or transient server error."""
+    status = error.resp.status
+    if status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and any(reason in (error.content or b"") for reason in RATE_LIMIT_REASONS)
+
+def retry_after_seconds(error):
+    """Return the Retry-After delay sent with an error, in seconds, or None."""
+    value = error.resp.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+def record_usage(units, throttled_seconds=0.0):
+    """Record a call in the usage statistics."""
+    now = time.monotonic()
+    with _usage_lock:
+        _recent_calls.append((now, units))
+        while _recent_calls and _recent_calls[0][0] < now - 60:
+            _recent_calls.popleft()
+        _stats["calls"] += 1
+        _stats["units"] += units
+        _stats["throttled_seconds"] += throttled_seconds
+
+def get_quota_usage():
+    """
+    Report how much of the quota budget is being used.
+
+    Returns:
+        dict: Units used in the last minute, the per-minute budget, the utilization ratio,
+        and cumulative calls, units, retries and time spent throttled.
+    """
+    now = time.monotonic()
+    with _usage_lock:
+        while _recent_calls and _recent_calls[0][0] < now - 60:
+            _recent_calls.popleft()
+        units_last_minute = sum(units for _, units in _recent_calls)
+        budget = UNITS_PER_SECOND * 60
+        return {
+            "units_last_minute": units_last_minute,
+            "budget_per_minute": budget,
+            "utilization": units_last_minute / budget,
+            **_stats,
+        }
+
+def log_quota_usage():
+    """Log the current quota usage."""
+    usage = get_quota_usage()
+    logging.info(
+        f"Gmail quota: {usage['units_last_minute']}/{usage['budget_per_minute']} units in the last minute "
+        f"({usage['utilization']:.0%}), {usage['calls']} calls, {usage['retries']} retries, "
+        f"{usage['throttled_seconds']:.1f}s throttled."
+    )
@@ -0,0 +1,349 @@
+import os
+import glob
+import logging
+import pandas as pd
+from html.parser import HTMLParser
+from html.entities import html5
+from collections import Counter
+from bs4 import BeautifulSoup, FeatureNotFound
+from bs4.builder import HTMLParserTreeBuilder
+import indeed.scrap_job_blocks
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# HTML backend used to locate job blocks and split them into rows.
+# "html.parser" is the reference; "html.parser-stream" runs the same tokenizer without
+# building a tree; "lxml" parses and walks the tree natively in lxml, "bs4-lxml" keeps the
+# BeautifulSoup walk but builds the tree with lxml.
+PARSER_BACKEND = os.environ.get("INDEED_PARSER_BACKEND", "html.parser")
+REFERENCE_BACKEND = "html.parser"
+
+# Emails larger than this (in characters) are read by the streaming backend when the
+# reference backend is configured, instead of building a BeautifulSoup tree
+STREAMING_THRESHOLD = 200_000
+
+# Chunk size the streaming backend feeds the tokenizer with
+STREAMING_CHUNK_SIZE = 64 * 1024
+
+# Fixtures for compare_backends(): job block <tr> rows captured from real emails
+FIXTURE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'usecases', 'interm files'))
+
+def extract_block_rows(html_content, backend=None):
+    """
+    Locate the job blocks of an email and split each one into rows.
+
+    Args:
+        html_content (str): Raw HTML of the email.
+        backend (str): Name of the backend, defaults to PARSER_BACKEND, or to the streaming
+            backend for emails over STREAMING_THRESHOLD when PARSER_BACKEND is the reference.
+
+    Returns:
+        list: One list per job block, of (columns, link, markup) rows as returned by
+        indeed.scrap_job_blocks.locate_job_block_rows.
+    """
+    if backend is None:
+        backend = PARSER_BACKEND
+        if backend == REFERENCE_BACKEND and len(html_content) > STREAMING_THRESHOLD:
+            backend = "html.parser-stream"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend '{backend}'. Choose one of {sorted(BACKENDS)}.")
+    return BACKENDS[backend](html_content)
+
+def soup_block_rows(html_content, builder):
+    """Block rows through BeautifulSoup with the given tree builder."""
+    soup = BeautifulSoup(html_content, builder)
+    return indeed.scrap_job_blocks.locate_job_block_rows(soup)
+
+def html_parser_block_rows(html_content):
+    return soup_block_rows(html_content, 'html.parser')
+
+def bs4_lxml_block_rows(html_content):
+    return soup_block_rows(html_content, 'lxml')
+
+class LocatorSoup:
+    """
+    Stands in for the BeautifulSoup object that bs4's html.parser backend builds a tree
+    into. It receives the same calls but forwards them to a JobBlockLocator, reproducing
+    what the tree would hold: unmatched end tags are ignored, an end tag closes every element
+    opened after its start tag, void elements close at once, whitespace-only strings collapse
+    to one space or newline, and strings inside <script>, <style>, ... or comments are not
+    part of the text of a <td>.
+    """
+
+    def __init__(self, locator):
+        self.locator = locator
+        self.builder = HTMLParserTreeBuilder()
+        self.open_tags = []
+        self.open_tag_counts = Counter()
+        self.current_data = []
+        self.string_container_depth = 0
+        self.preserve_whitespace_depth = 0
+
+    def handle_starttag(self, name, attrs):
+        """Open an element; returns True for a void element, which is closed at once."""
+        self.endData()
+        self.locator.start(name, attrs)
+        self.open_tags.append(name)
+        self.open_tag_counts[name] += 1
+        if name in self.builder.string_containers:
+            self.string_container_depth += 1
+        if name in self.builder.preserve_whitespace_tags:
+            self.preserve_whitespace_depth += 1
+        return name in self.builder.empty_element_tags
+
+    def handle_endtag(self, name):
+        self.endData()
+        if not self.open_tag_counts[name]:
+            return
+        while True:
+            popped = self.open_tags.pop()
+            self.open_tag_counts[popped] -= 1
+            if popped in self.builder.string_containers:
+                self.string_container_depth -= 1
+            if popped in self.builder.preserve_whitespace_tags:
+                self.preserve_whitespace_depth -= 1
+            self.locator.end(popped)
+            if popped == name:
+                break
+
+    def handle_data(self, data):
+        self.current_data.append(data)
+
+    def endData(self, content=None):
+        """
+        End the current string. content is True for CDATA sections, False for comments,
+        declarations and processing instructions, and None for text, which is content unless
+        it is inside a string container tag (BeautifulSoup's Script, Stylesheet, ... strings).
+        """
+        if not self.current_data:
+            return
+        data = ''.join(self.current_data)
+        self.current_data = []
+        if not self.preserve_whitespace_depth and not data.strip('\x20\x0a\x09\x0c\x0d'):
+            data = '\n' if '\n' in data else ' '
+        if content is None:
+            content = not self.string_container_depth
+        self.locator.text(data, content)
+
+class StreamingHTMLParser(HTMLParser):
+    """
+    The standard library tokenizer, handling tags, references and comments the way bs4's
+    html.parser tree builder does (BeautifulSoupHTMLParser), with a LocatorSoup in place
+    of the tree.
+    """
+
+    def __init__(self, soup):
+        super().__init__(convert_charrefs=False)
+        self.soup = soup
+        # Void elements closed at their start tag, whose end tag must then be ignored
+        self.already_closed_empty_element = []
+
+    def handle_startendtag(self, name, attrs):
+        self.handle_starttag(name, attrs, handle_empty_element=False)
+        self.handle_endtag(name)
+
+    def handle_starttag(self, name, attrs, handle_empty_element=True):
+        # Later duplicate attributes replace earlier ones, attributes without a value are empty
+        attr_dict = {key: '' if value is None else value for key, value in attrs}
+        is_empty_element = self.soup.handle_starttag(name, attr_dict)
+        if is_empty_element and handle_empty_element:
+            self.handle_endtag(name, check_already_closed=False)
+            self.already_closed_empty_element.append(name)
+
+    def handle_endtag(self, name, check_already_closed=True):
+        if check_already_closed and name in self.already_closed_empty_element:
+            self.already_closed_empty_element.remove(name)
+        else:
+            self.soup.handle_endtag(name)
+
+    def handle_data(self, data):
+        self.soup.handle_data(data)
+
+    def handle_charref(self, name):
+        number = int(name[1:], 16) if name[:1] in ('x', 'X') else int(name)
+        data = None
+        if number < 256:
+            # Like bs4, code points below 256 are read as windows-1252 bytes
+            try:
+                data = bytes([number]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(number)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        self.handle_data(html5.get(f"{name};", f"&{name}"))
+
+    def handle_comment(self, data):
+        self.handle_special(data, False)
+
+    def handle_decl(self, data):
+        self.handle_special(data[len("DOCTYPE "):], False)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self.handle_special(data[len('CDATA['):], True)
+        else:
+            self.handle_special(data, False)
+
+    def handle_pi(self, data):
+        self.handle_special(data, False)
+
+    def handle_special(self, data, content):
+        """A comment, declaration, CDATA section or processing instruction: a string of its own."""
+        self.soup.endData()
+        self.soup.handle_data(data)
+        self.soup.endData(content)
+
+def stream_block_rows(html_content):
+    """
+    Block rows without building a tree: the html.parser tokenizer, fed in chunks, drives a
+    JobBlockLocator through LocatorSoup. Only the text of the rows inside tables is kept,
+    so memory stays far below that of a parsed tree, and the rows match the html.parser
+    backend.
+    """
+    locator = indeed.scrap_job_blocks.JobBlockLocator()
+    soup = LocatorSoup(locator)
+    parser = StreamingHTMLParser(soup)
+    for start in range(0, len(html_content), STREAMING_CHUNK_SIZE):
+        parser.feed(html_content[start:start + STREAMING_CHUNK_SIZE])
+    parser.close()
+    soup.endData()
+    return locator.close()
+
+def lxml_block_rows(html_content):
+    """
+    Block rows straight from an lxml tree, walked once into a JobBlockLocator.
+    Comments and processing instructions are nodes in lxml; their text counts for the job
+    labels only, like BeautifulSoup's Comment strings.
+    """
+    import lxml.html
+    from lxml import etree
+
+    root = lxml.html.document_fromstring(html_content)
+    locator = indeed.scrap_job_blocks.JobBlockLocator()
+    non_content_depth = 0
+    for event, element in etree.iterwalk(root, events=('start', 'end', 'comment', 'pi')):
+        tag = element.tag
+        if event in ('comment', 'pi'):
+            locator.text(element.text, False)
+            locator.text(element.tail, non_content_depth == 0)
+            continue
+        if event == 'start':
+            locator.start(tag, element.attrib)
+            if tag in indeed.scrap_job_blocks.NON_CONTENT_TAGS:
+                non_content_depth += 1
+            locator.text(element.text, non_content_depth == 0)
+        else:
+            locator.end(tag)
+            if tag in indeed.scrap_job_blocks.NON_CONTENT_TAGS:
+                non_content_depth -= 1
+            locator.text(element.tail, non_content_depth == 0)
+    return locator.close()
+
+BACKENDS = {
+    "html.parser": html_parser_block_rows,
+    "html.parser-stream": stream_block_rows,
+    "bs4-lxml": bs4_lxml_block_rows,
+    "lxml": lxml_block_rows,
+}
+
+def compare_backends(html_content, backends=None):
+    """
+    Differential check: extract the block rows of an email with every backend and report
+    where they disagree with the reference backend.
+
+    Args:
+        html_content (str): Raw HTML of the email.
+        backends (list): Backends to check, defaults to all of them.
+
+    Returns:
+        dict: Backend name mapped to a description of the first difference, for each
+        backend that disagrees. Empty when all backends agree.
+    """
+    expected = extract_block_rows(html_content, REFERENCE_BACKEND)
+    differences = {}
+    for backend in backends or BACKENDS:
+        if backend == REFERENCE_BACKEND:
+            continue
+        try:
+            actual = extract_block_rows(html_content, backend)
+        except (ImportError, FeatureNotFound) as e:
+            logging.warning(f"Skipping HTML parser backend '{backend}': {e}")
+            continue
+        if actual == expected:
+            continue
+        if len(actual) != len(expected):
+            differences[backend] = f"{len(actual)} job blocks, expected {len(expected)}"
+            continue
+        for idx, (actual_rows, expected_rows) in enumerate(zip(actual, expected), start=1):
+            if actual_rows != expected_rows:
+                differences[backend] = f"job block {idx}: {actual_rows!r} != {expected_rows!r}"
+                break
+    return differences
+
+def load_fixture_emails(fixture_dir=FIXTURE_DIR):
+    """
+    Rebuild one email per fixture file from the captured job block rows.
+
+    Each fixture is a <tr> row DataFrame captured from get_individual_job; rows nested in
+    another row are already part of that row's HTML, so only the outer rows are kept.
+
+    Returns:
+        dict: Fixture file name mapped to the email HTML.
+    """
+    emails = {}
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.csv"))):
+        tr_html = pd.read_csv(path, dtype=str)["TR HTML"].dropna().tolist()
+        outer_rows = []
+        for html in tr_html:
+            if not any(html in outer for outer in outer_rows):
+                outer_rows.append(html)
+        blocks = "".join(f"<tr><td><table><tbody>{''.join(outer_rows)}</tbody></table></td></tr>" for _ in range(2))
+        emails[os.path.basename(path)] = f"<html><body><table>{blocks}</table></body></html>"
+    return emails
+
+def compare_backends_on_fixtures(fixture_dir=FIXTURE_DIR, backends=None):
+    """
+    Run compare_backends() on every fixture email, checking the job records as well.
+
+    Returns:
+        dict: Fixture file name mapped to its differences, for each fixture where a backend
+        disagrees with the reference. Empty when all backends agree on all fixtures.
+
+    Raises:
+        FileNotFoundError: If the fixture directory holds no fixtures, which would otherwise
+        read as all backends agreeing.
+    """
+    from indeed.scrap_overall import scrap_all_block_rows
+
+    emails = load_fixture_emails(fixture_dir)
+    if not emails:
+        raise FileNotFoundError(f"No fixture files found in {fixture_dir}.")
+    failures = {}
+    for name, html_content in emails.items():
+        differences = compare_backends(html_content, backends)
+        expected_jobs = scrap_all_block_rows(extract_block_rows(html_content, REFERENCE_BACKEND))
+        for backend in backends or BACKENDS:
+            if backend == REFERENCE_BACKEND or backend in differences:
+                continue
+            try:
+                jobs = scrap_all_block_rows(extract_block_rows(html_content, backend))
+            except (ImportError, FeatureNotFound):
+                continue
+            ignored = ["posting_date", "fetched_date"]
+            if not jobs.drop(columns=ignored).equals(expected_jobs.drop(columns=ignored)):
+                differences[backend] = "job records differ"
+        if differences:
+            failures[name] = differences
+    return failures
+
+# if __name__ == "__main__":
+#     print(compare_backends_on_fixtures() or "All HTML parser backends agree.")
@@ -0,0 +1,60 @@
+import os
+import logging
+import pandas as pd
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Pre-aggregated job counts, one CSV per month, kept up to date by the deduplication stage
+AGGREGATES_DIR = "./data/aggregates/"
+
+# A count is kept per distinct combination of these values, enough to answer the dashboard's
+# grouped views under any company/location/type filter and posting date window
+AGGREGATE_COLUMNS = ['company', 'location', 'type', 'posting_date']
+
+def counts_path(month):
+    """Return the file path of the job counts of a month."""
+    return os.path.join(AGGREGATES_DIR, f"{month}_counts.csv")
+
+def count_jobs(jobs_df):
+    """Count jobs per AGGREGATE_COLUMNS combination; missing values form their own groups."""
+    if jobs_df.empty:
+        return pd.DataFrame({**{column: pd.Series(dtype=object) for column in AGGREGATE_COLUMNS}, 'count': pd.Series(dtype='int64')})
+    keys = jobs_df.reindex(columns=AGGREGATE_COLUMNS)
+    return keys.groupby(AGGREGATE_COLUMNS, dropna=False).size().reset_index(name='count')
+
+def read_month_counts(month):
+    """Return the stored job counts of a month, or None if they were never computed."""
+    file_path = counts_path(month)
+    if not os.path.exists(file_path):
+        return None
+    return pd.read_csv(file_path, dtype={column: str for column in AGGREGATE_COLUMNS})
+
+def write_month_counts(month, counts):
+    """Atomically replace the job counts of a month."""
+    os.makedirs(AGGREGATES_DIR, exist_ok=True)
+    file_path = counts_path(month)
+    temp_path = f"{file_path}.tmp"
+    counts.to_csv(temp_path, index=False)
+    os.replace(temp_path, file_path)
+
+def rebuild_month_counts(month, jobs_df):
+    """Recompute the job counts of a month from all its deduplicated jobs."""
+    write_month_counts(month, count_jobs(jobs_df))
+    logging.info(f"Rebuilt the job counts of {month} from {len(jobs_df)} jobs.")
+
+def add_month_counts(month, new_jobs):
+    """
+    Add newly deduplicated jobs to the counts of a month.
+    Only the counts file is read and rewritten, never the month's jobs.
+    """
+    if new_jobs.empty:
+        return
+    counts = count_jobs(new_jobs)
+    stored = read_month_counts(month)
+    if stored is not None:
+        counts = pd.concat([stored, counts], ignore_index=True)
+        counts = counts.groupby(AGGREGATE_COLUMNS, dropna=False)['count'].sum().reset_index()
+    write_month_counts(month, counts)
@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import logging
+import threading
+import pandas as pd
+import indeed.job_identity
+import indeed.job_aggregates
+import indeed.scrap_job_elements
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# SQLite database of the "sqlite" storage backend (see indeed.job_storage.STORAGE_BACKEND)
+DATABASE_PATH = "./data/jobs.sqlite3"
+
+# Stored job columns and their SQLite types
+COLUMN_TYPES = {'rating': 'REAL', 'days': 'INTEGER'}
+
+# Columns the dashboard filters on, indexed in the jobs table
+FILTER_COLUMNS = {'companies': 'company', 'locations': 'location', 'types': 'type'}
+
+_connection = None
+_connection_pid = None
+_lock = threading.Lock()
+
+def get_connection():
+    """Open the database once per process, creating the tables and indexes on first use."""
+    global _connection, _connection_pid
+
+    if _connection is None or _connection_pid != os.getpid():
+        os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+        connection = sqlite3.connect(DATABASE_PATH, timeout=30, check_same_thread=False)
+        # WAL lets the dashboard read while the listener writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(
+            f"{column} {COLUMN_TYPES.get(column, 'TEXT')}" for column in indeed.scrap_job_elements.JOB_COLUMNS
+        )
+        # Every row as written by the listener, like the raw CSVs
+        connection.execute(f"CREATE TABLE IF NOT EXISTS raw_jobs (id INTEGER PRIMARY KEY, month TEXT NOT NULL, {columns})")
+        connection.execute("CREATE INDEX IF NOT EXISTS raw_jobs_month ON raw_jobs (month)")
+        # One row per job, like the intermediate CSVs
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, job_key TEXT NOT NULL UNIQUE, month TEXT NOT NULL, {columns})"
+        )
+        for column in ('month', 'company', 'location', 'type', 'posting_date'):
+            connection.execute(f"CREATE INDEX IF NOT EXISTS jobs_{column} ON jobs ({column})")
+        connection.commit()
+        _connection, _connection_pid = connection, os.getpid()
+    return _connection
+
+def job_rows(jobs_df):
+    """Return the JOB_COLUMNS values of a jobs DataFrame as tuples of plain Python values, missing values as None."""
+    columns = indeed.scrap_job_elements.JOB_COLUMNS
+    values = jobs_df.reindex(columns=columns).astype(object)
+    values = values.where(values.notna(), None)
+    rows = []
+    for row in values.itertuples(index=False, name=None):
+        row = list(row)
+        for idx, column in enumerate(columns):
+            if row[idx] is not None and column in COLUMN_TYPES:
+                # Ratings and days read back from CSVs are strings
+                try:
+                    row[idx] = float(row[idx]) if column == 'rating' else int(float(row[idx]))
+                except ValueError:
+                    row[idx] = None
+        rows.append(tuple(row))
+    return rows
+
+def upsert_jobs(connection, month, rows):
+    """
+    Insert job rows of a month into the jobs table, keyed on their canonical job key.
+    A job already stored is kept as it is, unless it was stored for a later month: the
+    earliest month a job was seen in owns it, as in the CSV deduplication.
+
+    Returns:
+        int: Number of jobs inserted or moved to this month.
+    """
+    columns = indeed.scrap_job_elements.JOB_COLUMNS
+    link, title, company = (columns.index(column) for column in ('link', 'title', 'company'))
+    keyed_rows = []
+    for row in rows:
+        row = list(row)
+        key = indeed.job_identity.job_key(row[link], row[title], row[company])
+        row[link] = indeed.job_identity.canonical_link(row[link])
+        keyed_rows.append((key, month, *row))
+    updates = ", ".join(f"{column} = excluded.{column}" for column in ['month', *columns])
+    before = connection.total_changes
+    connection.executemany(
+        f"INSERT INTO jobs (job_key, month, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 2))}) "
+        f"ON CONFLICT (job_key) DO UPDATE SET {updates} WHERE excluded.month < jobs.month",
+        keyed_rows,
+    )
+    return connection.total_changes - before
+
+def insert_jobs(jobs_df, month):
+    """
+    Store the jobs of one email in a single transaction: all rows in raw_jobs, and the new
+    jobs in jobs, which replaces the deduplication step of the file backends.
+
+    Args:
+        jobs_df (pd.DataFrame): Jobs to store.
+        month (str): Month the jobs were fetched in, e.g. '2024_12'.
+
+    Returns:
+        int: Number of new jobs.
+    """
+    if jobs_df.empty:
+        return 0
+    rows = job_rows(jobs_df)
+    columns = indeed.scrap_job_elements.JOB_COLUMNS
+    with _lock:
+        connection = get_connection()
+        with connection:
+            connection.executemany(
+                f"INSERT INTO raw_jobs (month, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+                [(month, *row) for row in rows],
+            )
+            added = upsert_jobs(connection, month, rows)
+    logging.info(f"Stored {len(rows)} jobs of {month} in {DATABASE_PATH}: {added} new.")
+    return added
+
+def replace_raw_month(jobs_df, month):
+    """Replace the raw rows of a month with the given jobs, e.g. when the backfill rebuilds it."""
+    columns = indeed.scrap_job_elements.JOB_COLUMNS
+    with _lock:
+        connection = get_connection()
+        with connection:
+            connection.execute("DELETE FROM raw_jobs WHERE month = ?", (month,))
+            connection.executemany(
+                f"INSERT INTO raw_jobs (month, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+                [(month, *row) for row in job_rows(jobs_df)],
+            )
+    logging.info(f"Wrote {len(jobs_df)} jobs of {month} to {DATABASE_PATH}.")
+
+def rebuild_month(month):
+    """
+    Rebuild the jobs of a month from its raw rows.
+
+    Returns:
+        int: Number of jobs inserted or moved to this month.
+    """
+    columns = indeed.scrap_job_elements.JOB_COLUMNS
+    with _lock:
+        connection = get_connection()
+        with connection:
+            connection.execute("DELETE FROM jobs WHERE month = ?", (month,))
+            rows = connection.execute(
+                f"SELECT {', '.join(columns)} FROM raw_jobs WHERE month = ? ORDER BY id", (month,)
+            ).fetchall()
+            added = upsert_jobs(connection, month, rows)
+    logging.info(f"Rebuilt the jobs of {month} from {len(rows)} raw rows: {added} unique jobs.")
+    return added
+
+def list_months(table="jobs"):
+    """Return the months stored in a table, newest first."""
+    with _lock:
+        rows = get_connection().execute(f"SELECT DISTINCT month FROM {table} ORDER BY month DESC").fetchall()
+    return [row[0] for row in rows]
+
+def query_jobs(table="jobs", top_n=None, companies=None, locations=None, types=None, since=None, columns=None):
+    """
+    Query stored jobs; each filter is answered from the indexes of the jobs table.
+
+    Args:
+        table (str): "jobs" for the deduplicated jobs, "raw_jobs" for every stored row.
+        top_n (int): Only the N most recent months, defaults to all of them.
+        companies, locations, types (list): Keep only the jobs with one of these values.
+        since (date or str): Keep only the jobs posted on or after this date.
+        columns (list): Columns to return, defaults to the JOB_COLUMNS.
+
+    Returns:
+        pd.DataFrame: The matching jobs, in the order they were stored.
+    """
+    if table not in ("jobs", "raw_jobs"):
+        raise ValueError(f"Unknown job table '{table}'.")
+    columns = list(columns or indeed.scrap_job_elements.JOB_COLUMNS)
+    conditions = []
+    params = []
+    if top_n is not None:
+        months = list_months(table)[:top_n]
+        if not months:
+            return pd.DataFrame(columns=columns)
+        conditions.append(f"month IN ({', '.join('?' * len(months))})")
+        params.extend(months)
+    for argument, values in (('companies', companies), ('locations', locations), ('types', types)):
+        if values:
+            conditions.append(f"{FILTER_COLUMNS[argument]} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if since is not None:
+        conditions.append("posting_date >= ?")
+        params.append(since if isinstance(since, str) else since.strftime('%Y-%m-%d'))
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    with _lock:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY id", get_connection(), params=params
+        )
+
+def count_jobs():
+    """
+    Count the jobs per combination of indeed.job_aggregates.AGGREGATE_COLUMNS, for the
+    dashboard's grouped views; the grouping runs in SQLite, so no job rows are loaded.
+
+    Returns:
+        pd.DataFrame: The AGGREGATE_COLUMNS and a 'count' column.
+    """
+    columns = ', '.join(indeed.job_aggregates.AGGREGATE_COLUMNS)
+    with _lock:
+        return pd.read_sql_query(
+            f"SELECT {columns}, COUNT(*) AS count FROM jobs GROUP BY {columns}", get_connection()
+        )
+
+def import_csv_months(raw_dir="./data/raw"):
+    """
+    One-shot import of the raw monthly CSVs, oldest month first; the jobs table is
+    rebuilt from them. Months already in the database are skipped.
+
+    Returns:
+        dict: Numbers of months imported and skipped and of rows imported.
+    """
+    summary = {"months": 0, "skipped": 0, "rows": 0}
+    if not os.path.isdir(raw_dir):
+        return summary
+    stored = set(list_months("raw_jobs"))
+    for file_name in sorted(os.listdir(raw_dir)):
+        if not file_name.endswith('.csv'):
+            continue
+        month = file_name[:-len('.csv')]
+        if month in stored:
+            logging.info(f"Skipping {file_name}: month {month} is already in {DATABASE_PATH}.")
+            summary["skipped"] += 1
+            continue
+        data = pd.read_csv(os.path.join(raw_dir, file_name), dtype=str)
+        replace_raw_month(data, month)
+        rebuild_month(month)
+        summary["months"] += 1
+        summary["rows"] += len(data)
+    logging.info(f"CSV to SQLite import finished: {summary}")
+    return summary
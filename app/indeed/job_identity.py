@@ -0,0 +1,37 @@
+import re
+import hashlib
+from urllib.parse import urlsplit, parse_qs
+import pandas as pd
+
+# Indeed job IDs are 16 hex digits, e.g. jk=99b86a524751c541
+JK_PATTERN = re.compile(r"^[0-9a-fA-F]{16}$")
+
+def extract_jk(link):
+    """Return the Indeed job ID (the jk query parameter) of a job link, or None."""
+    if not isinstance(link, str) or 'jk=' not in link:
+        return None
+    jk = parse_qs(urlsplit(link).query).get('jk', [None])[0]
+    return jk.lower() if jk and JK_PATTERN.match(jk) else None
+
+def canonical_link(link):
+    """
+    Return the canonical form of an Indeed job link: https://<host>/viewjob?jk=<job id>.
+    Click-tracking parameters, which change with every email, are dropped. Links without a
+    job ID are returned unchanged.
+    """
+    jk = extract_jk(link)
+    if jk is None:
+        return link
+    host = urlsplit(link).netloc or "www.indeed.com"
+    return f"https://{host}/viewjob?jk={jk}"
+
+def job_key(link, title, company):
+    """
+    Return the identity of a job posting: its Indeed job ID when the link has one, otherwise
+    a hash of its title and company. Missing values are treated as empty.
+    """
+    jk = extract_jk(link)
+    if jk is not None:
+        return f"jk:{jk}"
+    fields = ['' if value is None or pd.isna(value) else str(value).strip().lower() for value in (title, company)]
+    return "h:" + hashlib.blake2b('\x1f'.join(fields).encode('utf-8'), digest_size=12).hexdigest()
@@ -0,0 +1,248 @@
+import os
+import time
+import shutil
+import logging
+import pandas as pd
+import indeed.state_store
+import indeed.scrap_job_elements
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Storage of the raw and intermediate job data: "csv" keeps the monthly CSV files in data/raw and
+# data/intermediate, "parquet" writes month-partitioned Parquet datasets under data/parquet,
+# "sqlite" stores the jobs in the tables of indeed.job_database.
+# The listener, the deduplication and the dashboard loaders all follow this switch.
+STORAGE_BACKEND = os.environ.get("INDEED_STORAGE_BACKEND", "csv")
+STORAGE_BACKENDS = ("csv", "parquet", "sqlite")
+
+PARQUET_RAW_DIR = "./data/parquet/raw"
+PARQUET_INTERMEDIATE_DIR = "./data/parquet/intermediate"
+
+# Repeated values stored once per row group, as dictionary indices
+DICTIONARY_COLUMNS = ['company', 'location', 'type']
+
+# A month partition is compacted into a single file once it holds this many part files
+COMPACT_PARTS = 64
+
+def get_storage_backend():
+    """Return the configured storage backend, checking it is a known one."""
+    if STORAGE_BACKEND not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{STORAGE_BACKEND}'. Choose one of {list(STORAGE_BACKENDS)}.")
+    return STORAGE_BACKEND
+
+def is_parquet():
+    """Return True when the job data is stored as Parquet."""
+    return get_storage_backend() == "parquet"
+
+def is_sqlite():
+    """Return True when the job data is stored in the SQLite database."""
+    return get_storage_backend() == "sqlite"
+
+def job_schema():
+    """Return the Arrow schema of the stored jobs: the JOB_COLUMNS, with the DICTIONARY_COLUMNS dictionary encoded."""
+    import pyarrow as pa
+
+    types = {'rating': pa.float64(), 'days': pa.int64()}
+    fields = []
+    for column in indeed.scrap_job_elements.JOB_COLUMNS:
+        if column in DICTIONARY_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, types.get(column, pa.string())))
+    return pa.schema(fields)
+
+def to_job_table(jobs_df):
+    """
+    Convert a jobs DataFrame, as extracted or as read from a CSV, to an Arrow table of job_schema().
+    Missing columns are stored as nulls and ratings that are not numbers as missing.
+    """
+    import pyarrow as pa
+
+    schema = job_schema()
+    columns = {}
+    for field in schema:
+        values = jobs_df[field.name] if field.name in jobs_df.columns else pd.Series([None] * len(jobs_df), dtype=object)
+        if field.name == 'rating':
+            values = pd.to_numeric(values, errors='coerce')
+        elif field.name == 'days':
+            values = pd.to_numeric(values, errors='coerce').astype('Int64')
+        else:
+            values = values.astype(object).where(values.notna(), None).map(lambda value: value if value is None else str(value))
+        columns[field.name] = pa.array(values, type=field.type, from_pandas=True)
+    return pa.table(columns, schema=schema)
+
+def partition_dir(dataset_dir, month):
+    """Return the directory of a month partition, e.g. <dataset_dir>/month=2024_12."""
+    return os.path.join(dataset_dir, f"month={month}")
+
+def list_months(dataset_dir):
+    """Return the months stored in a dataset, newest first."""
+    if not os.path.isdir(dataset_dir):
+        return []
+    months = [name.split('=', 1)[1] for name in os.listdir(dataset_dir) if name.startswith('month=')]
+    return sorted(months, reverse=True)
+
+def list_parts(dataset_dir, month):
+    """Return the part file names of a month partition, oldest first."""
+    directory = partition_dir(dataset_dir, month)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.endswith('.parquet'))
+
+def write_part(table, directory, name):
+    """Atomically write an Arrow table as one Parquet file."""
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, name)
+    temp_path = f"{file_path}.tmp"
+    pq.write_table(table, temp_path, compression='zstd')
+    os.replace(temp_path, file_path)
+    return file_path
+
+def append_jobs(jobs_df, dataset_dir, month):
+    """
+    Append jobs to a month partition as a new part file.
+
+    Args:
+        jobs_df (pd.DataFrame): Jobs to append.
+        dataset_dir (str): Root of the dataset, e.g. PARQUET_RAW_DIR.
+        month (str): Month partition, e.g. '2024_12'.
+
+    Returns:
+        str: Name of the written part file, or None if there were no jobs.
+    """
+    if jobs_df.empty:
+        return None
+    # Part names sort in write order
+    name = f"part-{time.time_ns():020d}-{os.getpid()}.parquet"
+    file_path = write_part(to_job_table(jobs_df), partition_dir(dataset_dir, month), name)
+    logging.info(f"Data appended to {file_path}.")
+    return name
+
+def write_month(jobs_df, dataset_dir, month):
+    """
+    Replace a month partition with a single part file holding the given jobs.
+
+    Returns:
+        str: Name of the written part file.
+    """
+    directory = partition_dir(dataset_dir, month)
+    old_parts = list_parts(dataset_dir, month)
+    name = f"part-{time.time_ns():020d}-{os.getpid()}.parquet"
+    write_part(to_job_table(jobs_df), directory, name)
+    for part in old_parts:
+        os.remove(os.path.join(directory, part))
+    logging.info(f"Wrote {len(jobs_df)} jobs to {directory}.")
+    return name
+
+def compact_month(dataset_dir, month):
+    """
+    Merge the part files of a month partition into one once it holds COMPACT_PARTS of them.
+
+    Returns:
+        bool: True if the partition was compacted.
+    """
+    if len(list_parts(dataset_dir, month)) < COMPACT_PARTS:
+        return False
+    write_month(read_jobs(dataset_dir, months=[month]), dataset_dir, month)
+    return True
+
+def read_jobs(dataset_dir, months=None, columns=None, since=None):
+    """
+    Read jobs from a month-partitioned dataset.
+
+    Only the requested columns are read, and row groups whose posting dates all fall before
+    `since` are skipped using the Parquet statistics.
+
+    Args:
+        dataset_dir (str): Root of the dataset.
+        months (list): Months to read, defaults to all of them.
+        columns (list): Columns to read, defaults to the JOB_COLUMNS.
+        since (date or str): Keep only the jobs posted on or after this date.
+
+    Returns:
+        pd.DataFrame: The jobs, with the same columns and value types as read from the CSVs.
+    """
+    if months is None:
+        months = list_months(dataset_dir)
+    files = [
+        os.path.join(partition_dir(dataset_dir, month), part)
+        for month in sorted(months) for part in list_parts(dataset_dir, month)
+    ]
+    return read_files(files, columns, since)
+
+def read_parts(dataset_dir, month, parts):
+    """Read the given part files of a month partition, in order."""
+    return read_files([os.path.join(partition_dir(dataset_dir, month), part) for part in parts])
+
+def read_files(files, columns=None, since=None):
+    """Read jobs from Parquet part files; see read_jobs()."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    columns = list(columns or indeed.scrap_job_elements.JOB_COLUMNS)
+    if not files:
+        return pd.DataFrame(columns=columns)
+
+    dataset = ds.dataset(files, schema=job_schema(), format='parquet')
+    row_filter = None
+    if since is not None:
+        since = since if isinstance(since, str) else since.strftime('%Y-%m-%d')
+        row_filter = ds.field('posting_date') >= since
+    table = dataset.to_table(columns=columns, filter=row_filter)
+
+    # Decode the dictionaries, so the frame matches the CSV loaders (no categoricals)
+    for idx, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(idx, field.name, table.column(idx).cast(pa.string()))
+    return table.to_pandas()
+
+def convert_csv_to_parquet(raw_dir="./data/raw", intermediate_dir="./data/intermediate", overwrite=False):
+    """
+    One-shot conversion of the monthly CSV files to the Parquet datasets.
+
+    Each raw and intermediate CSV becomes one month partition. The deduplication state is
+    recorded for the converted months, so the listener carries on incrementally once
+    STORAGE_BACKEND is switched to "parquet". The CSV files are left in place.
+
+    Args:
+        raw_dir (str): Directory of the raw monthly CSVs.
+        intermediate_dir (str): Directory of the intermediate monthly CSVs.
+        overwrite (bool): If True, replace months already present in the Parquet datasets.
+
+    Returns:
+        dict: Numbers of raw months, intermediate months and rows converted, and months skipped.
+    """
+    summary = {"raw_months": 0, "intermediate_months": 0, "rows": 0, "skipped": 0}
+    for directory, dataset_dir, suffix, kind in (
+        (raw_dir, PARQUET_RAW_DIR, '.csv', "raw_months"),
+        (intermediate_dir, PARQUET_INTERMEDIATE_DIR, '_intermediate.csv', "intermediate_months"),
+    ):
+        if not os.path.isdir(directory):
+            continue
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith(suffix) or (kind == "raw_months" and file_name.endswith('_intermediate.csv')):
+                continue
+            month = file_name[:-len(suffix)]
+            if list_parts(dataset_dir, month) and not overwrite:
+                logging.info(f"Skipping {file_name}: month {month} is already stored as Parquet.")
+                summary["skipped"] += 1
+                continue
+            data = pd.read_csv(os.path.join(directory, file_name), dtype=str)
+            if overwrite and os.path.isdir(partition_dir(dataset_dir, month)):
+                shutil.rmtree(partition_dir(dataset_dir, month))
+            write_month(data, dataset_dir, month)
+            if kind == "intermediate_months":
+                indeed.state_store.save_state(f"dedup_parquet_{month}", {
+                    "raw_parts": list_parts(PARQUET_RAW_DIR, month),
+                    "intermediate_parts": list_parts(PARQUET_INTERMEDIATE_DIR, month),
+                })
+            summary[kind] += 1
+            summary["rows"] += len(data)
+
+    logging.info(f"CSV to Parquet conversion finished: {summary}")
+    return summary
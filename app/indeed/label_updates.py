@@ -0,0 +1,171 @@
+import os
+import json
+import logging
+from googleapiclient.errors import HttpError
+import indeed.gmail_labels
+import indeed.gmail_quota
+import indeed.state_store
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Append-only journal of label updates not yet applied in Gmail, one JSON object per line
+JOURNAL_PATH = os.path.join(indeed.state_store.STATE_DIR, "pending_label_updates.jsonl")
+
+# Updates Gmail permanently rejected (e.g. the message was deleted), kept for inspection
+REJECTED_PATH = os.path.join(indeed.state_store.STATE_DIR, "rejected_label_updates.jsonl")
+
+# Gmail accepts up to 1000 message IDs per messages.batchModify call
+BATCH_MODIFY_LIMIT = 1000
+
+# Errors that replaying the update will never fix: a bad or deleted message ID
+PERMANENT_ERROR_STATUSES = (400, 404)
+
+def queue_label_update(email_id, add=(), remove=()):
+    """
+    Record a label update for an email, to be applied by the next flush_label_updates().
+
+    The update is written to the journal before returning, so it survives a crash.
+
+    Args:
+        email_id (str): Gmail message ID.
+        add (iterable): Labels to add, as pipeline label roles or system label IDs such as 'UNREAD'.
+        remove (iterable): Labels to remove, in the same form.
+    """
+    os.makedirs(os.path.dirname(JOURNAL_PATH), exist_ok=True)
+    entry = {"id": email_id, "add": sorted(add), "remove": sorted(remove)}
+    with open(JOURNAL_PATH, "a", encoding="utf-8") as journal:
+        journal.write(json.dumps(entry) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+def load_pending_updates():
+    """Return the journaled updates, keeping only the latest one per email, in queue order."""
+    if not os.path.exists(JOURNAL_PATH):
+        return {}
+    pending = {}
+    with open(JOURNAL_PATH, "r", encoding="utf-8") as journal:
+        for line in journal:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping unreadable label update entry: {line!r}")
+                continue
+            pending.pop(entry["id"], None)
+            pending[entry["id"]] = entry
+    return pending
+
+def flush_label_updates(service, labels):
+    """
+    Apply all journaled label updates with grouped messages.batchModify calls.
+
+    Emails that ended in the same state share one call per BATCH_MODIFY_LIMIT IDs.
+    Applied updates are removed from the journal; anything not applied stays for the next flush.
+    When Gmail permanently rejects a call (see PERMANENT_ERROR_STATUSES), its emails are
+    updated one by one, and the updates rejected again are moved to REJECTED_PATH instead of
+    being replayed forever. Stale label IDs are refreshed at most once per flush.
+
+    Args:
+        service: The Gmail API service instance.
+        labels (dict): Pipeline label IDs by role. Refreshed in place if Gmail reports a stale ID.
+    """
+    pending = load_pending_updates()
+    if not pending:
+        return
+
+    groups = {}
+    for entry in pending.values():
+        groups.setdefault((tuple(entry["add"]), tuple(entry["remove"])), []).append(entry["id"])
+
+    refreshed = False
+
+    def refresh_labels():
+        """Refresh the stale label IDs, unless this flush already did; return True if refreshed."""
+        nonlocal refreshed
+        if refreshed:
+            return False
+        labels.update(indeed.gmail_labels.resolve_pipeline_labels(service, refresh=True))
+        refreshed = True
+        return True
+
+    try:
+        for (add, remove), email_ids in groups.items():
+            for start in range(0, len(email_ids), BATCH_MODIFY_LIMIT):
+                chunk = email_ids[start:start + BATCH_MODIFY_LIMIT]
+                try:
+                    batch_modify(service, labels, chunk, add, remove, refresh_labels)
+                except HttpError as error:
+                    if not is_permanent_error(error):
+                        raise
+                    logging.warning(f"Gmail rejected a label update of {len(chunk)} emails ({error}). Updating them one by one.")
+                    for email_id in chunk:
+                        try:
+                            batch_modify(service, labels, [email_id], add, remove, refresh_labels)
+                        except HttpError as email_error:
+                            if not is_permanent_error(email_error):
+                                raise
+                            reject_update(pending[email_id], email_error)
+                        del pending[email_id]
+                    continue
+                for email_id in chunk:
+                    del pending[email_id]
+                logging.info(f"Updated labels on {len(chunk)} emails (add={list(add)}, remove={list(remove)}).")
+    finally:
+        rewrite_journal(pending.values())
+
+def is_permanent_error(error):
+    """Check whether Gmail rejected a label update for good, rather than failing transiently."""
+    return error.resp.status in PERMANENT_ERROR_STATUSES
+
+def reject_update(entry, error):
+    """Move a label update Gmail permanently rejected out of the journal, into REJECTED_PATH."""
+    logging.error(f"Gmail rejected the label update of email {entry['id']} ({error}). Moved it to {REJECTED_PATH}.")
+    os.makedirs(os.path.dirname(REJECTED_PATH), exist_ok=True)
+    with open(REJECTED_PATH, "a", encoding="utf-8") as rejected:
+        rejected.write(json.dumps({**entry, "status": error.resp.status}) + "\n")
+
+def batch_modify(service, labels, email_ids, add, remove, refresh_labels):
+    """
+    Apply one batchModify call (messages.modify for a single email).
+
+    If a label ID is stale, the call is retried once after refresh_labels() updates labels;
+    the error is raised instead if it returns False (the labels were already refreshed).
+    """
+    def modify():
+        body = {
+            "addLabelIds": [labels.get(label, label) for label in add],
+            "removeLabelIds": [labels.get(label, label) for label in remove],
+        }
+        if len(email_ids) == 1:
+            request = service.users().messages().modify(userId='me', id=email_ids[0], body=body)
+        else:
+            request = service.users().messages().batchModify(userId='me', body={"ids": email_ids, **body})
+        indeed.gmail_quota.execute(request)
+
+    try:
+        modify()
+    except Exception as error:
+        if not indeed.gmail_labels.is_unknown_label_error(error):
+            raise
+        if not refresh_labels():
+            raise
+        logging.warning(f"Cached label IDs were stale ({error}). Refreshed labels.")
+        modify()
+
+def rewrite_journal(entries):
+    """Atomically replace the journal with the given entries, removing it when empty."""
+    entries = list(entries)
+    if not entries:
+        if os.path.exists(JOURNAL_PATH):
+            os.remove(JOURNAL_PATH)
+        return
+    temp_path = f"{JOURNAL_PATH}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as journal:
+        for entry in entries:
+            journal.write(json.dumps(entry) + "\n")
+    os.replace(temp_path, JOURNAL_PATH)
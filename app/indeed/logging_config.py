@@ -1,5 +1,6 @@
 import logging
 import os
+import multiprocessing
 from logging.handlers import RotatingFileHandler
 
 # Define log directory and file
@@ -7,14 +8,15 @@ log_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..','..', 'lo
 os.makedirs(log_dir, exist_ok=True)
 log_filename = os.path.join(log_dir, "app.log")
 
-# Configure logging
+# Configure logging. Worker processes (see indeed.email_pipeline) do not open the log file:
+# several processes rotating the same file corrupt it, so their records go through the parent.
+handlers = [logging.StreamHandler()]
+if multiprocessing.parent_process() is None:
+    handlers.insert(0, RotatingFileHandler(log_filename, maxBytes=5*1024*1024, backupCount=5))
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        RotatingFileHandler(log_filename, maxBytes=5*1024*1024, backupCount=5),
-        logging.StreamHandler()
-    ]
+    handlers=handlers
 )
 
 # Function to get logger
@@ -0,0 +1,211 @@
+import logging
+from email.utils import parseaddr
+from googleapiclient.errors import HttpError
+import indeed.gmail_batch
+import indeed.gmail_quota
+import indeed.state_store
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Name of the state file holding the last fully processed mailbox historyId
+CHECKPOINT_STATE = "history_checkpoint"
+
+# Order in which backlog emails are processed
+NEWEST_FIRST = "newest_first"
+OLDEST_FIRST = "oldest_first"
+
+# Results per messages.list / history.list page (Gmail maximum is 500)
+LIST_PAGE_SIZE = 100
+
+# Labels of messages that were never delivered to us, even if their sender matches. SENT
+# covers the mail this account sends itself, such as the pipeline's error notifications
+# (which also carry INBOX when the sender is one of the watched senders): processing them
+# would fail and send another notification on every poll.
+SKIPPED_LABELS = {"DRAFT", "SPAM", "TRASH", "SENT"}
+
+def build_sender_query(senders):
+    """Build the full-sync Gmail search query for unread emails from the given senders, leaving out mail this account sent."""
+    return f"({' OR '.join([f'from:{sender}' for sender in senders])}) is:unread -in:sent"
+
+def load_checkpoint():
+    """Return the last committed historyId, or None if the mailbox was never synced."""
+    checkpoint = indeed.state_store.load_state(CHECKPOINT_STATE, default={})
+    return checkpoint.get("history_id")
+
+def commit_checkpoint(history_id):
+    """
+    Persist the historyId up to which all changes have been processed.
+    Call this only after the messages returned with it are finalized.
+    """
+    if history_id:
+        indeed.state_store.save_state(CHECKPOINT_STATE, {"history_id": str(history_id)})
+        logging.info(f"Mailbox checkpoint advanced to historyId {history_id}.")
+
+def list_candidate_message_ids(service, senders, order=NEWEST_FIRST):
+    """
+    List the IDs of emails to process since the last checkpoint.
+
+    Uses users.history.list from the stored historyId, and falls back to the full
+    unread query when there is no checkpoint yet or Gmail reports it as expired.
+    Incremental IDs are produced lazily, one result page at a time, as the caller consumes
+    them; the full sync lists every page first (see list_unread_message_ids).
+
+    Args:
+        service: The Gmail API service instance.
+        senders (list): List of sender email addresses to filter emails from.
+        order (str): NEWEST_FIRST or OLDEST_FIRST.
+
+    Returns:
+        tuple: (iterator of message IDs, dict whose 'history_id' is the checkpoint to commit
+        once every ID has been consumed and processed)
+    """
+    history_id = load_checkpoint()
+    if history_id:
+        try:
+            return list_changed_message_ids(service, senders, history_id, order)
+        except HttpError as error:
+            if error.resp.status != 404:
+                raise
+            logging.warning(f"History checkpoint {history_id} has expired. Falling back to a full sync.")
+    return list_unread_message_ids(service, senders, order)
+
+def list_unread_message_ids(service, senders, order=NEWEST_FIRST):
+    """
+    Full sync: list all unread emails from the senders and start a new checkpoint.
+
+    All pages are listed before any ID is returned: processing an email removes its UNREAD
+    label, which shifts the later pages of the is:unread search, so reading them while the
+    caller processes would skip emails. Only the ID strings are held, as in reverse_ids().
+    """
+    # Read the historyId first so nothing that arrives during the listing is missed
+    profile = indeed.gmail_quota.execute(service.users().getProfile(userId='me'))
+    query = build_sender_query(senders)
+
+    def fetch_page(page_token):
+        results = indeed.gmail_quota.execute(service.users().messages().list(
+            userId='me', q=query, pageToken=page_token, maxResults=LIST_PAGE_SIZE
+        ))
+        return [message['id'] for message in results.get('messages', [])], results.get('nextPageToken')
+
+    # messages.list returns newest emails first
+    message_ids = list(iter_pages(fetch_page))
+    if order == OLDEST_FIRST:
+        message_ids.reverse()
+    logging.info(f"Full sync found {len(message_ids)} unread emails from monitored senders.")
+    return iter(message_ids), {"history_id": profile.get('historyId')}
+
+def list_changed_message_ids(service, senders, history_id, order=NEWEST_FIRST):
+    """
+    Incremental sync: list emails from the senders added to the mailbox since history_id.
+    The first history page is requested right away, so an expired checkpoint raises here.
+    """
+    checkpoint = {"history_id": history_id}
+
+    def fetch_page(page_token):
+        results = indeed.gmail_quota.execute(service.users().history().list(
+            userId='me',
+            startHistoryId=history_id,
+            historyTypes=['messageAdded'],
+            pageToken=page_token,
+            maxResults=LIST_PAGE_SIZE
+        ))
+        checkpoint["history_id"] = results.get('historyId', checkpoint["history_id"])
+        added_ids = []
+        for record in results.get('history', []):
+            for added in record.get('messagesAdded', []):
+                added_ids.append(added['message']['id'])
+        return added_ids, results.get('nextPageToken')
+
+    first_page = fetch_page(None)
+
+    def iter_sender_ids():
+        seen_ids = set()
+        for page_ids in iter_page_lists(fetch_page, first_page):
+            new_ids = [email_id for email_id in page_ids if email_id not in seen_ids]
+            seen_ids.update(new_ids)
+            if new_ids:
+                matching_ids = filter_message_ids_by_sender(service, new_ids, senders)
+                logging.info(f"Incremental sync found {len(new_ids)} new emails, {len(matching_ids)} from monitored senders.")
+                yield from matching_ids
+
+    # history.list returns changes oldest first
+    message_ids = iter_sender_ids()
+    if order == NEWEST_FIRST:
+        message_ids = reverse_ids(message_ids)
+    return message_ids, checkpoint
+
+def iter_page_lists(fetch_page, first_page=None):
+    """
+    Yield the ID list of each result page, requesting the next page only when the previous one is consumed.
+
+    Args:
+        fetch_page (callable): Takes a page token (None for the first page), returns (ids, next_page_token).
+        first_page (tuple): Already fetched (ids, next_page_token) of the first page, if any.
+    """
+    page_ids, page_token = first_page if first_page is not None else fetch_page(None)
+    while True:
+        yield page_ids
+        if not page_token:
+            break
+        page_ids, page_token = fetch_page(page_token)
+
+def iter_pages(fetch_page, first_page=None):
+    """Yield IDs one by one across all result pages, fetching pages lazily."""
+    for page_ids in iter_page_lists(fetch_page, first_page):
+        yield from page_ids
+
+def reverse_ids(message_ids):
+    """
+    Yield IDs in reverse order. Only the ID strings are buffered, never message contents,
+    so even a 50,000 email backlog costs a few megabytes.
+    """
+    yield from reversed(list(message_ids))
+
+def chunked(iterable, size):
+    """Yield lists of up to size items, pulling items from the iterable only as each chunk is needed."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def filter_message_ids_by_sender(service, email_ids, senders):
+    """
+    Keep only the messages sent by one of the senders, using a batched metadata lookup.
+    Raises if a lookup fails, so the checkpoint is not advanced past an unchecked message.
+    """
+    sender_addresses = {sender.lower() for sender in senders}
+    responses = indeed.gmail_batch.batch_get_messages(
+        service, email_ids, format='metadata', metadataHeaders=['From']
+    )
+
+    message_ids = []
+    for email_id in email_ids:
+        response = responses.get(email_id)
+        if isinstance(response, HttpError) and response.resp.status == 404:
+            continue  # Deleted since it was added
+        if isinstance(response, Exception) or response is None:
+            try:
+                response = indeed.gmail_quota.execute(service.users().messages().get(
+                    userId='me', id=email_id, format='metadata', metadataHeaders=['From']
+                ))
+            except HttpError as error:
+                if error.resp.status == 404:
+                    continue
+                raise
+
+        label_ids = set(response.get('labelIds', []))
+        if label_ids & SKIPPED_LABELS:
+            continue
+
+        headers = response.get('payload', {}).get('headers', [])
+        sender = next((header['value'] for header in headers if header['name'] == 'From'), "")
+        if parseaddr(sender)[1].lower() in sender_addresses:
+            message_ids.append(email_id)
+    return message_ids
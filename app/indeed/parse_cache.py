@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# SQLite file holding the extracted job records of already scraped emails, keyed by content hash
+CACHE_PATH = "./data/cache/parse_cache.sqlite3"
+
+# Upper bound on the stored records, in bytes; least recently used entries are evicted beyond it
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Set to False to always parse
+ENABLED = True
+
+_connection = None
+_connection_pid = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def content_key(html_content):
+    """Return the cache key of an email: the SHA-256 of its HTML without surrounding whitespace."""
+    return hashlib.sha256(html_content.strip().encode("utf-8", "surrogatepass")).hexdigest()
+
+def get_connection(version):
+    """
+    Open the cache database once per process, dropping entries written by another extractor version.
+
+    Args:
+        version (int): Current extractor version.
+    """
+    global _connection, _connection_pid
+
+    if _connection is None or _connection_pid != os.getpid():
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        connection = sqlite3.connect(CACHE_PATH, timeout=30, check_same_thread=False)
+        # WAL lets the extraction worker processes read while one of them writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            "key TEXT PRIMARY KEY, version INTEGER NOT NULL, records TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS parse_cache_last_used ON parse_cache (last_used)")
+        removed = connection.execute("DELETE FROM parse_cache WHERE version != ?", (version,)).rowcount
+        connection.commit()
+        if removed:
+            logging.info(f"Dropped {removed} parse cache entries from an older extractor version.")
+        _connection, _connection_pid = connection, os.getpid()
+    return _connection
+
+def get_records(key, version):
+    """
+    Return the cached records for a content key, or None on a miss.
+
+    Args:
+        key (str): Content key from content_key().
+        version (int): Current extractor version.
+
+    Returns:
+        tuple: The stored records, as lists of field values, and the layouts stored with
+        them, as JSON lists; or None.
+    """
+    if not ENABLED:
+        return None
+    try:
+        with _lock:
+            connection = get_connection(version)
+            row = connection.execute(
+                "SELECT records FROM parse_cache WHERE key = ? AND version = ?", (key, version)
+            ).fetchone()
+            entry = json.loads(row[0]) if row is not None else None
+            # A list is an entry stored before the layouts were kept with the records: parse again
+            if not isinstance(entry, dict):
+                _stats["misses"] += 1
+                return None
+            connection.execute("UPDATE parse_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            connection.commit()
+            _stats["hits"] += 1
+        return entry["records"], entry["layouts"]
+    except sqlite3.Error as e:
+        logging.warning(f"Parse cache lookup failed: {e}. Parsing the email.")
+        return None
+
+def put_records(key, version, records, layouts=()):
+    """
+    Store the records extracted from an email, evicting the least recently used entries
+    when the cache grows beyond MAX_CACHE_BYTES.
+
+    Args:
+        key (str): Content key from content_key().
+        version (int): Current extractor version.
+        records (list): Records as lists of JSON-serializable field values.
+        layouts (list): Fingerprints of the email's job blocks, so that a hit still counts
+            them (see indeed.scrap_job_elements.record_template).
+    """
+    if not ENABLED:
+        return
+    payload = json.dumps({"records": records, "layouts": list(layouts)})
+    try:
+        with _lock:
+            connection = get_connection(version)
+            connection.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, version, records, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, version, payload, len(payload), time.time()),
+            )
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+            while total > MAX_CACHE_BYTES:
+                oldest = connection.execute(
+                    "SELECT key, size FROM parse_cache ORDER BY last_used LIMIT 100"
+                ).fetchall()
+                if not oldest:
+                    break
+                evicted = []
+                for oldest_key, size in oldest:
+                    if total <= MAX_CACHE_BYTES:
+                        break
+                    evicted.append((oldest_key,))
+                    total -= size
+                connection.executemany("DELETE FROM parse_cache WHERE key = ?", evicted)
+                _stats["evictions"] += len(evicted)
+            connection.commit()
+    except sqlite3.Error as e:
+        logging.warning(f"Failed to store parse cache entry: {e}")
+
+def get_cache_stats():
+    """Return the hit, miss and eviction counts of this process."""
+    with _lock:
+        return dict(_stats)
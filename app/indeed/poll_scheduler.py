@@ -0,0 +1,114 @@
+import time
+import logging
+from datetime import datetime
+import indeed.state_store
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Global bounds for the polling interval, in seconds
+MIN_INTERVAL = 10
+MAX_INTERVAL = 600
+
+# Time-of-day profiles narrowing the bounds; hours are local, end is exclusive and may wrap past midnight
+DEFAULT_PROFILES = [
+    {"name": "morning", "start_hour": 6, "end_hour": 11, "min_interval": 10, "max_interval": 120},
+    {"name": "day", "start_hour": 11, "end_hour": 23, "min_interval": 10, "max_interval": 300},
+    {"name": "night", "start_hour": 23, "end_hour": 6, "min_interval": 60, "max_interval": 1800},
+]
+
+# Each idle poll multiplies the interval by this factor
+BACKOFF_FACTOR = 2
+
+# Half-life of the arrival rate moving average, in seconds
+ARRIVAL_RATE_HALF_LIFE = 900
+
+# Name of the state file where the scheduler status is published for monitoring
+STATUS_STATE = "poll_scheduler"
+
+class AdaptivePollScheduler:
+    """
+    Choose the delay before the next mailbox poll from the recent email traffic.
+
+    While new emails keep arriving the interval drops to the lower bound of the active
+    time-of-day profile; every idle poll backs it off exponentially up to the upper bound.
+    """
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, profiles=None,
+                 backoff_factor=BACKOFF_FACTOR, half_life=ARRIVAL_RATE_HALF_LIFE):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.profiles = DEFAULT_PROFILES if profiles is None else profiles
+        self.backoff_factor = backoff_factor
+        self.half_life = half_life
+        self.interval = min_interval
+        self.arrival_rate = 0.0  # Emails per minute, exponentially weighted
+        self.last_poll = None
+        self.last_new_messages = 0
+        self.profile_name = None
+
+    def active_bounds(self, now):
+        """Return (profile name, min interval, max interval) for the given local time."""
+        hour = now.hour
+        for profile in self.profiles:
+            start, end = profile["start_hour"], profile["end_hour"]
+            in_profile = start <= hour < end if start < end else hour >= start or hour < end
+            if in_profile:
+                low = max(self.min_interval, profile["min_interval"])
+                high = min(self.max_interval, profile["max_interval"])
+                return profile["name"], low, max(low, high)
+        return None, self.min_interval, self.max_interval
+
+    def record_poll(self, new_messages, now=None):
+        """Fold the number of emails found by a poll into the arrival rate."""
+        now_ts = time.time() if now is None else now.timestamp()
+        if self.last_poll is not None:
+            elapsed = max(now_ts - self.last_poll, 1e-6)
+            decay = 0.5 ** (elapsed / self.half_life)
+            observed_rate = new_messages / elapsed * 60
+            self.arrival_rate = decay * self.arrival_rate + (1 - decay) * observed_rate
+        self.last_poll = now_ts
+        self.last_new_messages = new_messages
+
+    def next_interval(self, new_messages, now=None):
+        """
+        Record a finished poll and return the number of seconds to wait before the next one.
+
+        Args:
+            new_messages (int): Number of emails processed by the poll.
+            now (datetime): Current local time, for tests; defaults to now.
+        """
+        now = now or datetime.now()
+        self.record_poll(new_messages, now)
+        self.profile_name, low, high = self.active_bounds(now)
+
+        if new_messages > 0:
+            self.interval = low
+        else:
+            self.interval = self.interval * self.backoff_factor
+        self.interval = min(max(self.interval, low), high)
+        return self.interval
+
+    def get_status(self):
+        """Return the chosen interval and observed arrival rate, for monitoring."""
+        return {
+            "interval_seconds": self.interval,
+            "arrival_rate_per_minute": round(self.arrival_rate, 3),
+            "last_new_messages": self.last_new_messages,
+            "profile": self.profile_name,
+            "last_poll": datetime.fromtimestamp(self.last_poll).isoformat() if self.last_poll else None,
+        }
+
+    def publish_status(self):
+        """Log the status and write it to the state directory, where monitoring can read it."""
+        status = self.get_status()
+        logging.info(
+            f"Next poll in {status['interval_seconds']:.0f}s "
+            f"(profile={status['profile']}, arrival rate={status['arrival_rate_per_minute']}/min)."
+        )
+        try:
+            indeed.state_store.save_state(STATUS_STATE, status)
+        except Exception as e:
+            logging.warning(f"Failed to publish poll scheduler status: {e}")
@@ -1,19 +1,30 @@
 import os
 import logging
 import base64
-import time
 from datetime import datetime
 from email.utils import parsedate_to_datetime
-from bs4 import BeautifulSoup
 from googleapiclient.errors import HttpError
 import indeed.scrap_overall 
+import indeed.scrap_job_elements
 import indeed.process_remove_duplicates
+import indeed.gmail_batch
+import indeed.gmail_quota
+import indeed.gmail_labels
+import indeed.label_updates
+import indeed.email_pipeline
+import indeed.gmail_auth
+import indeed.mailbox_sync
 
 import indeed.logging_config 
 
 # Get logger
 logger = indeed.logging_config.get_logger(__name__)
 
+BATCH_FETCH_SIZE = indeed.gmail_batch.BATCH_SIZE
+
+# Process a backlog newest-first or oldest-first (indeed.mailbox_sync.NEWEST_FIRST / OLDEST_FIRST)
+PROCESS_ORDER = indeed.mailbox_sync.NEWEST_FIRST
+
 def sample():
     """
     Main function to initialize the Gmail API service and process emails.
@@ -26,59 +37,169 @@ def sample():
     except Exception as e:
         logging.error(f"Failed to initialize and process emails: {e}", exc_info=True)
 
-def process_emails_with_transaction(service, senders, error_recipient):
+def process_emails_with_transaction(service, senders, error_recipient, batch_fetch=True, order=PROCESS_ORDER,
+                                    fetch_workers=None, parse_workers=None, service_factory=None):
     """
     Process emails from specific senders. Implements fetching, scraping, and final updates.
+
+    Emails are streamed in chunks of BATCH_FETCH_SIZE: the next page of IDs is only listed
+    once a fetch slot is free, so memory stays flat however large the backlog is. Chunks are
+    fetched by a thread pool, parsed by a process pool, and written and finalized in order by
+    this thread (see indeed.email_pipeline), so the results match the serial path.
+
+    Args:
+        service: The Gmail API service instance.
+        senders (list): List of sender email addresses to filter emails from.
+        error_recipient (str): Email address to notify in case of processing errors.
+        batch_fetch (bool): If True, fetch messages through the Gmail batch endpoint instead of one request per email.
+        order (str): Process a backlog newest-first or oldest-first.
+        fetch_workers (int): Fetch threads, defaults to indeed.email_pipeline.FETCH_WORKERS.
+        parse_workers (int): Extraction processes, defaults to indeed.email_pipeline.PARSE_WORKERS; 0 parses in this thread.
+        service_factory (callable): Returns the Gmail service of the calling fetch thread, defaults
+            to a client of the calling thread for the account of service (see
+            indeed.gmail_auth.get_thread_gmail_service).
+
+    Returns:
+        int: Number of emails processed, 0 if there were none or the cycle failed.
     """
     try:
-        labels = {
-            "success_fetched": ensure_label_exists(service, "email fetched successfully"),
-            "failure_fetched": ensure_label_exists(service, "failed fetching"),
-            "success_scraped": ensure_label_exists(service, "successfully scraped"),
-            "failure_scraped": ensure_label_exists(service, "failed scraping"),
-            "success_final": ensure_label_exists(service, "success"),
-            "failure_final": ensure_label_exists(service, "failure"),
-        }
+        # Label IDs are cached in memory and on disk; labels.list only runs when one is unknown
+        try:
+            labels = indeed.gmail_labels.resolve_pipeline_labels(service)
+        except HttpError as error:
+            logging.error(f"Failed to ensure all required labels: {error}", exc_info=True)
+            return 0
 
-        if not all(labels.values()):
-            logging.error("Failed to ensure all required labels.")
-            return
+        # Apply label updates left in the journal by an interrupted cycle
+        try:
+            indeed.label_updates.flush_label_updates(service, labels)
+        except HttpError as error:
+            if error.resp.status == 401:
+                raise
+            logging.error(f"Failed to replay queued label updates, they stay queued for the next cycle: {error}", exc_info=True)
 
-        query = f"({' OR '.join([f'from:{sender}' for sender in senders])}) is:unread"
-        results = retry_api_call(lambda: service.users().messages().list(userId='me', q=query).execute())
-        messages = results.get('messages', [])
+        # Only changes since the last historyId checkpoint, or a full unread query if it expired
+        email_ids, checkpoint = indeed.mailbox_sync.list_candidate_message_ids(service, senders, order)
 
-        if not messages:
-            logging.info("No new emails found.")
-            return
+        if fetch_workers is None:
+            fetch_workers = indeed.email_pipeline.FETCH_WORKERS
+        if parse_workers is None:
+            parse_workers = indeed.email_pipeline.PARSE_WORKERS
+        if service_factory is None:
+            service_factory = (lambda: indeed.gmail_auth.get_thread_gmail_service(service)) if fetch_workers > 1 else lambda: service
+
+        def fetch_chunk(chunk):
+            thread_service = service_factory()
+            if batch_fetch:
+                return fetch_emails_batch(thread_service, chunk)
+            fetched = {}
+            for email_id in chunk:
+                try:
+                    fetched[email_id] = fetch_email(thread_service, email_id)
+                except Exception as e:
+                    fetched[email_id] = e
+            return fetched
 
-        for email in messages:
-            email_id = email.get('id')
+        processed_count = 0
+        chunks = indeed.mailbox_sync.chunked(email_ids, BATCH_FETCH_SIZE)
+        for chunk, fetched, jobs in indeed.email_pipeline.iter_processed_chunks(chunks, fetch_chunk, fetch_workers, parse_workers):
+            # Single writer: CSV appends, archives and label updates happen here, in email order
+            for email_id in chunk:
+                try:
+                    email_data = fetched[email_id]
+                    if isinstance(email_data, Exception):
+                        raise email_data
+                    html_content, metadata = email_data["html_content"], email_data["metadata"]
+                    write_scraped_jobs(jobs[email_id], metadata, email_id)
+                    finalize_email(email_id, service, html_content, metadata, labels, error_recipient, success=True)
+                except Exception as e:
+                    logging.error(f"Email processing failed for ID {email_id}: {e}", exc_info=True)
+                    finalize_email(email_id, service, None, {}, labels, error_recipient, success=False, error=e)
+            processed_count += len(chunk)
+
+            # Apply the label and read-state updates of this chunk, grouped by outcome
             try:
-                email_data = fetch_email(service, email_id)
-                html_content, metadata = email_data["html_content"], email_data["metadata"]
-                scrape_email_content(html_content, metadata, labels, service, email_id)
-                finalize_email(email_id, service, html_content, metadata, labels, error_recipient, success=True)
-            except Exception as e:
-                logging.error(f"Email processing failed for ID {email_id}: {e}", exc_info=True)
-                finalize_email(email_id, service, None, {}, labels, error_recipient, success=False, error=e)
-        
-        
+                indeed.label_updates.flush_label_updates(service, labels)
+            except HttpError as error:
+                logging.error(f"Failed to apply label updates, they stay queued for the next cycle: {error}", exc_info=True)
+
+        # Every listed email is finalized, so the mailbox can be considered synced up to the checkpoint
+        indeed.mailbox_sync.commit_checkpoint(checkpoint["history_id"])
+
+        if not processed_count:
+            logging.info("No new emails found.")
+            return 0
+        logging.info(f"Processed {processed_count} emails.")
+        indeed.gmail_quota.log_quota_usage()
+        indeed.scrap_job_elements.log_template_stats()
+
         # Call the deduplication function after processing all emails
         try:
             indeed.process_remove_duplicates.raw_csv_to_inter_csv()
         except Exception as e:
             logging.error(f"Error during deduplication process: {e}", exc_info=True)
+
+        return processed_count
        
     except HttpError as error:
+        if error.resp.status == 401:
+            raise  # Let the listener rebuild its Gmail client
         logging.error(f"An API error occurred: {error}", exc_info=True)
+        return 0
 
 def fetch_email(service, email_id):
     """
     Fetch email content, decode HTML, and extract metadata.
     """
     try:
-        msg = retry_api_call(lambda: service.users().messages().get(userId='me', id=email_id).execute())
+        msg = indeed.gmail_quota.execute(service.users().messages().get(userId='me', id=email_id))
+        return parse_email_message(msg)
+    except Exception as e:
+        logging.error(f"Failed to fetch email with ID {email_id}: {e}", exc_info=True)
+        raise
+
+def fetch_emails_batch(service, email_ids, batch_size=BATCH_FETCH_SIZE):
+    """
+    Fetch many emails through the Gmail batch endpoint, one HTTP round trip per batch.
+
+    Messages that fail inside a batch are retried individually with fetch_email, so one
+    bad message never fails the rest of its batch.
+
+    Args:
+        service: The Gmail API service instance.
+        email_ids (list): Gmail message IDs to fetch.
+        batch_size (int): Maximum number of messages per batch request.
+
+    Returns:
+        dict: Message ID mapped to the parsed email data, or to the exception raised for that message.
+    """
+    results = {}
+    retry_ids = []
+
+    for email_id, response in indeed.gmail_batch.batch_get_messages(service, email_ids, batch_size).items():
+        if isinstance(response, Exception):
+            logging.warning(f"Batch fetch failed for email ID {email_id}: {response}")
+            retry_ids.append(email_id)
+            continue
+        try:
+            results[email_id] = parse_email_message(response)
+        except Exception as e:
+            results[email_id] = e
+
+    for email_id in retry_ids:
+        try:
+            results[email_id] = fetch_email(service, email_id)
+        except Exception as e:
+            results[email_id] = e
+
+    logging.info(f"Batch fetched {len(email_ids)} emails ({len(retry_ids)} retried individually).")
+    return results
+
+def parse_email_message(msg):
+    """
+    Decode HTML and extract metadata from a Gmail message resource.
+    """
+    try:
         payload = msg['payload']
         headers = payload['headers']
 
@@ -103,43 +224,33 @@ def fetch_email(service, email_id):
 
         return {"html_content": html_content, "metadata": {"subject": subject, "sender_email": sender_email, "received_datetime": received_datetime}}
     except Exception as e:
-        logging.error(f"Failed to fetch email with ID {email_id}: {e}", exc_info=True)
+        logging.error(f"Failed to parse email with ID {msg.get('id')}: {e}", exc_info=True)
         raise
 
-def scrape_email_content(html_content, metadata, labels, service, email_id):
+def write_scraped_jobs(jobs_df, metadata, email_id):
     """
-    Scrape the email's HTML content and save extracted data.
+    Append the jobs extracted from one email to the raw CSV.
+    Raises the extraction error instead if the email could not be scraped.
     """
-    try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        indeed.scrap_overall.scrap_process_email_content_to_csv(soup)
-        logging.info(f"Scraping successful for email: {metadata['subject']}")
-    except Exception as e:
-        logging.error(f"Scraping failed for email {metadata['subject']} (ID: {email_id}): {e}", exc_info=True)
-        raise
+    if isinstance(jobs_df, Exception):
+        logging.error(f"Scraping failed for email {metadata['subject']} (ID: {email_id}): {jobs_df}")
+        raise jobs_df
+    indeed.scrap_overall.results_create_or_append_to_csv(jobs_df, reset_file=False)
+    logging.info(f"Scraping successful for email: {metadata['subject']}")
 
 def finalize_email(email_id, service, html_content, metadata, labels, error_recipient, success, error=None):
     """
     Handle final updates on email based on success or failure.
+    Label and read-state changes are queued and applied in bulk at the end of the cycle.
     """
     try:
         if success:
             save_email_html(html_content, metadata['subject'], metadata['received_datetime'], metadata['sender_email'])
-            mark_email_as_read(service, email_id)
-            retry_api_call(lambda: service.users().messages().modify(
-                userId='me',
-                id=email_id,
-                body={"addLabelIds": [labels['success_final']], "removeLabelIds": [labels['failure_final']]}
-            ).execute())
+            indeed.label_updates.queue_label_update(email_id, add=['success_final'], remove=['failure_final', 'UNREAD'])
         else:
             save_failed_html(html_content or "", metadata.get('subject', "No Subject"), metadata.get('received_datetime', datetime.now()), metadata.get('sender_email', "unknown"))
             send_error_email(service, error_recipient, metadata.get('subject', "Unknown"), str(error))
-            mark_email_as_read(service, email_id)
-            retry_api_call(lambda: service.users().messages().modify(
-                userId='me',
-                id=email_id,
-                body={"addLabelIds": [labels['failure_final']]}
-            ).execute())
+            indeed.label_updates.queue_label_update(email_id, add=['failure_final'], remove=['UNREAD'])
     except Exception as e:
         logging.error(f"Finalizing email failed: {e}", exc_info=True)
 
@@ -175,46 +286,6 @@ def save_failed_html(content, title, received_datetime, sender_email):
     except Exception as e:
         logging.error(f"Failed to save failed email content: {e}", exc_info=True)
 
-def retry_api_call(call, retries=3, delay=2):
-    for i in range(retries):
-        try:
-            return call()
-        except HttpError as e:
-            if i < retries - 1:
-                time.sleep(delay)
-                delay *= 2
-            else:
-                raise e
-
-def ensure_label_exists(service, label_name):
-    try:
-        label_list = service.users().labels().list(userId='me').execute()
-        labels = label_list.get('labels', [])
-        for label in labels:
-            if label['name'] == label_name:
-                return label['id']
-
-        label_body = {"name": label_name, "labelListVisibility": "labelShow", "messageListVisibility": "show"}
-        new_label = service.users().labels().create(userId='me', body=label_body).execute()
-        return new_label['id']
-    except HttpError as error:
-        logging.error(f"Failed to create label {label_name}: {error}", exc_info=True)
-        return None
-
-def mark_email_as_read(service, email_id):
-    """
-    Marks a specific Gmail message as read.
-    """
-    try:
-        service.users().messages().modify(
-            userId='me',
-            id=email_id,
-            body={'removeLabelIds': ['UNREAD']}
-        ).execute()
-        logging.info(f"Email with ID {email_id} marked as read.")
-    except Exception as e:
-        logging.error(f"Failed to mark email as read: {e}", exc_info=True)
-
 def send_error_email(service, recipient, subject, error_message):
     """
     Send an email to notify about a processing error.
@@ -225,7 +296,7 @@ def send_error_email(service, recipient, subject, error_message):
                 f"To: {recipient}\r\nSubject: {subject}\r\n\r\n{error_message}".encode("utf-8")
             ).decode("utf-8")
         }
-        service.users().messages().send(userId='me', body=message).execute()
+        indeed.gmail_quota.execute(service.users().messages().send(userId='me', body=message))
         logging.info(f"Error notification sent to {recipient}")
     except HttpError as error:
         logging.error(f"Failed to send error notification: {error}", exc_info=True)
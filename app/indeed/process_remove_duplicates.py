@@ -1,18 +1,70 @@
 import os
+import io
+import logging
 import pandas as pd
 from pathlib import Path
+import indeed.state_store
+import indeed.job_identity
+import indeed.job_storage
+import indeed.job_database
+import indeed.job_aggregates
+
+import indeed.logging_config
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
 
 # Define global variables
 RAW_DATA_DIR = "./data/raw/"
 PREPROCESSED_DATA_DIR = "./data/intermediate/"
 
-def raw_csv_to_inter_csv():
+# Columns identifying a job (see indeed.job_identity.job_key); a job already seen in any month is a duplicate
+DEDUP_COLUMNS = ['link', 'title', 'company']
+
+# Global job key index: one "<job key>\t<month>" line per job, for the month it was first kept in
+JOB_INDEX_PATH = os.path.join(indeed.state_store.STATE_DIR, "dedup_job_keys.tsv")
+
+# In-memory copy of the job key index (job key -> month), valid while the file keeps this size
+_key_index = {"keys": {}, "file_size": None}
+
+def raw_csv_to_inter_csv(csv_file=None, rebuild=False):
     """
     Processes the latest CSV file from the raw data directory by removing duplicates and saving the result.
 
+    Jobs are identified by their Indeed job ID (see indeed.job_identity), so a posting that
+    reappears in later emails, or in a later month, is kept only once and with its canonical link.
+    Only the rows appended to the raw file since the previous call are read: their job keys are
+    checked against the global key index and the new unique rows are appended to the
+    intermediate file. The intermediate file is rebuilt from scratch when the raw file was
+    replaced, or when the index and the files disagree (e.g. after a crash mid-update).
+
+    Rebuilding a month drops its entries from the index first; jobs kept by an earlier month stay
+    excluded, while jobs recorded for a later month are claimed by the rebuilt one (rebuild later
+    months afterwards, as the backfill does, to drop them there).
+    With the Parquet storage backend, the month partitions are processed instead
+    (see raw_parquet_to_inter_parquet). With the SQLite backend, jobs are deduplicated by an
+    upsert as they are stored, so only a rebuild has anything to do.
+
+    Args:
+        csv_file (str): Name of the raw CSV file to process instead of the latest one, e.g. '2024_12.csv'.
+        rebuild (bool): If True, rebuild the intermediate file and the index from the whole raw file.
+
     Returns:
-        None
+        int: Number of unique rows added to the intermediate file.
     """
+    if indeed.job_storage.is_parquet():
+        return raw_parquet_to_inter_parquet(csv_file and csv_file.split('.')[0], rebuild=rebuild)
+    if indeed.job_storage.is_sqlite():
+        if not rebuild:
+            return 0
+        if csv_file:
+            # The month may have no raw rows left, e.g. when the backfill emptied it
+            return indeed.job_database.rebuild_month(csv_file.split('.')[0])
+        months = indeed.job_database.list_months("raw_jobs")
+        if not months:
+            raise FileNotFoundError("No raw jobs found in the job database.")
+        return indeed.job_database.rebuild_month(months[0])
+
     # Ensure the preprocessed directory exists
     Path(PREPROCESSED_DATA_DIR).mkdir(parents=True, exist_ok=True)
 
@@ -21,19 +73,214 @@ def raw_csv_to_inter_csv():
     if not csv_files:
         raise FileNotFoundError("No CSV files found in the specified raw data directory.")
 
-    latest_csv = max(csv_files, key=lambda x: x.split('.')[0])
-
-    # Load the latest CSV file into a DataFrame
+    latest_csv = csv_file or max(csv_files, key=lambda x: x.split('.')[0])
+    month = latest_csv.split('.')[0]
     file_path = os.path.join(RAW_DATA_DIR, latest_csv)
-    data = pd.read_csv(file_path)
+    output_file = os.path.join(PREPROCESSED_DATA_DIR, latest_csv.replace('.csv', '_intermediate.csv'))
+    state_name = f"dedup_{month}"
 
-    # Remove duplicates based on specific columns
-    columns_to_check = ['title', 'link', 'company']
-    data_deduplicated = data.drop_duplicates(subset=columns_to_check, keep='first')
+    raw_stat = os.stat(file_path)
+    state = indeed.state_store.load_state(state_name)
+    incremental = (
+        not rebuild
+        and state is not None
+        and state.get("raw_inode") == raw_stat.st_ino
+        and state.get("raw_offset", 0) <= raw_stat.st_size
+        and os.path.exists(output_file)
+        and os.path.getsize(output_file) == state.get("intermediate_size")
+        and os.path.exists(JOB_INDEX_PATH)
+    )
 
-    # Save the deduplicated DataFrame to the preprocessed directory
-    output_file = os.path.join(PREPROCESSED_DATA_DIR, latest_csv.replace('.csv', '_intermediate.csv'))
-    data_deduplicated.to_csv(output_file, index=False)
+    if incremental:
+        offset = state["raw_offset"]
+        if offset == raw_stat.st_size:
+            return 0
+        keys = load_key_index()
+    else:
+        offset = 0
+        keys = drop_month_from_index(month)
+
+    # Load the rows appended since the last call; keep the values as written
+    with open(file_path, 'rb') as file:
+        header = file.readline()
+        start = max(offset, len(header))
+        file.seek(start)
+        tail = file.read()
+    end_offset = start + len(tail)
+    data = pd.read_csv(io.BytesIO(header + tail), dtype=str)
+
+    # Remove duplicates by job identity, against the jobs kept in earlier calls and months as well
+    data_deduplicated, new_keys = select_new_jobs(data, keys, month)
+
+    # Save the deduplicated rows to the preprocessed directory
+    if incremental:
+        data_deduplicated.to_csv(output_file, mode='a', header=False, index=False)
+    else:
+        data_deduplicated.to_csv(output_file, index=False)
+
+    append_to_index(keys, new_keys)
+    update_job_counts(month, data_deduplicated, incremental, lambda: pd.read_csv(output_file, dtype=str))
+
+    indeed.state_store.save_state(state_name, {
+        "raw_inode": raw_stat.st_ino,
+        "raw_offset": end_offset,
+        "intermediate_size": os.path.getsize(output_file),
+    })
+    logging.info(f"Deduplicated {len(data)} new raw rows of {latest_csv}: {len(data_deduplicated)} unique rows added.")
+    return len(data_deduplicated)
+
+def raw_parquet_to_inter_parquet(month=None, rebuild=False):
+    """
+    Parquet counterpart of raw_csv_to_inter_csv(), used when indeed.job_storage.STORAGE_BACKEND
+    is "parquet": the raw part files not deduplicated yet are read, and their new unique jobs are
+    written to the intermediate dataset as one more part file. Both month partitions are compacted
+    once they hold too many part files.
+
+    Args:
+        month (str): Month to process instead of the latest one, e.g. '2024_12'.
+        rebuild (bool): If True, rebuild the intermediate partition and the index from the whole raw partition.
+
+    Returns:
+        int: Number of unique rows added to the intermediate partition.
+    """
+    raw_dir = indeed.job_storage.PARQUET_RAW_DIR
+    intermediate_dir = indeed.job_storage.PARQUET_INTERMEDIATE_DIR
+    months = indeed.job_storage.list_months(raw_dir)
+    if not months:
+        raise FileNotFoundError("No Parquet partitions found in the raw data directory.")
+    month = month or months[0]
+    state_name = f"dedup_parquet_{month}"
+
+    raw_parts = indeed.job_storage.list_parts(raw_dir, month)
+    state = indeed.state_store.load_state(state_name)
+    incremental = (
+        not rebuild
+        and state is not None
+        and set(state.get("raw_parts", [])) <= set(raw_parts)
+        and state.get("intermediate_parts") == indeed.job_storage.list_parts(intermediate_dir, month)
+        and os.path.exists(JOB_INDEX_PATH)
+    )
+
+    if incremental:
+        processed_parts = set(state["raw_parts"])
+        new_parts = [part for part in raw_parts if part not in processed_parts]
+        if not new_parts:
+            return 0
+        keys = load_key_index()
+    else:
+        new_parts = raw_parts
+        keys = drop_month_from_index(month)
+
+    data = indeed.job_storage.read_parts(raw_dir, month, new_parts)
+    data_deduplicated, new_keys = select_new_jobs(data, keys, month)
+
+    if incremental:
+        indeed.job_storage.append_jobs(data_deduplicated, intermediate_dir, month)
+    else:
+        indeed.job_storage.write_month(data_deduplicated, intermediate_dir, month)
+    append_to_index(keys, new_keys)
+    update_job_counts(month, data_deduplicated, incremental,
+                      lambda: indeed.job_storage.read_jobs(intermediate_dir, months=[month]))
+
+    # Every raw part is deduplicated now, so compacting cannot mix processed and new rows
+    indeed.job_storage.compact_month(raw_dir, month)
+    indeed.job_storage.compact_month(intermediate_dir, month)
+    indeed.state_store.save_state(state_name, {
+        "raw_parts": indeed.job_storage.list_parts(raw_dir, month),
+        "intermediate_parts": indeed.job_storage.list_parts(intermediate_dir, month),
+    })
+    logging.info(f"Deduplicated {len(data)} new raw rows of {month}: {len(data_deduplicated)} unique rows added.")
+    return len(data_deduplicated)
+
+def select_new_jobs(data, keys, month):
+    """
+    Keep the rows of a month whose job is in neither the index nor an earlier row.
+    Jobs the index records for a later month are claimed by this one.
+
+    Args:
+        data (pd.DataFrame): Raw rows, in the order they were written.
+        keys (dict): Job key index, job key to month.
+        month (str): Month the rows belong to, e.g. '2024_12'.
+
+    Returns:
+        tuple: The new rows, with canonical links, and a dict of their job keys to the month.
+    """
+    row_keys = [indeed.job_identity.job_key(*values) for values in data[DEDUP_COLUMNS].itertuples(index=False, name=None)]
+    is_new = []
+    new_keys = {}
+    for key in row_keys:
+        kept_in = keys.get(key)
+        if key in new_keys or (kept_in is not None and kept_in <= month):
+            is_new.append(False)
+        else:
+            new_keys[key] = month
+            is_new.append(True)
+    # A Series, so that an empty mask still selects rows rather than columns
+    data_deduplicated = data[pd.Series(is_new, index=data.index, dtype=bool)].copy()
+    data_deduplicated['link'] = data_deduplicated['link'].map(indeed.job_identity.canonical_link)
+    return data_deduplicated, new_keys
+
+def update_job_counts(month, data_deduplicated, incremental, load_month_jobs):
+    """
+    Keep the month's counts in indeed.job_aggregates in step with its intermediate data:
+    the new rows are added to them, or they are recomputed when the month was rebuilt
+    or has no counts yet.
+
+    Args:
+        month (str): Month the rows belong to, e.g. '2024_12'.
+        data_deduplicated (pd.DataFrame): Rows just added to the intermediate data.
+        incremental (bool): False if the rows are the whole month.
+        load_month_jobs (callable): Loads all the intermediate rows of the month.
+    """
+    if not incremental:
+        indeed.job_aggregates.rebuild_month_counts(month, data_deduplicated)
+    elif os.path.exists(indeed.job_aggregates.counts_path(month)):
+        indeed.job_aggregates.add_month_counts(month, data_deduplicated)
+    else:
+        indeed.job_aggregates.rebuild_month_counts(month, load_month_jobs())
+
+def append_to_index(keys, new_keys):
+    """Record new job keys in the index file and in its in-memory copy; later lines of the file override earlier ones."""
+    os.makedirs(os.path.dirname(JOB_INDEX_PATH), exist_ok=True)
+    with open(JOB_INDEX_PATH, 'a', encoding='utf-8') as index_file:
+        index_file.write(''.join(f"{key}\t{key_month}\n" for key, key_month in new_keys.items()))
+    keys.update(new_keys)
+    _key_index.update(keys=keys, file_size=os.path.getsize(JOB_INDEX_PATH))
+
+def load_key_index():
+    """
+    Return the global job key index as a dict of job key to month, reading the index file
+    unless the in-memory copy is current, i.e. the file has not been written by another process since.
+    """
+    if not os.path.exists(JOB_INDEX_PATH):
+        _key_index.update(keys={}, file_size=None)
+        return _key_index["keys"]
+    file_size = os.path.getsize(JOB_INDEX_PATH)
+    if _key_index["file_size"] != file_size:
+        keys = {}
+        with open(JOB_INDEX_PATH, 'r', encoding='utf-8') as index_file:
+            for line in index_file:
+                key, _, key_month = line.rstrip('\n').partition('\t')
+                if key_month:
+                    keys[key] = key_month
+        _key_index.update(keys=keys, file_size=file_size)
+    return _key_index["keys"]
+
+def drop_month_from_index(month):
+    """
+    Atomically rewrite the job key index without the jobs of a month, before that month is rebuilt.
+
+    Returns:
+        dict: The remaining index, job key to month.
+    """
+    keys = {key: key_month for key, key_month in load_key_index().items() if key_month != month}
+    os.makedirs(os.path.dirname(JOB_INDEX_PATH), exist_ok=True)
+    temp_path = f"{JOB_INDEX_PATH}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as index_file:
+        index_file.write(''.join(f"{key}\t{key_month}\n" for key, key_month in keys.items()))
+    os.replace(temp_path, JOB_INDEX_PATH)
+    _key_index.update(keys=keys, file_size=os.path.getsize(JOB_INDEX_PATH))
+    return keys
 
 # Example usage
 # raw_csv_to_pre_processed_data()
@@ -1,4 +1,5 @@
 from bs4 import BeautifulSoup  # For parsing HTML
+from bs4.element import Tag, NavigableString, CData
 import os
 import datetime
 import logging
@@ -9,6 +10,17 @@ import indeed.logging_config
 # Get logger
 logger = indeed.logging_config.get_logger(__name__)
 
+# Text that marks a job block; it belongs to the nearest enclosing <tbody> or <table>
+JOB_LABELS = ["days ago", "just posted", "day ago"]
+CONTAINER_TAGS = ('tbody', 'table')
+
+# Text inside these tags is not part of the text of an enclosing <td> (BeautifulSoup
+# stores it as Script, Stylesheet, ... strings, which get_text() skips)
+NON_CONTENT_TAGS = ('script', 'style', 'template', 'rt', 'rp')
+
+# Strings get_text() keeps; comments, doctypes and the strings above are skipped
+CONTENT_STRING_TYPES = (NavigableString, CData)
+
 def extract_individual_job_blocks(soup):
     """
     Extract job postings by finding the nearest ancestor <tbody> or <table>
@@ -21,14 +33,12 @@ def extract_individual_job_blocks(soup):
     """
     job_postings = []
     seen_ancestors = set()
-    job_labels = ["days ago", "just posted", "day ago"]
-
     matching_strings = soup.find_all(
-        string=lambda text: text and any(label in text.lower() for label in job_labels)
+        string=lambda text: text and any(label in text.lower() for label in JOB_LABELS)
     )
 
     for match in matching_strings:
-        ancestor = match.find_parent(['tbody', 'table'])
+        ancestor = match.find_parent(list(CONTAINER_TAGS))
         if ancestor and id(ancestor) not in seen_ancestors:
             job_postings.append(ancestor)
             seen_ancestors.add(id(ancestor))
@@ -36,25 +46,172 @@ def extract_individual_job_blocks(soup):
     logging.info(f"Extracted {len(job_postings)} job postings.")
     return job_postings
 
-def save_flagged_html(soup):
+def markup_token(tag, attrs):
     """
-    Save the flagged HTML content to a log file with proper UTF-8 encoding.
+    Return "tag.class" for an element, or the bare tag when it has no class. BeautifulSoup
+    gives the class as a list of names, the other backends as the attribute string.
+    """
+    class_name = attrs.get('class')
+    if isinstance(class_name, str):
+        class_name = class_name.split()
+    return f"{tag}.{'.'.join(class_name)}" if class_name else tag
+
+class JobBlockLocator:
+    """
+    Find job blocks and split them into rows in a single pass over the document.
+
+    Fed with start/end/text events in document order, it gives the same result as
+    extract_individual_job_blocks followed by get_block_rows on each block, without
+    searching the tree again: every <td> collects its text while open, every <tr>
+    remembers the range of <td>s and the markup opened inside it, and every container
+    the range of <tr>s opened inside it.
+    Only rows inside a container are kept, and they are released as soon as the outermost
+    container closes, so memory is bounded by the largest top-level table.
+    """
+
+    def __init__(self):
+        self.open_kinds = []       # Kind of each open element: 'td', 'tr', 'container' or None
+        self.open_tds = []         # Indexes of the open <td>s inside a <tr>
+        self.open_trs = []         # Indexes of the open <tr>s
+        self.open_containers = []  # Indexes of the open containers
+        self.td_texts = []         # Text pieces of each <td>
+        self.rows = []             # [first td, end td, link, markup] of each <tr>
+        self.containers = []       # [first tr, end tr] of each container
+        self.matched = []          # Containers holding a job label, in order of first match
+        self.matched_set = set()
+        self.blocks = []           # Rows of the job blocks of the containers already closed
+
+    def start(self, tag, attrs):
+        """Handle an opening tag. attrs is a mapping of attribute names to values."""
+        if self.open_trs:
+            token = markup_token(tag, attrs)
+            for row_index in self.open_trs:
+                self.rows[row_index][3].append(token)
+        if tag == 'td' and self.open_trs:
+            self.open_tds.append(len(self.td_texts))
+            self.td_texts.append([])
+            self.open_kinds.append('td')
+        elif tag == 'tr' and self.open_containers:
+            self.open_trs.append(len(self.rows))
+            self.rows.append([len(self.td_texts), None, None, []])
+            self.open_kinds.append('tr')
+        elif tag in CONTAINER_TAGS:
+            self.open_containers.append(len(self.containers))
+            self.containers.append([len(self.rows), None])
+            self.open_kinds.append('container')
+        else:
+            if tag == 'a' and 'href' in attrs:
+                for row_index in self.open_trs:
+                    row = self.rows[row_index]
+                    if row[2] is None:
+                        row[2] = attrs['href']
+            self.open_kinds.append(None)
+
+    def end(self, tag):
+        """Handle the closing tag of the innermost open element."""
+        kind = self.open_kinds.pop()
+        if kind == 'td':
+            self.open_tds.pop()
+        elif kind == 'tr':
+            self.rows[self.open_trs.pop()][1] = len(self.td_texts)
+        elif kind == 'container':
+            self.containers[self.open_containers.pop()][1] = len(self.rows)
+            if not self.open_containers:
+                self.flush_blocks()
+
+    def text(self, data, content=True):
+        """
+        Handle a text node. content is False for text that is not part of the text of an
+        enclosing <td>, such as comments or scripts; it can still hold a job label.
+        """
+        if not data:
+            return
+        if content:
+            for td_index in self.open_tds:
+                self.td_texts[td_index].append(data)
+        if self.open_containers:
+            lowered = data.lower()
+            if any(label in lowered for label in JOB_LABELS):
+                container = self.open_containers[-1]
+                if container not in self.matched_set:
+                    self.matched.append(container)
+                    self.matched_set.add(container)
+
+    def flush_blocks(self):
+        """
+        Build the rows of the matched containers once no container is open, and forget
+        everything else collected so far. Containers are matched in document order, so the
+        blocks keep their first-match order.
+        """
+        for container in self.matched:
+            first_row, end_row = self.containers[container]
+            rows = []
+            for first_td, end_td, link, markup in self.rows[first_row:end_row]:
+                columns = [''.join(self.td_texts[i]).strip() for i in range(first_td, end_td)]
+                rows.append((columns, link, tuple(markup)))
+            self.blocks.append(rows)
+        self.td_texts, self.rows, self.containers = [], [], []
+        self.matched, self.matched_set = [], set()
+
+    def close(self):
+        """
+        Close the elements still open and return the job blocks.
+
+        Returns:
+            list: One list per job block, of (columns, link, markup) tuples, one per <tr> of the block.
+        """
+        while self.open_kinds:
+            self.end(None)
+
+        logging.info(f"Extracted {len(self.blocks)} job postings.")
+        return self.blocks
+
+def locate_job_block_rows(soup):
+    """
+    Find the job blocks of a parsed email and split them into rows, in one traversal.
 
     Args:
         soup (BeautifulSoup): Parsed HTML content.
+    Returns:
+        list: One list of (columns, link, markup) rows per job block, in the order of
+        extract_individual_job_blocks.
+    """
+    locator = JobBlockLocator()
+    iterators = [iter(soup.contents)]
+    while iterators:
+        node = next(iterators[-1], None)
+        if node is None:
+            iterators.pop()
+            if iterators:
+                locator.end(None)
+        elif isinstance(node, Tag):
+            locator.start(node.name, node.attrs)
+            iterators.append(iter(node.contents))
+        else:
+            locator.text(node, type(node) in CONTENT_STRING_TYPES)
+    return locator.close()
+
+def save_flagged_html(soup, reason="No job postings found", prefix="flagged"):
+    """
+    Save the flagged HTML content to a log file with proper UTF-8 encoding.
+
+    Args:
+        soup (BeautifulSoup or str): Parsed HTML content, or the raw HTML.
+        reason (str): Why the content was flagged, for the log.
+        prefix (str): File name prefix; the file name ends with the current UTC time.
     """
     try:
         log_dir = "./log/flagged_html_files"
         os.makedirs(log_dir, exist_ok=True)
 
         timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H-%M-%S")
-        file_name = f"flagged_{timestamp}.html"
+        file_name = f"{prefix}_{timestamp}.html"
         file_path = os.path.join(log_dir, file_name)
 
         with open(file_path, "w", encoding="utf-8") as file:
             file.write(str(soup))
 
-        logging.info(f"No job postings found. HTML content saved to {file_path}")
+        logging.info(f"{reason}. HTML content saved to {file_path}")
     except Exception as e:
         logging.error(f"Failed to save flagged HTML content: {e}", exc_info=True)
 
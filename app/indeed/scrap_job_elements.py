@@ -5,6 +5,11 @@ import time
 import logging
 import csv  
 import re
+from dataclasses import dataclass
+from collections import Counter
+import hashlib
+import indeed.job_identity
+import indeed.scrap_job_blocks
 
 # Configure logging
 import indeed.logging_config 
@@ -12,164 +17,350 @@ import indeed.logging_config
 # Get logger
 logger = indeed.logging_config.get_logger(__name__)
 
-def get_individual_job(soup):
+# Columns of the job DataFrame, in output order
+JOB_COLUMNS = [
+    "title", "link", "company", "rating", "location", "type",
+    "description", "days_posted", "days", "posting_date", "fetched_date",
+]
+
+# Version of the extraction logic; bump it whenever a change alters the extracted records,
+# so results cached by indeed.parse_cache are discarded
+EXTRACTOR_VERSION = 2
+
+# Fields read from the email; the others are derived from days_posted and the current date
+EXTRACTED_FIELDS = JOB_COLUMNS[:8]
+
+@dataclass(slots=True)
+class JobRecord:
+    """Job details extracted from one job block."""
+    title: object = None
+    link: object = None
+    company: object = None
+    rating: object = None
+    location: object = None
+    type: object = None
+    description: object = None
+    days_posted: object = None
+    days: object = None
+    posting_date: object = None
+    fetched_date: object = None
+
+def jobs_to_dataframe(records):
+    """
+    Build the job DataFrame of an email from its job records, in one go.
+
+    Args:
+        records (list): JobRecord objects.
+
+    Returns:
+        pd.DataFrame: One row per record with the JOB_COLUMNS columns; empty if there are no records.
+    """
+    if not records:
+        return pd.DataFrame()
+    jobs_df = pd.DataFrame(
+        [tuple(getattr(record, column) for column in JOB_COLUMNS) for record in records],
+        columns=JOB_COLUMNS,
+    )
+    # Keep whole numbers of days when some are missing, instead of turning them into floats
+    jobs_df['days'] = jobs_df['days'].astype('Int64')
+    return jobs_df
+
+def get_individual_job(soup, reference_date=None):
     """
     Extract job details from the given BeautifulSoup object, handling potential HTML structure variations.
     Supports both Data_2 and single data column structures, with special handling for company names containing periods.
 
     Args:
         soup (BeautifulSoup): Parsed BeautifulSoup object of the page.
+        reference_date (datetime): Date the posting age is counted from, defaults to now.
+
+    Returns:
+        JobRecord: The job details.
+    """
+    return get_individual_job_from_rows(get_block_rows(soup), reference_date)
+
+def get_block_rows(soup):
+    """
+    Split a job block into its <tr> rows.
+
+    Args:
+        soup (BeautifulSoup): Parsed job block.
 
     Returns:
-        pd.DataFrame: A DataFrame containing job details.
+        list: One (columns, link, markup) tuple per <tr>, where columns holds the stripped
+        text of each <td>, link is the first href in the row, or None, and markup the
+        "tag.class" of every element inside the row, in document order.
     """
     rows = soup.find_all('tr')
     logging.info(f"Found {len(rows)} <tr> elements.")
 
-    data = []
-    for idx, row in enumerate(rows, start=1):
+    block_rows = []
+    for row in rows:
         columns = [td.text.strip() for td in row.find_all('td')]
         link = row.find('a', href=True)
-        row_data = {
-            "Number": idx,
-            "TR HTML": str(row),
-            "Link": link['href'] if link else None,
-        }
-        for i, col in enumerate(columns, start=1):
-            row_data[f"Data {i}"] = col
-        data.append(row_data)
-
-    tr_df = pd.DataFrame(data)
+        markup = tuple(indeed.scrap_job_blocks.markup_token(element.name, element.attrs) for element in row.find_all(True))
+        block_rows.append((columns, link['href'] if link else None, markup))
+    return block_rows
+
+# Column signatures (number of <td>s per <tr>) of the job block layouts Indeed sends
+KNOWN_TEMPLATES = {
+    (1, 1, 1, 1): "single_column",
+    (1, 1, 1, 1, 1): "single_column",
+    (1, 1, 1, 1, 1, 1): "single_column",
+    (1, 1, 1, 1, 1, 1, 1): "single_column",
+    (1, 4, 3, 1, 1, 1): "data_2",
+    (1, 4, 3, 1, 2, 1, 1, 1): "data_2",
+}
+
+# Rows of those layouts, as (number of <td>s, markup) pairs, captured from the fixture emails
+# in usecases/interm files; a block with any other row is an unknown layout
+KNOWN_ROWS = {
+    (1, ('td.r-e', 'a')),
+    (1, ('td.r-f', 'span.r-g', 'span.jecl-jc-companyRating', 'span', 'img.jecl-starreview-companyReviewStars', 'span.r-h')),
+    (1, ('td.r-f', 'span.r-g', 'span.r-h')),
+    (1, ('td.r-i',)),
+    (1, ('td.r-j',)),
+    (1, ('td.r-k',)),
+    (1, ('td',)),
+    (1, ('td', 'img')),
+    (1, ('td', 'strong')),
+    (1, ('td', 'h2', 'a')),
+    (2, ('td', 'table', 'tr', 'td', 'strong')),
+    (3, ('td', 'td', 'strong', 'td', 'img')),
+    (4, ('td', 'table', 'tr', 'td', 'td', 'strong', 'td', 'img')),
+}
+
+# Compiled extraction plans by column signature, how often each block fingerprint was seen
+# since the counts were last taken, and the unknown fingerprints already flagged by this process
+_plans = {}
+template_counts = Counter()
+_flagged_layouts = set()
+
+@dataclass(slots=True, frozen=True)
+class ExtractionPlan:
+    """Which rows of a job block to read, and how, for one column signature."""
+    template: str
+    width: int
+    steps: tuple  # (row index, reader) pairs
+
+def block_columns(block_rows):
+    """Return the column signature of a job block: the number of <td>s of each <tr>."""
+    return tuple(len(columns) for columns, _, _ in block_rows)
+
+def block_fingerprint(block_rows):
+    """Return the structural fingerprint of a job block: the number of <td>s and the markup of each <tr>."""
+    return tuple((len(columns), markup) for columns, _, markup in block_rows)
+
+def is_known_layout(fingerprint):
+    """Return True if a block fingerprint is a known Indeed layout, row by row."""
+    columns = tuple(column_count for column_count, _ in fingerprint)
+    return columns in KNOWN_TEMPLATES and all(row in KNOWN_ROWS for row in fingerprint)
+
+def layout_id(fingerprint):
+    """Return a short, stable name for a block fingerprint, usable in file names."""
+    return hashlib.sha1(repr(fingerprint).encode("utf-8")).hexdigest()[:12]
+
+def get_extraction_plan(columns):
+    """
+    Return the extraction plan of a column signature, compiling it on first use.
+
+    Rows are interpreted by position, with the same priority as the original per-row
+    checks: the first row, then the layout-specific rows, then the last two rows.
+    """
+    plan = _plans.get(columns)
+    if plan is not None:
+        return plan
+
+    row_count = len(columns)
+    width = max(columns, default=0)
+    # Data_2 layout when some row has a second cell
+    has_data_2 = width >= 2
+
+    steps = []
+    for number in range(1, row_count + 1):
+        if number == 1:
+            reader = read_title
+        elif has_data_2 and number == 3:
+            reader = read_company_and_rating
+        elif has_data_2 and number == 4:
+            reader = read_location_and_type
+        elif not has_data_2 and number == 2:
+            reader = read_company_line
+        elif not has_data_2 and number == 3:
+            reader = read_type
+        elif number == row_count:
+            reader = read_days_posted
+        elif number == row_count - 1:
+            reader = read_description
+        else:
+            continue
+        steps.append((number - 1, reader))
+
+    template = KNOWN_TEMPLATES.get(columns, "data_2" if has_data_2 else "single_column")
+    plan = ExtractionPlan(template, width, tuple(steps))
+    _plans[columns] = plan
+    return plan
+
+def record_template(fingerprint):
+    """
+    Count a block fingerprint. Returns True the first time an unknown fingerprint is seen
+    by this process, so the caller can save the email for inspection.
+    """
+    template_counts[fingerprint] += 1
+    if is_known_layout(fingerprint) or fingerprint in _flagged_layouts:
+        return False
+    _flagged_layouts.add(fingerprint)
+    logging.warning(f"Unknown job block layout {layout_id(fingerprint)}: {fingerprint}; extracting with the closest layout.")
+    return True
+
+def take_template_counts():
+    """Return the fingerprint counts of this process and start counting again, for a worker to hand them to the parent."""
+    global template_counts
+
+    counts, template_counts = template_counts, Counter()
+    return counts
+
+def merge_template_counts(counts):
+    """Add fingerprint counts taken in another process to the counts of this one."""
+    template_counts.update(counts)
+
+def get_template_stats():
+    """Return how often each known and unknown block fingerprint was counted by this process."""
+    stats = {"known": {}, "unknown": {}}
+    for fingerprint, count in template_counts.items():
+        stats["known" if is_known_layout(fingerprint) else "unknown"][fingerprint] = count
+    return stats
+
+def log_template_stats():
+    """Log how many job blocks of each layout were seen, by template name for the known ones."""
+    stats = get_template_stats()
+    known = Counter()
+    for fingerprint, count in stats["known"].items():
+        known[KNOWN_TEMPLATES[tuple(column_count for column_count, _ in fingerprint)]] += count
+    unknown = {layout_id(fingerprint): count for fingerprint, count in stats["unknown"].items()}
+    logging.info(f"Job block layouts seen: {dict(known)}; unknown: {unknown or 'none'}")
+
+def read_title(job, columns, link, cell):
+    job.title = cell(columns, 1)
+    # Store the link without the per-email click-tracking parameters
+    job.link = indeed.job_identity.canonical_link(link)
+
+def read_company_and_rating(job, columns, link, cell):
+    job.company = cell(columns, 1)
+    job.rating = cell(columns, 2)
+
+def read_location_and_type(job, columns, link, cell):
+    location_text = cell(columns, 1)
+    if location_text and '•' in location_text:
+        location_parts = location_text.split('•')
+        job.location = location_parts[0].strip()
+        job.type = location_parts[1].strip()
+    else:
+        job.location = location_text
+        job.type = None
+
+def read_company_line(job, columns, link, cell):
+    # Parse company info with enhanced handling of company names with periods and non-breaking spaces
+    company_info = cell(columns, 1, '')
+    if '-' in company_info:
+        left_side, location = company_info.split('-', 1)
+        job.location = location.strip() # Remove leading/trailing spaces
+        
+        
+        # Prepare for the next step to extract company name and rating
+        left_side = left_side.replace('\xa0', ' ') # (Important) # Replace non-breaking spaces with regular spaces 
+        left_side = left_side.strip() # Remove leading/trailing spaces 
+        last_space_index = left_side.rfind(' ') # Find the last space (either regular or non-breaking)
+        potential_comany_name_and_rating = left_side
+
+
+        if last_space_index != -1:  # has some index meaning some space is found 
+            pattern = r"^\d+(\.\d{1,2})?$"  # is a number X, X.XX or X.X
+            possible_rating = potential_comany_name_and_rating[last_space_index+1:].strip() # Get the rating part and remove leading/trailing spaces
+            if bool(re.match(pattern, possible_rating)):
+                job.rating = possible_rating
+                job.company = potential_comany_name_and_rating[:last_space_index].strip() 
+            else: 
+                job.company = potential_comany_name_and_rating.strip()
+
+        else:  # no space found 
+            job.company = potential_comany_name_and_rating.strip() 
             
 
-    logging.info("Job details extracted Raw Dataframe based on tr.")
-    logging.info(f"Job DataFrame:\n{tr_df}")
-
-    # # Save DataFrame for validation
-    # temp_title_for_save = tr_df[tr_df['Number'] == 1]['Data 1'].iloc[0]
-    # filename = f"{temp_title_for_save}.csv" 
-    # tr_df.to_csv(
-    #     filename,
-    #     index=False,
-    #     quoting=csv.QUOTE_ALL,
-    #     quotechar='"',
-    #     escapechar='\\',
-    #     lineterminator='\n',
-    #     sep=',',
-    #     encoding='utf-8',
-    # )
-
-    job_data = {
-        "title": None,
-        "link": None,
-        "company": None,
-        "rating": None,
-        "location": None,
-        "type": None,
-        "description": None,
-        "days_posted": None,
-        "days": None
-    }
-
-    # Check if Data_2 exists in the DataFrame
-    has_data_2 = 'Data 2' in tr_df.columns
-    print(f"Data_2 column exists: {has_data_2}")
-    
-    if has_data_2: 
-        # Original logic for Data_2 structure
-        for _, row in tr_df.iterrows():
-            number = row['Number']
-
-            if number == 1:
-                job_data['title'] = row.get('Data 1', None)
-                job_data['link'] = row.get('Link', None)
-            elif number == 3:
-                job_data['company'] = row.get('Data 1', None)
-                job_data['rating'] = row.get('Data 2', None)
-            elif number == 4:
-                location_text = row.get('Data 1', None)
-                if location_text and '•' in location_text:
-                    location_parts = location_text.split('•')
-                    job_data['location'] = location_parts[0].strip()
-                    job_data['type'] = location_parts[1].strip()
-                else:
-                    job_data['location'] = location_text
-                    job_data['type'] = None
-            elif number == len(tr_df):
-                job_data['days_posted'] = row.get('Data 1', None)
-            elif number == len(tr_df) - 1:
-                job_data['description'] = row.get('Data 1', None)
     else:
-          # New logic for structure without Data_2
-        for _, row in tr_df.iterrows():
-            number = row['Number']
-
-            if number == 1:
-                job_data['title'] = row.get('Data 1', None)
-                job_data['link'] = row.get('Link', None)
-            elif number == 2:
-                # Parse company info with enhanced handling of company names with periods and non-breaking spaces
-                company_info = row.get('Data 1', '')
-                if '-' in company_info:
-                    left_side, location = company_info.split('-', 1)
-                    job_data['location'] = location.strip() # Remove leading/trailing spaces
-                    
-                    
-                    # Prepare for the next step to extract company name and rating
-                    left_side = left_side.replace('\xa0', ' ') # (Important) # Replace non-breaking spaces with regular spaces 
-                    left_side = left_side.strip() # Remove leading/trailing spaces 
-                    last_space_index = left_side.rfind(' ') # Find the last space (either regular or non-breaking)
-                    potential_comany_name_and_rating = left_side
-
-
-                    if last_space_index != -1:  # has some index meaning some space is found 
-                        pattern = r"^\d+(\.\d{1,2})?$"  # is a number X, X.XX or X.X
-                        possible_rating = potential_comany_name_and_rating[last_space_index+1:].strip() # Get the rating part and remove leading/trailing spaces
-                        if bool(re.match(pattern, possible_rating)):
-                            job_data['rating'] = possible_rating
-                            job_data['company'] = potential_comany_name_and_rating[:last_space_index].strip() 
-                        else: 
-                            job_data['company'] = potential_comany_name_and_rating.strip()
-
-                    else:  # no space found 
-                        job_data['company'] = potential_comany_name_and_rating.strip() 
-                        
-
-                else:
-                    job_data['company'] = company_info.strip()
-                    
-            elif number == 3:
-                job_data['type'] = row.get('Data 1', None)
-            elif number == len(tr_df):
-                job_data['days_posted'] = row.get('Data 1', None)
-            elif number == len(tr_df) - 1:
-                job_data['description'] = row.get('Data 1', None)
+        job.company = company_info.strip()
+
+def read_type(job, columns, link, cell):
+    job.type = cell(columns, 1)
+
+def read_days_posted(job, columns, link, cell):
+    job.days_posted = cell(columns, 1)
+
+def read_description(job, columns, link, cell):
+    job.description = cell(columns, 1)
+
+def get_individual_job_from_rows(block_rows, reference_date=None):
+    """
+    Extract job details from the rows of a job block, whichever HTML backend split them.
+
+    Row N is the N-th <tr> of the block and "Data i" its i-th <td>. A cell missing from a row
+    reads as NaN when another row of the block has it, and as None otherwise, as it did when
+    the rows were held in a DataFrame.
+
+    Args:
+        block_rows (list): (columns, link, markup) tuples, as returned by get_block_rows or
+            indeed.scrap_job_blocks.locate_job_block_rows.
+        reference_date (datetime): Date the posting age is counted from, defaults to now.
+
+    Returns:
+        JobRecord: The job details.
+    """
+    plan = get_extraction_plan(block_columns(block_rows))
+    width = plan.width
+
+    def cell(columns, i, default=None):
+        if i <= len(columns):
+            return columns[i - 1]
+        return float('nan') if i <= width else default
+
+    job = JobRecord()
+    for row_index, reader in plan.steps:
+        columns, link, _ = block_rows[row_index]
+        reader(job, columns, link, cell)
 
+    return stamp_posting_date(job, reference_date)
+
+def stamp_posting_date(job, reference_date=None):
+    """
+    Fill in the posting age and dates of a job record from its "days posted" text.
+
+    Args:
+        job (JobRecord): Job details read from the block.
+        reference_date (datetime): Date the posting age is counted from, defaults to now.
+
+    Returns:
+        JobRecord: The same record.
+    """
     # Process posting date
-    current_date = datetime.now()
-    days_posted_text = job_data['days_posted']
+    current_date = reference_date or datetime.now()
+    days_posted_text = job.days_posted
 
     if days_posted_text:
         if "day" in days_posted_text.lower():
             days_ago = int(''.join(filter(str.isdigit, days_posted_text))) if any(c.isdigit() for c in days_posted_text) else 1
             posting_date = current_date - timedelta(days=days_ago)
-            job_data['days'] = days_ago
+            job.days = days_ago
         elif "just posted" in days_posted_text.lower():
             posting_date = current_date
-            job_data['days'] = 0
+            job.days = 0
         else:
             posting_date = current_date
-            job_data['days'] = None
+            job.days = None
     else:
         posting_date = None
-        job_data['days'] = None
-
-    job_data['posting_date'] = posting_date.strftime('%Y-%m-%d') if posting_date else None
-    job_data['fetched_date'] = current_date.strftime('%Y-%m-%d')
-
-    job_df = pd.DataFrame([job_data])
+        job.days = None
 
-    logging.info("Job details extracted successfully.")
-    logging.info(f"Job DataFrame:\n{job_df}")
+    job.posting_date = posting_date.strftime('%Y-%m-%d') if posting_date else None
+    job.fetched_date = current_date.strftime('%Y-%m-%d')
 
-    return job_df
\ No newline at end of file
+    return job
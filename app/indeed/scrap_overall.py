@@ -5,6 +5,10 @@ import pandas as pd
 from bs4 import BeautifulSoup
 import indeed.scrap_job_blocks
 import indeed.scrap_job_elements
+import indeed.html_backends
+import indeed.parse_cache
+import indeed.job_storage
+import indeed.job_database
 
 # Configure logging
 import indeed.logging_config 
@@ -28,11 +32,7 @@ def scrap_process_email_content_to_csv(soup):
         soup (BeautifulSoup): Parsed email content as a BeautifulSoup object.
     """
     try:
-        # Extract individual job blocks as a list of soups
-        job_blocks = indeed.scrap_job_blocks.extract_individual_job_blocks(soup)
-
-        # Scrape all individual job details into a DataFrame
-        jobs_df = scrap_all_individual_jobs(job_blocks)
+        jobs_df = extract_jobs_from_soup(soup)
 
         # Append the DataFrame to a CSV file
         results_create_or_append_to_csv(jobs_df, reset_file=False)
@@ -42,6 +42,101 @@ def scrap_process_email_content_to_csv(soup):
         logging.error(f"Failed to process email content: {e}", exc_info=True)
         raise
 
+def extract_jobs_from_html(html_content, backend=None, reference_date=None):
+    """
+    Parse raw email HTML and extract its job details, without writing anything.
+    Safe to run in a worker process: takes and returns picklable values only.
+    An email whose HTML was already scraped is served from indeed.parse_cache without parsing.
+
+    Args:
+        html_content (str): Raw HTML of the email.
+        backend (str): HTML parser backend, defaults to indeed.html_backends.PARSER_BACKEND.
+        reference_date (datetime): Date the posting ages are counted from, such as the time
+            the email was received; defaults to now.
+
+    Returns:
+        pd.DataFrame: Job details of every job block in the email.
+    """
+    version = indeed.scrap_job_elements.EXTRACTOR_VERSION
+    fields = indeed.scrap_job_elements.EXTRACTED_FIELDS
+    cache_key = indeed.parse_cache.content_key(html_content)
+
+    # Already scraped: rebuild the records from the cache, with dates counted from the reference date
+    cached = indeed.parse_cache.get_records(cache_key, version)
+    if cached is not None:
+        cached_records, layouts = cached
+        # Count the block layouts as a parse would; JSON stored the fingerprint tuples as lists
+        flag_unknown_layouts(
+            [tuple((count, tuple(markup)) for count, markup in layout) for layout in layouts],
+            html_content,
+        )
+        records = []
+        for values in cached_records:
+            job = indeed.scrap_job_elements.JobRecord(**dict(zip(fields, values)))
+            records.append(indeed.scrap_job_elements.stamp_posting_date(job, reference_date))
+        logging.info(f"Loaded {len(records)} jobs from the parse cache.")
+        return indeed.scrap_job_elements.jobs_to_dataframe(records)
+
+    block_rows = indeed.html_backends.extract_block_rows(html_content, backend)
+    layouts = flag_unknown_templates(block_rows, html_content)
+    records = extract_job_records(block_rows, reference_date)
+    indeed.parse_cache.put_records(
+        cache_key, version, [[getattr(job, field) for field in fields] for job in records], layouts
+    )
+    return indeed.scrap_job_elements.jobs_to_dataframe(records)
+
+def extract_jobs_from_soup(soup):
+    """
+    Extract the job details of every job block in parsed email content.
+
+    Args:
+        soup (BeautifulSoup): Parsed email content as a BeautifulSoup object.
+
+    Returns:
+        pd.DataFrame: Job details of every job block in the email.
+    """
+    # Locate the job blocks and split them into rows, in one pass over the tree
+    block_rows = indeed.scrap_job_blocks.locate_job_block_rows(soup)
+    flag_unknown_templates(block_rows, soup)
+
+    # Scrape all individual job details into a DataFrame
+    return scrap_all_block_rows(block_rows)
+
+def flag_unknown_templates(block_rows_list, content):
+    """
+    Count the layout fingerprint of every job block and save the email for inspection the
+    first time a block layout that is not a known Indeed template shows up.
+
+    Args:
+        block_rows_list (list): One list of (columns, link, markup) rows per job block.
+        content (BeautifulSoup or str): The email, parsed or raw.
+
+    Returns:
+        list: The layout fingerprint of every job block.
+    """
+    fingerprints = [indeed.scrap_job_elements.block_fingerprint(block_rows) for block_rows in block_rows_list]
+    flag_unknown_layouts(fingerprints, content)
+    return fingerprints
+
+def flag_unknown_layouts(fingerprints, content):
+    """
+    Count block layout fingerprints and save the email for inspection the first time one
+    of them is not a known Indeed template.
+
+    Args:
+        fingerprints (list): Layout fingerprints from indeed.scrap_job_elements.block_fingerprint.
+        content (BeautifulSoup or str): The email, parsed or raw.
+    """
+    for fingerprint in fingerprints:
+        if indeed.scrap_job_elements.record_template(fingerprint):
+            # The fingerprint itself can be longer than a file name may be; name the file after its hash
+            name = indeed.scrap_job_elements.layout_id(fingerprint)
+            indeed.scrap_job_blocks.save_flagged_html(
+                content,
+                reason=f"Unknown job block layout {name}",
+                prefix=f"unknown_layout_{name}",
+            )
+
 def scrap_all_individual_jobs(soup_list):
     """
     Takes a list of BeautifulSoup objects and extracts job details into a DataFrame.
@@ -55,28 +150,77 @@ def scrap_all_individual_jobs(soup_list):
     all_jobs = []
     for soup in soup_list:
         try:
-            job_data = indeed.scrap_job_elements.get_individual_job(soup)
-            all_jobs.append(job_data)
+            all_jobs.append(indeed.scrap_job_elements.get_individual_job(soup))
         except Exception as e:
             logging.error(f"Error processing individual job block: {e}", exc_info=True)
 
-    unified_dataframe = pd.concat(all_jobs, ignore_index=True) if all_jobs else pd.DataFrame()
+    unified_dataframe = indeed.scrap_job_elements.jobs_to_dataframe(all_jobs)
     logging.info(f"Processed {len(all_jobs)} job blocks into a DataFrame.")
     return unified_dataframe
 
+def scrap_all_block_rows(block_rows_list):
+    """
+    Takes the rows of each job block and extracts job details into a DataFrame.
+
+    Args:
+        block_rows_list (list): One list of (columns, link, markup) rows per job block.
+
+    Returns:
+        pd.DataFrame: Unified DataFrame with job details.
+    """
+    return indeed.scrap_job_elements.jobs_to_dataframe(extract_job_records(block_rows_list))
+
+def extract_job_records(block_rows_list, reference_date=None):
+    """
+    Takes the rows of each job block and extracts a job record per block.
+    Blocks that fail to extract are logged and skipped.
+
+    Args:
+        block_rows_list (list): One list of (columns, link, markup) rows per job block.
+        reference_date (datetime): Date the posting ages are counted from, defaults to now.
+
+    Returns:
+        list: JobRecord objects.
+    """
+    all_jobs = []
+    for block_rows in block_rows_list:
+        try:
+            all_jobs.append(indeed.scrap_job_elements.get_individual_job_from_rows(block_rows, reference_date))
+        except Exception as e:
+            logging.error(f"Error processing individual job block: {e}", exc_info=True)
+
+    logging.info(f"Processed {len(all_jobs)} job blocks.")
+    return all_jobs
+
 def results_create_or_append_to_csv(dataframe, reset_file=False):
     """
     Appends a DataFrame to a CSV file named with the current year and month.
-    The file is stored in ./data/raw_processed. If the file does not exist, it is created.
+    The file is stored in ./data/raw. If the file does not exist, it is created.
+    With the Parquet storage backend, the jobs are appended to the month partition of
+    indeed.job_storage.PARQUET_RAW_DIR instead; with the SQLite backend, they are inserted
+    in indeed.job_database, deduplicated on the way.
 
     Args:
         dataframe (pd.DataFrame): The DataFrame to append to the CSV file.
         reset_file (bool): If True, resets the file and writes the DataFrame as a fresh file.
     """
     try:
-        os.makedirs(raw_directory, exist_ok=True)
-
         current_year_month = datetime.now().strftime('%Y_%m')
+        if indeed.job_storage.is_parquet():
+            if reset_file:
+                indeed.job_storage.write_month(dataframe, indeed.job_storage.PARQUET_RAW_DIR, current_year_month)
+            else:
+                indeed.job_storage.append_jobs(dataframe, indeed.job_storage.PARQUET_RAW_DIR, current_year_month)
+            return
+        if indeed.job_storage.is_sqlite():
+            if reset_file:
+                indeed.job_database.replace_raw_month(dataframe, current_year_month)
+                indeed.job_database.rebuild_month(current_year_month)
+            else:
+                indeed.job_database.insert_jobs(dataframe, current_year_month)
+            return
+
+        os.makedirs(raw_directory, exist_ok=True)
         file_path = os.path.join(raw_directory, f'{current_year_month}.csv')
 
         if reset_file or not os.path.exists(file_path):
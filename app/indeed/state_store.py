@@ -0,0 +1,54 @@
+import os
+import json
+import logging
+
+import indeed.logging_config 
+
+# Get logger
+logger = indeed.logging_config.get_logger(__name__)
+
+# Directory holding small JSON state files (checkpoints, caches) that must survive restarts
+STATE_DIR = "./data/state/"
+
+def state_path(name):
+    """Return the file path of the named state file."""
+    return os.path.join(STATE_DIR, f"{name}.json")
+
+def load_state(name, default=None):
+    """
+    Load a JSON state file.
+
+    Args:
+        name (str): Name of the state file, without extension.
+        default: Value returned when the file does not exist or cannot be read.
+    """
+    file_path = state_path(name)
+    if not os.path.exists(file_path):
+        return default
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except Exception as e:
+        logging.warning(f"Error loading state file {file_path}: {e}. Ignoring it.")
+        return default
+
+def save_state(name, data):
+    """
+    Atomically save a JSON state file, so a crash mid-write never leaves a truncated file behind.
+
+    Args:
+        name (str): Name of the state file, without extension.
+        data: JSON-serializable content.
+    """
+    os.makedirs(STATE_DIR, exist_ok=True)
+    file_path = state_path(name)
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temp_path, file_path)
+
+def clear_state(name):
+    """Remove a JSON state file if it exists."""
+    file_path = state_path(name)
+    if os.path.exists(file_path):
+        os.remove(file_path)
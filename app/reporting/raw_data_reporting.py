@@ -1,15 +1,95 @@
 # This module is directly based of the interm data
 
 import os
+import time
 import logging
+import threading
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+import indeed.job_storage
+import indeed.job_database
+import indeed.job_aggregates
+import indeed.scrap_job_elements
 
-def load_and_combine_data(files, data_dir):
-    """Load and combine data from the given files."""
+# Data loaded for the dashboard, shared by all its callbacks: cache key -> (files signature, data).
+# An entry is reused until one of the files it was loaded from changes size or modification time.
+# The cached frames are shared, so callers must not modify them in place.
+MAX_CACHE_ENTRIES = 64
+_data_cache = {}
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "load_seconds": 0.0}
+
+def files_signature(paths):
+    """Return the (path, modification time, size) of each file; missing files have neither."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+def cached_load(key, paths, load):
+    """
+    Return the data cached under a key, calling load() to (re)load it when it is missing or
+    when any of the files it depends on changed since it was loaded.
+
+    Args:
+        key (tuple): Cache key, identifying what is loaded and how.
+        paths (list): Files the data is loaded from.
+        load (callable): Loads the data.
+    """
+    signature = files_signature(paths)
+    with _cache_lock:
+        entry = _data_cache.get(key)
+        if entry is not None and entry[0] == signature:
+            _cache_stats["hits"] += 1
+            return entry[1]
+
+    start = time.perf_counter()
+    data = load()
+    elapsed = time.perf_counter() - start
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+        _cache_stats["load_seconds"] += elapsed
+        _data_cache.pop(key, None)
+        while len(_data_cache) >= MAX_CACHE_ENTRIES:
+            del _data_cache[next(iter(_data_cache))]
+        _data_cache[key] = (signature, data)
+    logging.info(f"Loaded {key[0]} data ({len(data)} rows) in {elapsed:.3f}s.")
+    return data
+
+def get_cache_stats():
+    """Return the hit and miss counts of the data cache, the total time spent loading and the cached entries."""
+    with _cache_lock:
+        return {**_cache_stats, "entries": len(_data_cache)}
+
+def read_csv_cached(file_path):
+    """Read a CSV file once, until it changes."""
+    return cached_load(("csv", file_path), [file_path], lambda: pd.read_csv(file_path))
+
+def database_paths():
+    """Files of the SQLite job database; writes go to the -wal file first."""
+    return [indeed.job_database.DATABASE_PATH, f"{indeed.job_database.DATABASE_PATH}-wal"]
+
+def load_and_combine_data(files, data_dir, columns=None, since=None):
+    """
+    Load and combine data from the given files.
+
+    Args:
+        columns (list): Columns to load, defaults to all of them.
+        since (date or str): Keep only the jobs posted on or after this date.
+    """
     combined_data = []
     for file in files:
-        df = pd.read_csv(os.path.join(data_dir, file))
+        df = read_csv_cached(os.path.join(data_dir, file))
+        if columns:
+            df = df[[column for column in df.columns if column in columns]]
+        if since is not None and 'posting_date' in df.columns:
+            since_date = since if isinstance(since, str) else since.strftime('%Y-%m-%d')
+            df = df[df['posting_date'].fillna('').astype(str) >= since_date]
         combined_data.append(df)
     if combined_data:
         data = pd.concat(combined_data)
@@ -24,27 +104,288 @@ def sort_data_by_days_posted(data):
     else:
         raise ValueError("Expected column 'days_posted' not found in the dataset.")
 
-def intermediate_load_data(data_dir, top_n=3):
-    """Load and combine data from the top N recent months."""
-    files = [f for f in os.listdir(data_dir) if f.endswith('intermediate.csv')]
-    file_details = [(f, f.split('_')[0], f.split('_')[1]) for f in files]
+def load_parquet_data(dataset_dir, top_n=3, columns=None, since=None):
+    """Load and combine data from the top N recent month partitions of a Parquet dataset."""
+    months = indeed.job_storage.list_months(dataset_dir)
     if top_n is not None:
-        file_details = sorted(file_details, key=lambda x: (x[1], x[2]), reverse=True)[:top_n]
-    else:
-        file_details = sorted(file_details, key=lambda x: (x[1], x[2]), reverse=True)
-    files = [f[0] for f in file_details]
-    data = load_and_combine_data(files, data_dir)
-    return sort_data_by_days_posted(data)
+        months = months[:top_n]
+    paths = [
+        os.path.join(indeed.job_storage.partition_dir(dataset_dir, month), part)
+        for month in months for part in indeed.job_storage.list_parts(dataset_dir, month)
+    ]
+    return paths, lambda: indeed.job_storage.read_jobs(dataset_dir, months=months, columns=columns, since=since)
 
-def raw_load_data(raw_processed_dir, top_n=3):
-    """Load and combine data from the top N recent months in the raw processed directory."""
-    files = [f for f in os.listdir(raw_processed_dir) if f.endswith('.csv')]
+def list_month_files(data_dir, suffix, top_n):
+    """Return the monthly CSV files of a directory, newest first, limited to the top N months."""
+    files = [f for f in os.listdir(data_dir) if f.endswith(suffix)]
     file_details = [(f, f.split('_')[0], f.split('_')[1]) for f in files]
     if top_n is not None:
         file_details = sorted(file_details, key=lambda x: (x[1], x[2]), reverse=True)[:top_n]
     else:
         file_details = sorted(file_details, key=lambda x: (x[1], x[2]), reverse=True)
-    files = [f[0] for f in file_details]
-    data = load_and_combine_data(files, raw_processed_dir)
-    return sort_data_by_days_posted(data)
+    return [f[0] for f in file_details]
+
+def month_data_source(kind, data_dir, suffix, top_n, columns, since):
+    """
+    Return how to load the top N months of intermediate or raw data from the configured
+    storage backend: the cache key, the files the data depends on and the loading function.
+
+    Args:
+        kind (str): "intermediate" or "raw".
+        data_dir (str): Directory of the monthly CSVs of the csv backend.
+        suffix (str): File name suffix of the monthly CSVs.
+    """
+    columns = projected_columns(columns)
+    key = (kind, indeed.job_storage.get_storage_backend(), data_dir, top_n, tuple(columns or ()), str(since))
+    if indeed.job_storage.is_parquet():
+        dataset_dir = indeed.job_storage.PARQUET_INTERMEDIATE_DIR if kind == "intermediate" else indeed.job_storage.PARQUET_RAW_DIR
+        paths, load = load_parquet_data(dataset_dir, top_n, columns, since)
+    elif indeed.job_storage.is_sqlite():
+        table = "jobs" if kind == "intermediate" else "raw_jobs"
+        paths = database_paths()
+        load = lambda: indeed.job_database.query_jobs(table, top_n=top_n, since=since, columns=columns)
+    else:
+        files = list_month_files(data_dir, suffix, top_n)
+        paths = [os.path.join(data_dir, f) for f in files]
+        load = lambda: load_and_combine_data(files, data_dir, columns, since)
+    return key, paths, load
+
+def load_month_data(kind, data_dir, suffix, top_n, columns, since):
+    """Load, combine and sort the top N months of intermediate or raw data through the data cache; see month_data_source()."""
+    key, paths, load = month_data_source(kind, data_dir, suffix, top_n, columns, since)
+    return cached_load(key, paths, lambda: sort_data_by_days_posted(load()))
+
+def projected_columns(columns):
+    """Columns to load for a projection: the requested ones and 'days_posted', which the data is sorted by."""
+    return list(dict.fromkeys([*columns, 'days_posted'])) if columns else None
+
+def intermediate_load_data(data_dir, top_n=3, columns=None, since=None):
+    """
+    Load and combine data from the top N recent months.
+    With the Parquet storage backend, the months are read from
+    indeed.job_storage.PARQUET_INTERMEDIATE_DIR instead of data_dir, and with the SQLite
+    backend from the jobs table of indeed.job_database.
+    The data is cached until its files change; the returned frame must not be modified in place.
+
+    Args:
+        columns (list): Columns to load, defaults to all of them.
+        since (date or str): Keep only the jobs posted on or after this date.
+    """
+    return load_month_data("intermediate", data_dir, 'intermediate.csv', top_n, columns, since)
+
+def raw_load_data(raw_processed_dir, top_n=3, columns=None, since=None):
+    """
+    Load and combine data from the top N recent months in the raw processed directory.
+    With the Parquet storage backend, the months are read from
+    indeed.job_storage.PARQUET_RAW_DIR instead, and with the SQLite backend from the
+    raw_jobs table of indeed.job_database.
+    The data is cached until its files change; the returned frame must not be modified in place.
+    """
+    return load_month_data("raw", raw_processed_dir, '.csv', top_n, columns, since)
+
+def filter_data(data, companies=None, locations=None, types=None):
+    """Keep the jobs matching the dashboard's company, location and type filters."""
+    if companies:
+        data = data[data['company'].isin(companies)]
+    if locations:
+        data = data[data['location'].isin(locations)]
+    if types:
+        data = data[data['type'].isin(types)]
+    return data
+
+class FilterIndex:
+    """
+    Inverted index of a jobs frame for the dashboard's dropdown filters: for each filtered
+    column (indeed.job_database.FILTER_COLUMNS), the row positions of every distinct value.
+    Built once per loaded frame and cached with it; a multi-select filter is the union of
+    its values' positions, and the filters are intersected, so no column is scanned.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.positions = {}
+        for column in indeed.job_database.FILTER_COLUMNS.values():
+            if column in data.columns:
+                # Distinct values in order of first appearance, missing values left out
+                values = data[column].reset_index(drop=True)
+                self.positions[column] = values.groupby(values, sort=False).indices
+
+    def __len__(self):
+        return len(self.data)
+
+    def values(self, column):
+        """Return the distinct values of a filtered column, in order of first appearance."""
+        return list(self.positions.get(column, {}))
+
+    def select(self, companies=None, locations=None, types=None):
+        """Return the rows matching the dashboard's filters, in the order of the indexed frame."""
+        selected = None
+        for argument, values in (('companies', companies), ('locations', locations), ('types', types)):
+            if not values:
+                continue
+            column_positions = self.positions.get(indeed.job_database.FILTER_COLUMNS[argument], {})
+            # The union of the selected values' rows, as a bitmap over the row positions
+            rows = np.zeros(len(self.data), dtype=bool)
+            for value in values:
+                if value in column_positions:
+                    rows[column_positions[value]] = True
+            selected = rows if selected is None else selected & rows
+        return self.data if selected is None else self.data.iloc[np.flatnonzero(selected)]
+
+def get_filter_index(kind, data_dir, top_n=None):
+    """
+    Return the FilterIndex of the top N months of intermediate or raw data, rebuilt when the
+    data changes.
+    """
+    suffix = 'intermediate.csv' if kind == "intermediate" else '.csv'
+    load = intermediate_load_data if kind == "intermediate" else raw_load_data
+    key, paths, _ = month_data_source(kind, data_dir, suffix, top_n, None, None)
+    return cached_load(("filter index", *key), paths, lambda: FilterIndex(load(data_dir, top_n=top_n)))
+
+def load_filtered_data(data_dir, raw_processed_dir, companies=None, locations=None, types=None):
+    """
+    Load the intermediate data of all months and the raw data of the 3 most recent months,
+    keeping the jobs matching the dashboard's filters. The filters are answered from the
+    data's FilterIndex, or with the SQLite storage backend as indexed queries.
+
+    Returns:
+        tuple: The filtered intermediate and raw data.
+    """
+    if indeed.job_storage.is_sqlite():
+        filters = {"companies": companies, "locations": locations, "types": types}
+        key = tuple(tuple(values or ()) for values in filters.values())
+        intermediate_data = cached_load(("filtered intermediate", *key), database_paths(),
+                                        lambda: sort_data_by_days_posted(indeed.job_database.query_jobs("jobs", **filters)))
+        raw_data = cached_load(("filtered raw", *key), database_paths(),
+                               lambda: sort_data_by_days_posted(indeed.job_database.query_jobs("raw_jobs", top_n=3, **filters)))
+        return intermediate_data, raw_data
+
+    return (
+        get_filter_index("intermediate", data_dir).select(companies, locations, types),
+        get_filter_index("raw", raw_processed_dir, top_n=3).select(companies, locations, types),
+    )
+
+class PostingDateIndex:
+    """
+    Row positions of a jobs frame ordered by posting date, so that the jobs of a "last N days"
+    window are found by binary search instead of parsing and scanning the whole posting_date
+    column. Built once per loaded frame and cached with it; rows without a valid posting
+    date are left out of every window.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        dates = pd.to_datetime(data['posting_date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+        known = np.flatnonzero(~np.isnat(dates))
+        self.positions = known[np.argsort(dates[known], kind='stable')]
+        self.dates = dates[self.positions]
+
+    def __len__(self):
+        return len(self.data)
+
+    def since(self, start_date):
+        """Return the rows posted on or after a date, in the order of the indexed frame."""
+        start = pd.Timestamp(start_date).to_datetime64().astype('datetime64[D]')
+        first = np.searchsorted(self.dates, start, side='left')
+        return self.data.iloc[np.sort(self.positions[first:])]
+
+def intermediate_month_sources(data_dir):
+    """
+    Return the intermediate data of each month of the configured storage backend, newest
+    first, as (month, files, load) tuples; load() reads the whole month.
+    """
+    if indeed.job_storage.is_parquet():
+        dataset_dir = indeed.job_storage.PARQUET_INTERMEDIATE_DIR
+        return [
+            (month,
+             [os.path.join(indeed.job_storage.partition_dir(dataset_dir, month), part)
+              for part in indeed.job_storage.list_parts(dataset_dir, month)],
+             lambda month=month: indeed.job_storage.read_jobs(dataset_dir, months=[month]))
+            for month in indeed.job_storage.list_months(dataset_dir)
+        ]
+    suffix = '_intermediate.csv'
+    return [
+        (file_name[:-len(suffix)], [os.path.join(data_dir, file_name)],
+         lambda path=os.path.join(data_dir, file_name): read_csv_cached(path))
+        for file_name in list_month_files(data_dir, suffix, None)
+    ]
+
+def get_posting_date_index(month, paths, load):
+    """Return the PostingDateIndex of one month of intermediate data, rebuilt when its files change."""
+    key = ("posting date index", indeed.job_storage.get_storage_backend(), month, tuple(paths))
+    return cached_load(key, paths, lambda: PostingDateIndex(load()))
+
+def load_recent_data(data_dir, days, companies=None, locations=None, types=None):
+    """
+    Load the intermediate jobs posted in the last N days, keeping the ones matching the
+    dashboard's filters. Months stored before the window starts are skipped, since a job is
+    stored in the month it was fetched, never before it was posted; in the others the window
+    is sliced from the month's PostingDateIndex, so only its jobs are filtered. With the
+    SQLite storage backend it is an indexed posting_date query.
+
+    Args:
+        days (int): Number of days before today the window starts at.
+
+    Returns:
+        pd.DataFrame: The filtered jobs of the window, sorted by 'days_posted'.
+    """
+    since = datetime.now().date() - timedelta(days=days)
+    if indeed.job_storage.is_sqlite():
+        filters = {"companies": companies, "locations": locations, "types": types}
+        key = tuple(tuple(values or ()) for values in filters.values())
+        return cached_load(("recent intermediate", str(since), *key), database_paths(),
+                           lambda: sort_data_by_days_posted(indeed.job_database.query_jobs("jobs", since=since, **filters)))
+
+    first_month = since.strftime('%Y_%m')
+    windows = [
+        get_posting_date_index(month, paths, load).since(since)
+        for month, paths, load in intermediate_month_sources(data_dir) if month >= first_month
+    ]
+    if not windows:
+        return pd.DataFrame(columns=indeed.scrap_job_elements.JOB_COLUMNS)
+    return filter_data(sort_data_by_days_posted(pd.concat(windows)), companies, locations, types)
+
+def load_job_counts(data_dir, companies=None, locations=None, types=None, since=None):
+    """
+    Load the pre-aggregated job counts of all months (see indeed.job_aggregates), keeping
+    the ones matching the dashboard's filters. Months without counts yet, such as months
+    stored before the counts existed, are counted once from the counted columns of their
+    intermediate data.
+
+    Args:
+        since (date): Keep only the counts of the jobs posted on or after this date.
+
+    Returns:
+        pd.DataFrame: The indeed.job_aggregates.AGGREGATE_COLUMNS and a 'count' column.
+    """
+    if indeed.job_storage.is_sqlite():
+        counts_index = cached_load(("job counts", "sqlite"), database_paths(),
+                                   lambda: PostingDateIndex(indeed.job_database.count_jobs()))
+    else:
+        if indeed.job_storage.is_parquet():
+            dataset_dir = indeed.job_storage.PARQUET_INTERMEDIATE_DIR
+            months = indeed.job_storage.list_months(dataset_dir)
+            load_month = lambda month: indeed.job_storage.read_jobs(
+                dataset_dir, months=[month], columns=indeed.job_aggregates.AGGREGATE_COLUMNS
+            )
+        else:
+            suffix = '_intermediate.csv'
+            months = [f[:-len(suffix)] for f in os.listdir(data_dir) if f.endswith(suffix)]
+            load_month = lambda month: pd.read_csv(
+                os.path.join(data_dir, f"{month}{suffix}"), dtype=str,
+                usecols=lambda column: column in indeed.job_aggregates.AGGREGATE_COLUMNS,
+            )
+        for month in months:
+            if not os.path.exists(indeed.job_aggregates.counts_path(month)):
+                indeed.job_aggregates.rebuild_month_counts(month, load_month(month))
 
+        paths = [indeed.job_aggregates.counts_path(month) for month in sorted(months)]
+        counts_index = cached_load(
+            ("job counts", indeed.job_storage.get_storage_backend(), data_dir), paths,
+            lambda: PostingDateIndex(
+                pd.concat([indeed.job_aggregates.read_month_counts(month) for month in sorted(months)], ignore_index=True)
+                if months else indeed.job_aggregates.count_jobs(pd.DataFrame())
+            ),
+        )
+    counts = counts_index.data if since is None else counts_index.since(since)
+    return filter_data(counts, companies, locations, types)
@@ -0,0 +1,168 @@
+# Server-side paging, sorting and filtering for the dashboard DataTables (page_action="custom")
+
+import re
+import math
+import logging
+import pandas as pd
+
+# One expression of a DataTable filter query: {column} <operator> <value>, or {column} is <type>,
+# with the operator joining it to the next expression
+FILTER_EXPRESSION = re.compile(
+    r"""\s*\{(?P<column>(?:[^}\\]|\\.)+)\}\s*(?:
+        (?P<unary>is\s+(?:blank|nil|num|str))
+        |(?P<operator>datestartswith|[is]?(?:contains|eq|ne|ge|le|gt|lt)(?=\s)|[is]?(?:>=|<=|!=|=|>|<))
+         \s*(?P<value>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`|[^\s]+)
+    )\s*(?P<join>&&|\|\||and\s+|or\s+|$)""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+# Word forms of the relational operators
+OPERATOR_ALIASES = {'eq': '=', 'ne': '!=', 'ge': '>=', 'le': '<=', 'gt': '>', 'lt': '<'}
+
+def parse_filter_query(filter_query):
+    """
+    Split a DataTable filter query, as built by the table's filter row, into expressions.
+
+    Expressions are joined by "&&" (or "and") and "||" (or "or"), "&&" binding tighter;
+    parentheses are not supported.
+
+    Args:
+        filter_query (str): e.g. '{company} contains "Bank" && {rating} >= 4 || {type} eq "Contract"'.
+
+    Returns:
+        list: The alternatives joined by "||", each a list of (column, operator, value,
+        case_sensitive) tuples joined by "&&"; value is None for "is ..." checks.
+
+    Raises:
+        ValueError: If part of the query is not understood.
+    """
+    alternatives = [[]]
+    position = 0
+    filter_query = (filter_query or '').strip()
+    while position < len(filter_query):
+        match = FILTER_EXPRESSION.match(filter_query, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Unsupported table filter: {filter_query[position:]!r}")
+        expressions = alternatives[-1]
+        column = re.sub(r"\\(.)", r"\1", match.group('column'))
+        if match.group('unary'):
+            expressions.append((column, ' '.join(match.group('unary').lower().split()), None, True))
+        else:
+            operator = match.group('operator').lower()
+            # An i or s prefix makes the operator case insensitive or sensitive
+            case_sensitive = not operator.startswith('i')
+            if operator[0] in 'is':
+                operator = operator[1:]
+            operator = OPERATOR_ALIASES.get(operator, operator)
+            expressions.append((column, operator, parse_filter_value(match.group('value')), case_sensitive))
+        if match.group('join').strip().lower() in ('||', 'or'):
+            alternatives.append([])
+        position = match.end()
+    return [expressions for expressions in alternatives if expressions]
+
+def parse_filter_value(value):
+    """Return a filter value without its quotes."""
+    if len(value) > 1 and value[0] in '"\'`' and value[-1] == value[0]:
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+def to_number(value):
+    """Return a filter value as a float, or None if it is not a number."""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def filter_mask(values, operator, value, case_sensitive=True):
+    """Return the boolean mask of the rows of one column matching one filter expression."""
+    present = values.notna()
+    if operator == 'is nil':
+        return ~present
+    if operator == 'is blank':
+        return ~present | (values.astype(str).str.strip() == '')
+    numbers = pd.to_numeric(values, errors='coerce')
+    if operator == 'is num':
+        return numbers.notna()
+    if operator == 'is str':
+        return present & numbers.isna()
+
+    text = values.astype(str).where(present)
+    if operator == 'contains':
+        return text.str.contains(value, case=case_sensitive, regex=False, na=False).astype(bool)
+    if operator == 'datestartswith':
+        return text.str.startswith(value, na=False).astype(bool)
+
+    # Relational operators compare numbers when both sides are numbers, text otherwise
+    number = to_number(value)
+    if number is not None and numbers[present].notna().all():
+        left, right = numbers, number
+    else:
+        left, right = text, value
+        if not case_sensitive:
+            left, right = left.str.lower(), right.lower()
+    comparisons = {
+        '=': left.eq, '!=': left.ne, '<': left.lt, '<=': left.le, '>': left.gt, '>=': left.ge,
+    }
+    return comparisons[operator](right).where(present, operator == '!=').astype(bool)
+
+def apply_filter_query(data, filter_query):
+    """
+    Keep the rows matching a DataTable filter query: all the expressions of one of its
+    alternatives. Expressions on unknown columns are ignored; a query that cannot be parsed
+    is logged and matches no rows, rather than showing the table unfiltered.
+    """
+    try:
+        alternatives = parse_filter_query(filter_query)
+    except ValueError as e:
+        logging.warning(f"{e}; showing no rows.")
+        return data.iloc[:0]
+    if not alternatives:
+        return data
+
+    mask = pd.Series(False, index=data.index)
+    for expressions in alternatives:
+        matches = pd.Series(True, index=data.index)
+        for column, operator, value, case_sensitive in expressions:
+            if column not in data.columns:
+                continue
+            matches &= filter_mask(data[column], operator, value, case_sensitive)
+        mask |= matches
+    return data if mask.all() else data[mask]
+
+def apply_sort(data, sort_by):
+    """Sort by the DataTable's sort_by columns, keeping missing values last."""
+    sort_by = [item for item in (sort_by or []) if item.get('column_id') in data.columns]
+    if not sort_by:
+        return data
+    return data.sort_values(
+        by=[item['column_id'] for item in sort_by],
+        ascending=[item.get('direction') != 'desc' for item in sort_by],
+        na_position='last',
+        kind='mergesort',
+    )
+
+def get_table_page(data, page_current, page_size, sort_by=None, filter_query=None):
+    """
+    Filter, sort and slice jobs for a DataTable in custom paging mode; only the requested
+    page is turned into records, with its links as markdown.
+
+    Args:
+        data (pd.DataFrame): Jobs of the table.
+        page_current (int): Page shown by the table, from 0.
+        page_size (int): Rows per page.
+        sort_by (list): The table's sort_by property.
+        filter_query (str): The table's filter_query property.
+
+    Returns:
+        tuple: The page's records and the number of pages.
+    """
+    data = apply_sort(apply_filter_query(data, filter_query), sort_by)
+    page_size = page_size or 10
+    page_count = max(1, math.ceil(len(data) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    page = data.iloc[page_current * page_size:(page_current + 1) * page_size]
+    records = page.to_dict('records')
+    if 'link' in page.columns:
+        for row in records:
+            row['link'] = f"[Click Here]({row['link']})"
+    return records, page_count
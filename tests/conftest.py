@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The application modules are imported as top-level packages (indeed, reporting), as when run from app/
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app'))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+import pytest
+import indeed.archive_backfill
+import indeed.job_storage
+import indeed.state_store
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(indeed.job_storage, "STORAGE_BACKEND", "csv")
+    archive = tmp_path / "data" / "emails" / "2024" / "December"
+    archive.mkdir(parents=True)
+    raw = tmp_path / "data" / "raw"
+    raw.mkdir(parents=True)
+    # Output of an earlier run, from emails that no longer hold any job
+    pd.DataFrame({"title": ["Stale job"], "link": ["https://ca.indeed.com/viewjob?jk=1"]}).to_csv(raw / "2024_12.csv", index=False)
+    return archive, raw
+
+def test_month_without_jobs_replaces_stale_output(workspace):
+    archive, raw = workspace
+    (archive / "2024_12_17_10_00_00___Alert.html").write_text("<html><body><p>No jobs</p></body></html>", encoding="utf-8")
+
+    summary = indeed.archive_backfill.run_backfill(archive_dir="./data/emails", workers=1)
+
+    assert summary["months_rebuilt"] == 1
+    assert pd.read_csv(raw / "2024_12.csv").empty
+    assert pd.read_csv(os.path.join("data", "intermediate", "2024_12_intermediate.csv")).empty
+    assert indeed.state_store.load_state(indeed.archive_backfill.PROGRESS_STATE)["months"] == {"2024_12": 1}
+
+def test_month_whose_emails_all_failed_is_kept_and_retried(workspace):
+    archive, raw = workspace
+    (archive / "2024_12_17_10_00_00___Alert.html").write_bytes(b"\xff\xfe not utf-8")
+
+    summary = indeed.archive_backfill.run_backfill(archive_dir="./data/emails", workers=1, dedup=False)
+
+    assert summary["months_failed"] == 1 and summary["months_rebuilt"] == 0
+    assert list(pd.read_csv(raw / "2024_12.csv")["title"]) == ["Stale job"]
+    assert not indeed.state_store.load_state(indeed.archive_backfill.PROGRESS_STATE, default={}).get("months")
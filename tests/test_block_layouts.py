@@ -0,0 +1,46 @@
+import os
+import pytest
+import indeed.html_backends
+import indeed.scrap_job_elements
+import indeed.scrap_overall
+
+FIXTURE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'usecases', 'interm files'))
+
+@pytest.fixture(autouse=True)
+def fresh_counts(monkeypatch):
+    monkeypatch.setattr(indeed.scrap_job_elements, "template_counts", indeed.scrap_job_elements.Counter())
+    monkeypatch.setattr(indeed.scrap_job_elements, "_flagged_layouts", set())
+
+def test_fixture_layouts_are_known():
+    for name, html_content in indeed.html_backends.load_fixture_emails(FIXTURE_DIR).items():
+        for block_rows in indeed.html_backends.extract_block_rows(html_content):
+            fingerprint = indeed.scrap_job_elements.block_fingerprint(block_rows)
+            assert indeed.scrap_job_elements.is_known_layout(fingerprint), (name, fingerprint)
+
+def test_changed_markup_with_the_same_columns_is_flagged(monkeypatch):
+    known = '<tr><td class="r-e"><a href="u">Title</a></td></tr><tr><td class="r-k">1 day ago</td></tr>'
+    changed = '<tr><td class="r-x"><a href="u">Title</a></td></tr><tr><td class="r-k">1 day ago</td></tr>'
+    saved = []
+    monkeypatch.setattr(indeed.scrap_overall.indeed.scrap_job_blocks, "save_flagged_html",
+                        lambda content, reason, prefix: saved.append(prefix))
+    monkeypatch.setitem(indeed.scrap_job_elements.KNOWN_TEMPLATES, (1, 1), "single_column")
+
+    for html_content in (known, changed, changed):
+        block_rows = indeed.html_backends.extract_block_rows(f"<table>{html_content}</table>")
+        indeed.scrap_overall.flag_unknown_templates(block_rows, html_content)
+
+    assert len(saved) == 1
+    assert len(saved[0]) < 40
+    stats = indeed.scrap_job_elements.get_template_stats()
+    assert list(stats["known"].values()) == [1]
+    assert list(stats["unknown"].values()) == [2]
+
+def test_worker_counts_add_up_in_the_parent():
+    fingerprint = ((1, ('td.r-k',)),)
+    indeed.scrap_job_elements.record_template(fingerprint)
+    counts = indeed.scrap_job_elements.take_template_counts()
+    assert not indeed.scrap_job_elements.template_counts
+
+    indeed.scrap_job_elements.merge_template_counts(counts)
+    indeed.scrap_job_elements.merge_template_counts(counts)
+    assert indeed.scrap_job_elements.template_counts[fingerprint] == 2
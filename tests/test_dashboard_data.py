@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+import indeed.job_aggregates
+import indeed.job_storage
+import indeed.scrap_job_elements
+import reporting.raw_data_reporting
+
+# Jobs are stored in the month they were fetched
+MONTH = datetime.now().strftime('%Y_%m')
+
+def days_ago(days):
+    return (datetime.now().date() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+@pytest.fixture
+def csv_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(indeed.job_storage, "STORAGE_BACKEND", "csv")
+    monkeypatch.setattr(indeed.job_aggregates, "AGGREGATES_DIR", str(tmp_path / "aggregates"))
+    monkeypatch.setattr(reporting.raw_data_reporting, "_data_cache", {})
+    data_dir = tmp_path / "intermediate"
+    data_dir.mkdir()
+    jobs = pd.DataFrame([
+        {"title": f"Job {days}", "company": "Acme", "location": "Toronto", "type": "Full-time",
+         "days_posted": f"{days} days ago", "posting_date": days_ago(days)}
+        for days in (0, 2, 5, 40)
+    ]).reindex(columns=indeed.scrap_job_elements.JOB_COLUMNS)
+    jobs.to_csv(data_dir / f"{MONTH}_intermediate.csv", index=False)
+    return str(data_dir)
+
+def test_posting_date_index_cuts_the_window_by_binary_search():
+    data = pd.DataFrame({"posting_date": ["2024-12-05", None, "2024-12-01", "2024-12-09", "not a date", "2024-12-05"]})
+
+    index = reporting.raw_data_reporting.PostingDateIndex(data)
+
+    assert list(index.dates.astype(str)) == ["2024-12-01", "2024-12-05", "2024-12-05", "2024-12-09"]
+    assert list(index.since("2024-12-05").index) == [0, 3, 5]
+    assert index.since("2024-12-10").empty
+
+def test_recent_data_skips_older_months_and_reuses_the_index(csv_data, monkeypatch):
+    old_month = pd.DataFrame([{"title": "Old job", "company": "Acme", "days_posted": "30+ days ago", "posting_date": "2020-01-15"}])
+    old_month.reindex(columns=indeed.scrap_job_elements.JOB_COLUMNS).to_csv(f"{csv_data}/2020_01_intermediate.csv", index=False)
+    read = []
+    read_csv = reporting.raw_data_reporting.pd.read_csv
+    monkeypatch.setattr(reporting.raw_data_reporting.pd, "read_csv", lambda path, *args, **kwargs: read.append(path) or read_csv(path, *args, **kwargs))
+    built = []
+    index_class = reporting.raw_data_reporting.PostingDateIndex
+    monkeypatch.setattr(reporting.raw_data_reporting, "PostingDateIndex", lambda data: built.append(len(data)) or index_class(data))
+
+    recent = reporting.raw_data_reporting.load_recent_data(csv_data, 3)
+    wider = reporting.raw_data_reporting.load_recent_data(csv_data, 10)
+
+    assert sorted(recent['title']) == ["Job 0", "Job 2"]
+    assert sorted(wider['title']) == ["Job 0", "Job 2", "Job 5"]
+    # Only the month file that can hold the window is read, and its index is built once
+    assert read == [f"{csv_data}/{MONTH}_intermediate.csv"]
+    assert built == [4]
+
+def test_job_counts_are_rebuilt_from_the_counted_columns(csv_data):
+    counts = reporting.raw_data_reporting.load_job_counts(csv_data)
+
+    assert counts['count'].sum() == 4
+    stored = indeed.job_aggregates.read_month_counts(MONTH)
+    assert list(stored.columns) == [*indeed.job_aggregates.AGGREGATE_COLUMNS, 'count']
+
+def test_job_counts_are_kept_per_posting_date(csv_data):
+    counts = reporting.raw_data_reporting.load_job_counts(csv_data)
+
+    assert sorted(counts['posting_date']) == sorted(days_ago(days) for days in (0, 2, 5, 40))
+
+def test_job_counts_window_cuts_at_the_exact_date(csv_data):
+    since = datetime.now().date() - timedelta(days=5)
+
+    counts = reporting.raw_data_reporting.load_job_counts(csv_data, since=since)
+
+    assert sorted(counts['posting_date']) == sorted(days_ago(days) for days in (0, 2, 5))
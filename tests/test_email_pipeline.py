@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import indeed.email_pipeline
+
+class FakePool:
+    """Runs extractions at once, or fails them all like a pool whose worker was killed."""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.submitted = []
+        self.shut_down = False
+
+    def submit(self, function, email_data):
+        self.submitted.append(email_data["metadata"]["subject"])
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        else:
+            future.set_result((f"jobs of {email_data['metadata']['subject']}", {}))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+def fetched_chunk(email_ids):
+    return {email_id: {"html_content": "", "metadata": {"subject": email_id}} for email_id in email_ids}
+
+def use_pools(monkeypatch, pools):
+    pools = iter(pools)
+    current = {}
+
+    def get_parse_pool(parse_workers):
+        if current.get("pool") is None:
+            current["pool"] = next(pools)
+        return current["pool"]
+
+    def reset_parse_pool(pool):
+        pool.shutdown(wait=False, cancel_futures=True)
+        current["pool"] = None
+
+    monkeypatch.setattr(indeed.email_pipeline, "get_parse_pool", get_parse_pool)
+    monkeypatch.setattr(indeed.email_pipeline, "reset_parse_pool", reset_parse_pool)
+
+def test_broken_pool_is_replaced_and_chunk_retried(monkeypatch):
+    broken, healthy = FakePool(broken=True), FakePool()
+    use_pools(monkeypatch, [broken, healthy])
+    fetched = fetched_chunk(["a", "b"])
+    fetched["c"] = RuntimeError("fetch failed")
+
+    jobs = indeed.email_pipeline.extract_chunk_jobs(fetched, parse_workers=2)
+
+    assert broken.shut_down
+    assert healthy.submitted == ["a", "b"]
+    assert jobs == {"a": "jobs of a", "b": "jobs of b"}
+
+def test_emails_fail_once_retries_are_exhausted(monkeypatch):
+    pools = [FakePool(broken=True) for _ in range(indeed.email_pipeline.PARSE_POOL_RETRIES + 1)]
+    use_pools(monkeypatch, pools + [FakePool()])
+
+    jobs = indeed.email_pipeline.extract_chunk_jobs(fetched_chunk(["a", "b"]), parse_workers=2)
+
+    assert all(pool.shut_down for pool in pools)
+    assert list(jobs) == ["a", "b"]
+    assert all(isinstance(result, BrokenProcessPool) for result in jobs.values())
+
+def test_fetch_pool_is_kept_across_cycles():
+    def fetch_chunk(chunk):
+        return {email_id: RuntimeError(threading.current_thread().name) for email_id in chunk}
+
+    def run_cycle():
+        chunks = [[f"{number}a", f"{number}b"] for number in range(6)]
+        return {
+            str(error) for _, fetched, _ in indeed.email_pipeline.iter_processed_chunks(chunks, fetch_chunk, 2, 0)
+            for error in fetched.values()
+        }
+
+    first_threads = run_cycle()
+    pool = indeed.email_pipeline.get_fetch_pool(2)
+    second_threads = run_cycle()
+
+    assert indeed.email_pipeline.get_fetch_pool(2) is pool
+    pool_threads = {thread.name for thread in pool._threads}
+    assert first_threads <= pool_threads and second_threads <= pool_threads
@@ -0,0 +1,52 @@
+import threading
+import httplib2
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+import indeed.gmail_auth
+
+@pytest.fixture(autouse=True)
+def discovery_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(indeed.gmail_auth, "DISCOVERY_CACHE_PATH", str(tmp_path / "gmail_v1_discovery.json"))
+    monkeypatch.setattr(indeed.gmail_auth, "_discovery_document", None)
+    return tmp_path / "gmail_v1_discovery.json"
+
+def test_thread_clients_use_the_account_of_the_service_and_are_reused():
+    creds = Credentials(token="account-a")
+    service = indeed.gmail_auth.build_gmail_service(creds)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        def thread_client(_):
+            return threading.get_ident(), indeed.gmail_auth.get_thread_gmail_service(service)
+        clients = list(pool.map(thread_client, range(16)))
+
+    clients_by_thread = {}
+    for thread, client in clients:
+        clients_by_thread.setdefault(thread, set()).add(id(client))
+    assert all(len(thread_clients) == 1 for thread_clients in clients_by_thread.values())
+    for _, client in clients:
+        assert client is not service
+        assert client._http.credentials is creds
+
+def test_service_not_built_here_is_returned_as_it_is():
+    service = object()
+    assert indeed.gmail_auth.get_thread_gmail_service(service) is service
+
+def test_error_response_is_not_cached_as_discovery_document(discovery_cache, monkeypatch):
+    monkeypatch.setattr(indeed.gmail_auth, "get_static_doc", lambda name, version: None)
+    monkeypatch.setattr(httplib2.Http, "request", lambda self, uri, *args, **kwargs: (
+        httplib2.Response({"status": 503}), b'{"error": {"code": 503, "message": "Service Unavailable"}}'
+    ))
+
+    with pytest.raises(HttpError):
+        indeed.gmail_auth.load_discovery_document()
+    assert not discovery_cache.exists()
+
+def test_invalid_cached_discovery_document_is_replaced(discovery_cache):
+    discovery_cache.write_text('{"error": {"code": 500}}', encoding="utf-8")
+
+    document = indeed.gmail_auth.load_discovery_document()
+
+    assert indeed.gmail_auth.is_discovery_document(document)
+    assert discovery_cache.read_text(encoding="utf-8") == document
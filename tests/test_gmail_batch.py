@@ -0,0 +1,159 @@
+import re
+import json
+import base64
+import httplib2
+import pytest
+from urllib.parse import urlsplit
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+import indeed.gmail_batch
+import indeed.gmail_quota
+import indeed.process_latest_emails
+
+# A batch response as recorded from the Gmail batch endpoint; {content_id}, {status}, {reason},
+# {headers} and {body} are filled in per part
+RECORDED_BATCH_PART = (
+    "--batch_Kn8bPyxaVqM_AAlnfGtgo5s\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-ID: <response-{content_id}>\r\n"
+    "\r\n"
+    "HTTP/1.1 {status} {reason}\r\n"
+    "Content-Type: application/json; charset=UTF-8\r\n"
+    "Vary: Origin\r\n"
+    "Vary: X-Origin\r\n"
+    "Vary: Referer\r\n"
+    "{headers}"
+    "\r\n"
+    "{body}\r\n"
+)
+RECORDED_BATCH_END = "--batch_Kn8bPyxaVqM_AAlnfGtgo5s--\r\n"
+RECORDED_BATCH_CONTENT_TYPE = "multipart/mixed; boundary=batch_Kn8bPyxaVqM_AAlnfGtgo5s"
+
+RECORDED_ERRORS = {
+    429: ("Too Many Requests", "Retry-After: 0\r\n", {
+        "error": {
+            "code": 429,
+            "message": "Too many concurrent requests for user.",
+            "errors": [{"message": "Too many concurrent requests for user.", "domain": "global", "reason": "rateLimitExceeded"}],
+            "status": "RESOURCE_EXHAUSTED",
+        }
+    }),
+    500: ("Internal Server Error", "", {
+        "error": {
+            "code": 500,
+            "message": "Backend Error",
+            "errors": [{"message": "Backend Error", "domain": "global", "reason": "backendError"}],
+            "status": "INTERNAL",
+        }
+    }),
+    404: ("Not Found", "", {
+        "error": {
+            "code": 404,
+            "message": "Requested entity was not found.",
+            "errors": [{"message": "Requested entity was not found.", "domain": "global", "reason": "notFound"}],
+            "status": "NOT_FOUND",
+        }
+    }),
+}
+
+def message_resource(email_id):
+    """A minimal Indeed alert as returned by messages.get."""
+    html = f"<html><body><p>Alert {email_id}</p></body></html>"
+    return {
+        "id": email_id,
+        "payload": {
+            "headers": [
+                {"name": "Subject", "value": f"Jobs {email_id}"},
+                {"name": "From", "value": "alert@indeed.com"},
+                {"name": "Date", "value": "Tue, 17 Dec 2024 10:00:00 +0000"},
+            ],
+            "parts": [{"mimeType": "text/html", "body": {"data": base64.urlsafe_b64encode(html.encode()).decode()}}],
+        },
+    }
+
+class FakeGmailHttp:
+    """
+    Local fake of the Gmail API for googleapiclient: batch requests are answered with the
+    recorded multipart/mixed response, one part per sub-request, and single messages.get
+    requests with the message. Statuses set in batch_errors or get_errors are answered with
+    the recorded error instead.
+    """
+
+    def __init__(self, batch_errors=None, get_errors=None):
+        self.batch_errors = batch_errors or {}
+        self.get_errors = get_errors or {}
+        self.batches = []
+        self.gets = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if urlsplit(uri).path.split("/")[1] == "batch":
+            return self.batch_response(body, headers)
+        email_id = urlsplit(uri).path.rsplit("/", 1)[-1]
+        self.gets.append(email_id)
+        status = self.get_errors.get(email_id, 200)
+        if status != 200:
+            reason, _, error = RECORDED_ERRORS[status]
+            return httplib2.Response({"status": status, "reason": reason}), json.dumps(error).encode()
+        return httplib2.Response({"status": 200}), json.dumps(message_resource(email_id)).encode()
+
+    def batch_response(self, body, headers):
+        boundary = re.search(r'boundary="?([^";]+)"?', headers["content-type"]).group(1)
+        body = body.decode() if isinstance(body, bytes) else body
+        parts = []
+        email_ids = []
+        for part in body.split(f"--{boundary}")[1:-1]:
+            content_id = re.search(r"Content-ID: <([^>]+)>", part).group(1)
+            email_id = re.search(r"GET /gmail/v1/users/me/messages/([^?\s]+)", part).group(1)
+            email_ids.append(email_id)
+            status = self.batch_errors.get(email_id, 200)
+            if status == 200:
+                reason, extra_headers, payload = "OK", "", message_resource(email_id)
+            else:
+                reason, extra_headers, payload = RECORDED_ERRORS[status]
+            parts.append(RECORDED_BATCH_PART.format(
+                content_id=content_id, status=status, reason=reason, headers=extra_headers, body=json.dumps(payload)
+            ))
+        self.batches.append(email_ids)
+        content = "".join(parts) + RECORDED_BATCH_END
+        return httplib2.Response({"status": 200, "content-type": RECORDED_BATCH_CONTENT_TYPE}), content.encode()
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(indeed.gmail_quota.time, "sleep", lambda seconds: None)
+
+def gmail_service(http):
+    return build("gmail", "v1", http=http, static_discovery=True, cache_discovery=False)
+
+def test_batch_get_messages_fails_each_message_on_its_own():
+    http = FakeGmailHttp(batch_errors={"m2": 429, "m4": 500})
+    email_ids = ["m1", "m2", "m3", "m4", "m5"]
+
+    results = indeed.gmail_batch.batch_get_messages(gmail_service(http), email_ids, batch_size=3)
+
+    assert http.batches == [["m1", "m2", "m3"], ["m4", "m5"]]
+    assert set(results) == set(email_ids)
+    for email_id in ("m1", "m3", "m5"):
+        assert results[email_id]["id"] == email_id
+    assert isinstance(results["m2"], HttpError) and results["m2"].resp.status == 429
+    assert isinstance(results["m4"], HttpError) and results["m4"].resp.status == 500
+
+def test_fetch_emails_batch_retries_failed_parts():
+    http = FakeGmailHttp(batch_errors={"m2": 429, "m4": 500})
+    email_ids = ["m1", "m2", "m3", "m4"]
+
+    results = indeed.process_latest_emails.fetch_emails_batch(gmail_service(http), email_ids)
+
+    assert http.batches == [email_ids]
+    assert http.gets == ["m2", "m4"]
+    for email_id in email_ids:
+        assert results[email_id]["metadata"]["subject"] == f"Jobs {email_id}"
+        assert f"Alert {email_id}" in results[email_id]["html_content"]
+
+def test_fetch_emails_batch_keeps_failures_per_message():
+    http = FakeGmailHttp(batch_errors={"m2": 404, "m3": 500}, get_errors={"m2": 404})
+
+    results = indeed.process_latest_emails.fetch_emails_batch(gmail_service(http), ["m1", "m2", "m3"])
+
+    assert results["m1"]["metadata"]["subject"] == "Jobs m1"
+    assert results["m3"]["metadata"]["subject"] == "Jobs m3"
+    assert isinstance(results["m2"], HttpError) and results["m2"].resp.status == 404
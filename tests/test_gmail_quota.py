@@ -0,0 +1,86 @@
+import json
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+import indeed.gmail_quota
+
+class FakeClock:
+    """time.monotonic and time.sleep: sleeping advances the clock at once."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(indeed.gmail_quota.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(indeed.gmail_quota.time, "sleep", clock.sleep)
+    monkeypatch.setattr(indeed.gmail_quota, "_bucket", indeed.gmail_quota.TokenBucket(100, 250))
+    monkeypatch.setattr(indeed.gmail_quota, "_stats", {"calls": 0, "units": 0, "retries": 0, "throttled_seconds": 0.0})
+    return clock
+
+def http_error(status, headers=None):
+    return HttpError(httplib2.Response({"status": status, **(headers or {})}), json.dumps({"error": {"code": status}}).encode())
+
+def failing_call(*errors):
+    """A call raising the given errors in turn, then returning 'ok'."""
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    return call
+
+# Rates and units are powers of two, so the fake clock adds up without rounding
+def test_bucket_allows_a_burst_then_limits_to_the_rate(clock):
+    bucket = indeed.gmail_quota.TokenBucket(rate=8, capacity=16)
+
+    assert bucket.acquire(16) == 0
+    assert clock.now == 0
+
+    # Drained: every further unit takes an eighth of a second
+    for _ in range(5):
+        bucket.acquire(8)
+    assert clock.now == 5
+
+    # Idle time refills the bucket up to its capacity only
+    clock.now += 60
+    assert bucket.acquire(16) == 0
+    assert bucket.acquire(1) == 0.125
+
+def test_call_larger_than_the_bucket_drains_it_instead_of_blocking(clock):
+    bucket = indeed.gmail_quota.TokenBucket(rate=8, capacity=16)
+
+    assert bucket.acquire(100) == 0
+    assert bucket.acquire(16) == 2
+
+def test_retry_after_is_honoured(clock):
+    call = failing_call(http_error(429, {"retry-after": "7"}))
+
+    assert indeed.gmail_quota.call_with_quota(call, units=5) == "ok"
+
+    assert clock.sleeps == [7.0]
+    assert indeed.gmail_quota.get_quota_usage()["retries"] == 1
+
+def test_backoff_without_retry_after_is_jittered_and_grows(clock, monkeypatch):
+    monkeypatch.setattr(indeed.gmail_quota.random, "uniform", lambda low, high: high)
+    call = failing_call(http_error(503), http_error(503), http_error(503))
+
+    assert indeed.gmail_quota.call_with_quota(call, units=5) == "ok"
+
+    assert clock.sleeps == [1, 2, 4]
+
+def test_other_errors_are_not_retried(clock):
+    with pytest.raises(HttpError):
+        indeed.gmail_quota.call_with_quota(failing_call(http_error(404)), units=5)
+
+    assert clock.sleeps == []
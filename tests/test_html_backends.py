@@ -0,0 +1,40 @@
+import os
+import pytest
+import indeed.html_backends
+
+FIXTURE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'usecases', 'interm files'))
+
+@pytest.fixture(scope="module")
+def fixture_emails():
+    emails = indeed.html_backends.load_fixture_emails(FIXTURE_DIR)
+    assert emails, f"No fixture emails found in {FIXTURE_DIR}"
+    return emails
+
+@pytest.mark.parametrize("chunk_size", [7, indeed.html_backends.STREAMING_CHUNK_SIZE])
+def test_streaming_backend_matches_reference_on_fixtures(fixture_emails, monkeypatch, chunk_size):
+    monkeypatch.setattr(indeed.html_backends, "STREAMING_CHUNK_SIZE", chunk_size)
+    for name, html_content in fixture_emails.items():
+        expected = indeed.html_backends.extract_block_rows(html_content, "html.parser")
+        assert expected, name
+        assert indeed.html_backends.extract_block_rows(html_content, "html.parser-stream") == expected, name
+
+@pytest.mark.parametrize("html_content", [
+    '<table><tr><td>a<br>b</br>&#150; &amp; &bogus; &hellip; 3 days ago</td></tr></table>',
+    '<table><tr><td><img/><br></br>x</td><td>1 day ago<script>2 days ago</script></td></tr></table>',
+    '<table><tr><td><!-- 4 days ago --><![CDATA[ 5 days ago ]]><?pi x?></td></tr></table>',
+    '<table><tbody><tr><td class="x"><a href="u&amp;v">T</a></td></tr></i><tr><td><pre>  \n </pre>Just posted</td></tr></tbody></table>',
+])
+def test_streaming_backend_matches_reference_on_edge_cases(html_content):
+    expected = indeed.html_backends.extract_block_rows(html_content, "html.parser")
+    assert indeed.html_backends.extract_block_rows(html_content, "html.parser-stream") == expected
+
+def test_all_backends_agree_on_fixtures(fixture_emails):
+    assert indeed.html_backends.compare_backends_on_fixtures(FIXTURE_DIR) == {}
+
+def test_default_fixture_dir_does_not_depend_on_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert indeed.html_backends.load_fixture_emails().keys() == indeed.html_backends.load_fixture_emails(FIXTURE_DIR).keys()
+
+def test_compare_backends_on_fixtures_fails_without_fixtures(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        indeed.html_backends.compare_backends_on_fixtures(str(tmp_path))
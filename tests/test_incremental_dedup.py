@@ -0,0 +1,67 @@
+import os
+import pandas as pd
+import pytest
+import indeed.job_storage
+import indeed.process_remove_duplicates
+import indeed.scrap_job_elements
+import indeed.state_store
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(indeed.job_storage, "STORAGE_BACKEND", "csv")
+    monkeypatch.setattr(indeed.process_remove_duplicates, "_key_index", {"keys": {}, "file_size": None})
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+
+def jobs(*job_ids):
+    return pd.DataFrame([
+        {"title": f"Job {job_id}", "company": "Acme", "link": f"https://ca.indeed.com/rc/clk?jk={job_id:016x}&from=ja"}
+        for job_id in job_ids
+    ]).reindex(columns=indeed.scrap_job_elements.JOB_COLUMNS)
+
+def write_raw(month, data, append=False):
+    data.to_csv(f"data/raw/{month}.csv", mode='a' if append else 'w', header=not append, index=False)
+
+def read_intermediate(month):
+    return pd.read_csv(f"data/intermediate/{month}_intermediate.csv", dtype=str)
+
+def test_only_rows_appended_since_the_last_call_are_read(monkeypatch):
+    write_raw("2024_12", jobs(1, 2))
+    assert indeed.process_remove_duplicates.raw_csv_to_inter_csv() == 2
+    read = []
+    read_csv = indeed.process_remove_duplicates.pd.read_csv
+
+    def counting_read_csv(source, *args, **kwargs):
+        data = read_csv(source, *args, **kwargs)
+        # The raw rows are parsed from the bytes read; paths are the month's other files
+        if not isinstance(source, str):
+            read.append(len(data))
+        return data
+    monkeypatch.setattr(indeed.process_remove_duplicates.pd, "read_csv", counting_read_csv)
+
+    write_raw("2024_12", jobs(2, 3), append=True)
+    added = indeed.process_remove_duplicates.raw_csv_to_inter_csv()
+
+    # Read from the byte offset the previous call stopped at: only the two new rows
+    assert read == [2]
+    assert added == 1
+    assert list(read_intermediate("2024_12")["title"]) == ["Job 1", "Job 2", "Job 3"]
+    assert indeed.state_store.load_state("dedup_2024_12")["raw_offset"] == os.path.getsize("data/raw/2024_12.csv")
+
+    # Nothing appended: nothing is read
+    assert indeed.process_remove_duplicates.raw_csv_to_inter_csv() == 0
+    assert len(read) == 1
+
+def test_key_index_is_persisted_and_reloaded_by_a_new_process(monkeypatch):
+    write_raw("2024_12", jobs(1, 2))
+    indeed.process_remove_duplicates.raw_csv_to_inter_csv()
+    with open(indeed.process_remove_duplicates.JOB_INDEX_PATH, encoding="utf-8") as index_file:
+        assert sorted(index_file.read().splitlines()) == [f"jk:{job_id:016x}\t2024_12" for job_id in (1, 2)]
+
+    # A new process starts without the in-memory copy of the index
+    monkeypatch.setattr(indeed.process_remove_duplicates, "_key_index", {"keys": {}, "file_size": None})
+    assert indeed.process_remove_duplicates.load_key_index() == {f"jk:{job_id:016x}": "2024_12" for job_id in (1, 2)}
+
+    write_raw("2025_01", jobs(2, 3))
+    assert indeed.process_remove_duplicates.raw_csv_to_inter_csv() == 1
+    assert list(read_intermediate("2025_01")["title"]) == ["Job 3"]
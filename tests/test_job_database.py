@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+import indeed.job_database
+
+LINK = "https://ca.indeed.com/rc/clk?jk=99b86a524751c541&from=ja&tk={}"
+
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(indeed.job_database, "DATABASE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(indeed.job_database, "_connection", None)
+    monkeypatch.setattr(indeed.job_database, "_connection_pid", None)
+
+def email(*tracking_ids, title="Data Analyst"):
+    return pd.DataFrame({
+        "title": [title] * len(tracking_ids),
+        "company": ["Acme"] * len(tracking_ids),
+        "link": [LINK.format(tracking_id) for tracking_id in tracking_ids],
+    })
+
+def stored_jobs():
+    return indeed.job_database.get_connection().execute("SELECT job_key, month, title, link FROM jobs").fetchall()
+
+def test_upsert_keeps_one_row_per_job_key():
+    assert indeed.job_database.insert_jobs(email("a", "b"), "2024_12") == 1
+    assert indeed.job_database.insert_jobs(email("c", title="Data Analyst II"), "2024_12") == 0
+
+    assert stored_jobs() == [("jk:99b86a524751c541", "2024_12", "Data Analyst", "https://ca.indeed.com/viewjob?jk=99b86a524751c541")]
+    raw_count = indeed.job_database.get_connection().execute("SELECT COUNT(*) FROM raw_jobs").fetchone()[0]
+    assert raw_count == 3
+
+def test_job_seen_in_an_earlier_month_moves_to_that_month():
+    indeed.job_database.insert_jobs(email("a"), "2025_01")
+
+    assert indeed.job_database.insert_jobs(email("b", title="Data Analyst (Backfilled)"), "2024_12") == 1
+    assert indeed.job_database.insert_jobs(email("c", title="Data Analyst (Later)"), "2025_02") == 0
+
+    assert [(month, title) for _, month, title, _ in stored_jobs()] == [("2024_12", "Data Analyst (Backfilled)")]
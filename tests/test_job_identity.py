@@ -0,0 +1,33 @@
+import pandas as pd
+import indeed.job_identity
+import indeed.process_remove_duplicates
+
+EMAIL_LINK = "https://ca.indeed.com/rc/clk/dl?jk=99B86A524751C541&from=ja&qd=abc&rd=1&tk=1ig2"
+LATER_EMAIL_LINK = "https://ca.indeed.com/rc/clk/dl?tk=9zz&jk=99b86a524751c541&from=jasx&alid=42"
+
+def test_same_jk_with_other_tracking_parameters_is_the_same_job():
+    assert indeed.job_identity.job_key(EMAIL_LINK, "Data Analyst", "Acme") == "jk:99b86a524751c541"
+    assert indeed.job_identity.job_key(LATER_EMAIL_LINK, "Data Analyst (Remote)", "Acme Inc.") == "jk:99b86a524751c541"
+    assert indeed.job_identity.canonical_link(EMAIL_LINK) == indeed.job_identity.canonical_link(LATER_EMAIL_LINK) \
+        == "https://ca.indeed.com/viewjob?jk=99b86a524751c541"
+
+def test_same_jk_is_dropped_as_a_duplicate_in_a_later_month():
+    keys = {}
+    first, new_keys = indeed.process_remove_duplicates.select_new_jobs(
+        pd.DataFrame({"link": [EMAIL_LINK], "title": ["Data Analyst"], "company": ["Acme"]}), keys, "2024_12")
+    keys.update(new_keys)
+
+    later, _ = indeed.process_remove_duplicates.select_new_jobs(
+        pd.DataFrame({"link": [LATER_EMAIL_LINK], "title": ["Data Analyst"], "company": ["Acme"]}), keys, "2025_01")
+
+    assert list(first["link"]) == ["https://ca.indeed.com/viewjob?jk=99b86a524751c541"]
+    assert later.empty
+
+def test_jobs_without_jk_are_keyed_by_title_and_company():
+    key = indeed.job_identity.job_key("https://ca.indeed.com/pagead/clk?mo=r&ad=x", "Data Analyst", "Acme")
+
+    assert key.startswith("h:")
+    # Any link without a job ID, letter case and surrounding spaces do not matter
+    assert indeed.job_identity.job_key(None, " data analyst ", "ACME") == key
+    assert indeed.job_identity.job_key(float("nan"), "Data Analyst", "Other Co") != key
+    assert indeed.job_identity.canonical_link("https://ca.indeed.com/pagead/clk?mo=r&ad=x") == "https://ca.indeed.com/pagead/clk?mo=r&ad=x"
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+import indeed.job_storage
+import indeed.scrap_job_elements
+
+pytest.importorskip("pyarrow")
+
+def jobs(*posting_dates):
+    return pd.DataFrame([
+        {"title": f"Job {day}", "company": "Acme", "location": "Toronto", "type": "Full-time",
+         "rating": "4.5", "days": "1", "link": f"https://ca.indeed.com/viewjob?jk={day}", "posting_date": day}
+        for day in posting_dates
+    ])
+
+def test_jobs_round_trip_through_a_month_partition(tmp_path):
+    dataset = str(tmp_path / "raw")
+    stored = jobs("2024-12-01", "2024-12-02")
+    stored.loc[1, "rating"] = "not rated"
+
+    indeed.job_storage.append_jobs(stored, dataset, "2024_12")
+    data = indeed.job_storage.read_jobs(dataset)
+
+    assert list(data.columns) == indeed.scrap_job_elements.JOB_COLUMNS
+    assert list(data["title"]) == ["Job 2024-12-01", "Job 2024-12-02"]
+    # Dictionary encoded on disk, plain strings once read, like the CSV loaders
+    assert data["company"].dtype == object and list(data["company"]) == ["Acme", "Acme"]
+    assert data["rating"].iloc[0] == 4.5 and pd.isna(data["rating"].iloc[1])
+    assert data["description"].isna().all()
+    assert indeed.job_storage.list_months(dataset) == ["2024_12"]
+
+def test_month_is_compacted_into_one_part_at_the_part_limit(tmp_path, monkeypatch):
+    dataset = str(tmp_path / "raw")
+    monkeypatch.setattr(indeed.job_storage, "COMPACT_PARTS", 3)
+    for day in ("2024-12-01", "2024-12-02"):
+        indeed.job_storage.append_jobs(jobs(day), dataset, "2024_12")
+    assert not indeed.job_storage.compact_month(dataset, "2024_12")
+
+    indeed.job_storage.append_jobs(jobs("2024-12-03"), dataset, "2024_12")
+    assert indeed.job_storage.compact_month(dataset, "2024_12")
+
+    assert len(indeed.job_storage.list_parts(dataset, "2024_12")) == 1
+    assert list(indeed.job_storage.read_jobs(dataset)["posting_date"]) == ["2024-12-01", "2024-12-02", "2024-12-03"]
+
+def test_since_keeps_the_jobs_posted_on_or_after_the_date(tmp_path):
+    dataset = str(tmp_path / "raw")
+    indeed.job_storage.append_jobs(jobs("2024-11-28", "2024-11-30"), dataset, "2024_11")
+    indeed.job_storage.append_jobs(jobs("2024-12-01", "2024-12-05"), dataset, "2024_12")
+
+    data = indeed.job_storage.read_jobs(dataset, columns=["company", "posting_date"], since="2024-11-30")
+
+    assert list(data.columns) == ["company", "posting_date"]
+    assert list(data["posting_date"]) == ["2024-11-30", "2024-12-01", "2024-12-05"]
+    assert indeed.job_storage.read_jobs(dataset, since="2025-01-01").empty
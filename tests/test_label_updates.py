@@ -0,0 +1,98 @@
+import json
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+import indeed.gmail_quota
+import indeed.label_updates
+
+def http_error(status, message=""):
+    return HttpError(httplib2.Response({"status": status}), json.dumps({"error": {"code": status, "message": message}}).encode())
+
+class FakeRequest:
+    def __init__(self, method_id, call):
+        self.methodId = method_id
+        self.call = call
+
+    def execute(self):
+        return self.call()
+
+class FakeMessages:
+    """messages.batchModify and messages.modify; a call fails if any of its IDs is in errors, with its status or error."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.modified = []
+
+    def apply(self, email_ids, body):
+        for email_id in email_ids:
+            if email_id in self.errors:
+                error = self.errors[email_id]
+                raise error if isinstance(error, HttpError) else http_error(error)
+        self.modified.extend((email_id, tuple(body["addLabelIds"]), tuple(body["removeLabelIds"])) for email_id in email_ids)
+
+    def batchModify(self, userId, body):
+        return FakeRequest("gmail.users.messages.batchModify", lambda: self.apply(body["ids"], body))
+
+    def modify(self, userId, id, body):
+        return FakeRequest("gmail.users.messages.modify", lambda: self.apply([id], body))
+
+class FakeService:
+    def __init__(self, errors=None):
+        self.messages_resource = FakeMessages(errors or {})
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self.messages_resource
+
+@pytest.fixture(autouse=True)
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(indeed.label_updates, "JOURNAL_PATH", str(tmp_path / "pending_label_updates.jsonl"))
+    monkeypatch.setattr(indeed.label_updates, "REJECTED_PATH", str(tmp_path / "rejected_label_updates.jsonl"))
+    monkeypatch.setattr(indeed.gmail_quota.time, "sleep", lambda seconds: None)
+
+LABELS = {"success_final": "Label_1", "failure_final": "Label_2"}
+
+def test_permanently_rejected_update_is_moved_out_of_the_journal():
+    service = FakeService(errors={"deleted": 404})
+    for email_id in ("m1", "deleted", "m2"):
+        indeed.label_updates.queue_label_update(email_id, add=["success_final"], remove=["UNREAD"])
+
+    indeed.label_updates.flush_label_updates(service, dict(LABELS))
+
+    assert [email_id for email_id, _, _ in service.messages_resource.modified] == ["m1", "m2"]
+    assert indeed.label_updates.load_pending_updates() == {}
+    with open(indeed.label_updates.REJECTED_PATH, encoding="utf-8") as rejected:
+        entries = [json.loads(line) for line in rejected]
+    assert [(entry["id"], entry["status"]) for entry in entries] == [("deleted", 404)]
+
+    # The next flush has nothing left to replay
+    indeed.label_updates.flush_label_updates(service, dict(LABELS))
+    assert len(service.messages_resource.modified) == 2
+
+def test_transient_failure_keeps_updates_queued():
+    service = FakeService(errors={"m1": 500})
+    indeed.label_updates.queue_label_update("m1", add=["failure_final"], remove=["UNREAD"])
+
+    with pytest.raises(HttpError):
+        indeed.label_updates.flush_label_updates(service, dict(LABELS))
+
+    assert list(indeed.label_updates.load_pending_updates()) == ["m1"]
+
+def test_stale_labels_are_refreshed_once_per_flush(monkeypatch):
+    # Emails whose update Gmail keeps rejecting with a label error, whatever the label IDs
+    service = FakeService(errors={email_id: http_error(400, "Invalid label: Label_1") for email_id in ("bad1", "bad2")})
+    refreshes = []
+    monkeypatch.setattr(indeed.label_updates.indeed.gmail_labels, "resolve_pipeline_labels",
+                        lambda service, refresh=False: refreshes.append(refresh) or dict(LABELS))
+    for email_id in ("m1", "bad1", "bad2"):
+        indeed.label_updates.queue_label_update(email_id, add=["success_final"], remove=["UNREAD"])
+    indeed.label_updates.queue_label_update("m2", add=["failure_final"], remove=["UNREAD"])
+
+    indeed.label_updates.flush_label_updates(service, dict(LABELS))
+
+    assert refreshes == [True]
+    assert [email_id for email_id, _, _ in service.messages_resource.modified] == ["m1", "m2"]
+    with open(indeed.label_updates.REJECTED_PATH, encoding="utf-8") as rejected:
+        assert [json.loads(line)["id"] for line in rejected] == ["bad1", "bad2"]
@@ -0,0 +1,73 @@
+import pytest
+import indeed.mailbox_sync
+
+class FakeRequest:
+    def __init__(self, method_id, call):
+        self.methodId = method_id
+        self.call = call
+
+    def execute(self):
+        return self.call()
+
+class FakeMailbox:
+    """users.getProfile and an is:unread messages.list whose page tokens are offsets, like Gmail's search results."""
+
+    def __init__(self, message_ids):
+        self.unread = list(message_ids)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def getProfile(self, userId):
+        return FakeRequest("gmail.users.getProfile", lambda: {"historyId": "1000"})
+
+    def list(self, userId, q, pageToken=None, maxResults=100):
+        def call():
+            start = int(pageToken or 0)
+            page = self.unread[start:start + maxResults]
+            results = {"messages": [{"id": email_id} for email_id in page]}
+            if start + maxResults < len(self.unread):
+                results["nextPageToken"] = str(start + maxResults)
+            return results
+        return FakeRequest("gmail.users.messages.list", call)
+
+    def mark_read(self, email_id):
+        self.unread.remove(email_id)
+
+@pytest.mark.parametrize("order", [indeed.mailbox_sync.NEWEST_FIRST, indeed.mailbox_sync.OLDEST_FIRST])
+def test_full_sync_lists_every_email_while_they_are_marked_read(monkeypatch, order):
+    monkeypatch.setattr(indeed.mailbox_sync, "LIST_PAGE_SIZE", 3)
+    all_ids = [f"m{number}" for number in range(10)]
+    mailbox = FakeMailbox(all_ids)
+
+    message_ids, checkpoint = indeed.mailbox_sync.list_unread_message_ids(mailbox, ["alert@indeed.com"], order)
+    processed = []
+    for chunk in indeed.mailbox_sync.chunked(message_ids, 2):
+        for email_id in chunk:
+            mailbox.mark_read(email_id)
+            processed.append(email_id)
+
+    assert processed == (all_ids if order == indeed.mailbox_sync.NEWEST_FIRST else all_ids[::-1])
+    assert checkpoint == {"history_id": "1000"}
+
+def test_sender_filter_drops_mail_sent_by_this_account(monkeypatch):
+    def metadata(email_id, sender, labels):
+        return {"id": email_id, "labelIds": labels, "payload": {"headers": [{"name": "From", "value": sender}]}}
+
+    responses = {
+        "alert": metadata("alert", "Indeed <alert@indeed.com>", ["INBOX", "UNREAD"]),
+        # Error notification the pipeline sent to its own, watched, address
+        "error": metadata("error", "malikhqtech@gmail.com", ["SENT", "INBOX", "UNREAD"]),
+        "draft": metadata("draft", "alert@indeed.com", ["DRAFT"]),
+    }
+    monkeypatch.setattr(indeed.mailbox_sync.indeed.gmail_batch, "batch_get_messages",
+                        lambda service, email_ids, **kwargs: {email_id: responses[email_id] for email_id in email_ids})
+
+    kept = indeed.mailbox_sync.filter_message_ids_by_sender(
+        None, ["alert", "error", "draft"], ["malikhqtech@gmail.com", "alert@indeed.com"]
+    )
+
+    assert kept == ["alert"]
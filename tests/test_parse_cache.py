@@ -0,0 +1,69 @@
+import itertools
+import pytest
+import indeed.parse_cache
+import indeed.scrap_job_elements
+import indeed.scrap_overall
+
+JOB_BLOCK = (
+    '<table><tr><td class="r-e"><a href="https://ca.indeed.com/rc/clk?jk=1">Data Analyst</a></td></tr>'
+    '<tr><td class="r-f">Acme</td></tr><tr><td class="r-k">1 day ago</td></tr></table>'
+)
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(indeed.parse_cache, "CACHE_PATH", str(tmp_path / "cache" / "parse_cache.sqlite3"))
+    monkeypatch.setattr(indeed.parse_cache, "_connection", None)
+    monkeypatch.setattr(indeed.parse_cache, "_connection_pid", None)
+    monkeypatch.setattr(indeed.parse_cache, "_stats", {"hits": 0, "misses": 0, "evictions": 0})
+    # Distinct last_used values, however fast the test runs
+    clock = itertools.count(1)
+    monkeypatch.setattr(indeed.parse_cache.time, "time", lambda: next(clock))
+    monkeypatch.setattr(indeed.scrap_job_elements, "template_counts", indeed.scrap_job_elements.Counter())
+    monkeypatch.setattr(indeed.scrap_job_elements, "_flagged_layouts", set())
+    monkeypatch.setattr(indeed.scrap_overall.indeed.scrap_job_blocks, "save_flagged_html", lambda *args, **kwargs: None)
+
+def test_hit_returns_the_stored_records_and_layouts():
+    indeed.parse_cache.put_records("a", 1, [["Data Analyst", "Acme"]], [((1, ("td.r-e",)),)])
+
+    records, layouts = indeed.parse_cache.get_records("a", 1)
+
+    assert records == [["Data Analyst", "Acme"]]
+    assert layouts == [[[1, ["td.r-e"]]]]
+    assert indeed.parse_cache.get_records("b", 1) is None
+    assert indeed.parse_cache.get_cache_stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+def test_entries_of_another_extractor_version_are_dropped():
+    indeed.parse_cache.put_records("a", 1, [["Data Analyst"]])
+
+    assert indeed.parse_cache.get_records("a", 2) is None
+
+    # The next process opens the cache with the new version and deletes the old entry
+    indeed.parse_cache._connection = None
+    indeed.parse_cache.get_connection(2)
+    assert indeed.parse_cache._connection.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0] == 0
+
+def test_least_recently_used_entry_is_evicted_at_the_size_cap(monkeypatch):
+    indeed.parse_cache.put_records("a", 1, [["x" * 100]])
+    indeed.parse_cache.put_records("b", 1, [["x" * 100]])
+    size = indeed.parse_cache._connection.execute("SELECT size FROM parse_cache WHERE key = 'a'").fetchone()[0]
+    monkeypatch.setattr(indeed.parse_cache, "MAX_CACHE_BYTES", 2 * size)
+
+    assert indeed.parse_cache.get_records("a", 1) is not None
+    indeed.parse_cache.put_records("c", 1, [["x" * 100]])
+
+    assert indeed.parse_cache.get_records("b", 1) is None
+    assert indeed.parse_cache.get_records("a", 1) is not None
+    assert indeed.parse_cache.get_records("c", 1) is not None
+    assert indeed.parse_cache.get_cache_stats()["evictions"] == 1
+
+def test_hit_still_counts_the_block_layouts():
+    first = indeed.scrap_overall.extract_jobs_from_html(JOB_BLOCK)
+    counted = dict(indeed.scrap_job_elements.template_counts)
+
+    second = indeed.scrap_overall.extract_jobs_from_html(JOB_BLOCK)
+
+    assert indeed.parse_cache.get_cache_stats()["hits"] == 1
+    assert list(second["title"]) == list(first["title"]) == ["Data Analyst"]
+    assert counted and dict(indeed.scrap_job_elements.template_counts) == {
+        fingerprint: 2 * count for fingerprint, count in counted.items()
+    }
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+import indeed.poll_scheduler
+
+PROFILES = [
+    {"name": "day", "start_hour": 8, "end_hour": 20, "min_interval": 10, "max_interval": 160},
+    {"name": "night", "start_hour": 20, "end_hour": 8, "min_interval": 60, "max_interval": 1800},
+]
+
+class FakeClock:
+    """Local time that only moves when the test waits out the scheduler's interval."""
+
+    def __init__(self, start):
+        self.now = start
+
+    def poll(self, scheduler, new_messages):
+        interval = scheduler.next_interval(new_messages, now=self.now)
+        self.now += timedelta(seconds=interval)
+        return interval
+
+def test_interval_backs_off_while_the_mailbox_is_idle():
+    clock = FakeClock(datetime(2024, 12, 2, 9, 0))
+    scheduler = indeed.poll_scheduler.AdaptivePollScheduler(profiles=PROFILES)
+
+    intervals = [clock.poll(scheduler, 0) for _ in range(6)]
+
+    assert intervals == [20, 40, 80, 160, 160, 160]
+    assert scheduler.get_status()["profile"] == "day"
+
+def test_interval_drops_to_the_minimum_when_mail_arrives():
+    clock = FakeClock(datetime(2024, 12, 2, 9, 0))
+    scheduler = indeed.poll_scheduler.AdaptivePollScheduler(profiles=PROFILES)
+    for _ in range(5):
+        clock.poll(scheduler, 0)
+
+    assert clock.poll(scheduler, 3) == 10
+    assert clock.poll(scheduler, 1) == 10
+    assert clock.poll(scheduler, 0) == 20
+    assert scheduler.get_status()["arrival_rate_per_minute"] > 0
+
+def test_bounds_follow_the_time_of_day_profile():
+    clock = FakeClock(datetime(2024, 12, 2, 23, 0))
+    scheduler = indeed.poll_scheduler.AdaptivePollScheduler(max_interval=3600, profiles=PROFILES)
+
+    assert clock.poll(scheduler, 5) == 60
+    assert [clock.poll(scheduler, 0) for _ in range(5)] == [120, 240, 480, 960, 1800]
+    assert scheduler.get_status()["profile"] == "night"
+
+def test_global_bounds_cap_the_profile_bounds():
+    clock = FakeClock(datetime(2024, 12, 2, 23, 0))
+    scheduler = indeed.poll_scheduler.AdaptivePollScheduler(profiles=PROFILES)
+
+    assert [clock.poll(scheduler, 0) for _ in range(5)][-1] == indeed.poll_scheduler.MAX_INTERVAL
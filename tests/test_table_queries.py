@@ -0,0 +1,24 @@
+import pandas as pd
+import reporting.table_queries
+
+JOBS = pd.DataFrame({
+    "company": ["Bank A", "Bank B", "Shop C", "Shop D"],
+    "type": ["Full-time", "Contract", "Contract", None],
+    "rating": [4.5, 3.0, 4.0, None],
+})
+
+def companies(filter_query):
+    return list(reporting.table_queries.apply_filter_query(JOBS, filter_query)["company"])
+
+def test_and_expressions():
+    assert companies('{company} contains "Bank" && {rating} >= 4') == ["Bank A"]
+
+def test_or_expressions_with_and_binding_tighter():
+    assert companies('{company} contains "Bank" && {rating} >= 4 || {type} eq "Contract"') == ["Bank A", "Bank B", "Shop C"]
+    assert companies('{rating} > 4 or {type} is nil') == ["Bank A", "Shop D"]
+
+def test_unsupported_query_matches_no_rows():
+    assert companies('({company} contains "Bank" || {type} eq "Contract") && {rating} >= 4') == []
+
+def test_empty_query_keeps_every_row():
+    assert companies('') == list(JOBS["company"])